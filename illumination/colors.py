@@ -5,6 +5,142 @@ Tools for setting up colors for display.
 from .imports import *
 from matplotlib.colors import SymLogNorm, LogNorm
 
+class ValueSketch(Talker):
+    '''
+    A small summary of the distribution of (finite) values
+    in one or more images, from which percentiles and the MAD
+    can be estimated without keeping every pixel around.
+
+    Each image is summarized by a stratified subsample (pixels on
+    an evenly spaced grid, so every part of the image is represented),
+    plus its exact minimum and maximum. Sketches can be merged
+    (across frames, or across times); merging picks evenly spaced
+    ranks from each sorted sample, in proportion to how many
+    values each represents, so the merged sample still follows
+    the combined distribution. With the default size, percentiles
+    are good to within about a percent in rank, and the whole
+    sketch takes a few tens of KB.
+    '''
+
+    def __init__(self, size=4096):
+        '''
+        Initialize an (empty) sketch.
+
+        Parameters
+        ----------
+        size : int
+            The maximum number of sample values to keep.
+        '''
+        Talker.__init__(self)
+        self.size = size
+        self.values = np.array([])
+        self.count = 0
+        self.min, self.max = np.nan, np.nan
+
+    def __repr__(self):
+        return '<sketch of {} values, from {} samples>'.format(self.count, len(self.values))
+
+    @classmethod
+    def from_array(cls, a, size=4096):
+        '''
+        Sketch the values in an array.
+
+        Parameters
+        ----------
+        a : array
+            The image (or any array) to summarize.
+
+        size : int
+            The maximum number of sample values to keep.
+        '''
+        sketch = cls(size=size)
+        sketch.add(a)
+        return sketch
+
+    def add(self, a):
+        '''
+        Include the values in an array in this sketch.
+
+        Parameters
+        ----------
+        a : array
+            The image (or any array) to include.
+        '''
+        a = np.asarray(a)
+        if a.size == 0:
+            return self
+
+        # take pixels on an evenly spaced grid (striding through the
+        # flattened array would keep hitting the same few columns,
+        # whenever the stride divides the width), without the non-finite ones
+        grid = a.reshape(-1, a.shape[-1]) if a.ndim > 0 else a.reshape(1, 1)
+        ny, nx = grid.shape
+        sy = int(np.clip(np.round(np.sqrt(a.size/self.size)), 1, ny))
+        sx = int(np.maximum(np.round(-(-ny//sy)*nx/self.size), 1))
+        sample = grid[::sy, ::sx].ravel()
+        nsampled = sample.size
+        sample = np.sort(sample[np.isfinite(sample)]).astype(np.float64)
+        if len(sample) == 0:
+            return self
+
+        other = ValueSketch(size=self.size)
+        other.values = sample
+        other.count = int(np.round(len(sample)*a.size/nsampled))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            other.min, other.max = np.nanmin(a), np.nanmax(a)
+        return self.merge(other)
+
+    def _thin(self, n):
+        '''
+        Pick n evenly spaced ranks from this sketch's sorted sample.
+        '''
+        if n >= len(self.values):
+            return self.values
+        return self.values[((np.arange(n) + 0.5)*len(self.values)/n).astype(int)]
+
+    def merge(self, other):
+        '''
+        Combine another sketch into this one.
+
+        Parameters
+        ----------
+        other : ValueSketch
+            The sketch to include.
+        '''
+        total = self.count + other.count
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            keep = [other._thin(self.size)]
+        else:
+            n = np.minimum(self.size, len(self.values) + len(other.values))
+            keep = [s._thin(int(np.round(n*s.count/total))) for s in (self, other)]
+        self.values = np.sort(np.concatenate(keep))
+        self.count = total
+        self.min = np.nanmin([self.min, other.min])
+        self.max = np.nanmax([self.max, other.max])
+        return self
+
+    def percentile(self, q):
+        '''
+        Estimate percentile(s) of the values (like np.nanpercentile).
+
+        Parameters
+        ----------
+        q : float, array
+            The percentile(s), between 0 and 100.
+        '''
+        if len(self.values) == 0:
+            return np.full(np.shape(q), np.nan)
+        return np.percentile(self.values, q)
+
+    def mad(self):
+        '''
+        Estimate the median absolute deviation from the median.
+        '''
+        return mad(self.values)
+
 def cmap_norm_ticks(a, whatpercentiles=[1, 99], howmanysigmaarelinear=1.5, whatfractionislinear=0.15, vmax=None, vmin=None, cmap=None):
     '''
     Return a probably pretty-OK colormap, a color normalization,
@@ -13,12 +149,17 @@ def cmap_norm_ticks(a, whatpercentiles=[1, 99], howmanysigmaarelinear=1.5, whatf
     Parameters
     ----------
 
-    a : array
-            The cmap and norm will be set on the basis of values in this array.
+    a : array, ValueSketch
+            The cmap and norm will be set on the basis of values in this
+            array (or, for big arrays, on a sketch of them).
     '''
 
+    # summarize the values (exactly, if there aren't many of them)
+    if not isinstance(a, ValueSketch):
+        a = ValueSketch.from_array(a)
+
     if vmin is None:
-        gonegative = (a <= 0).any()
+        gonegative = a.min <= 0
     else:
         gonegative = vmin < 0
 
@@ -28,11 +169,11 @@ def cmap_norm_ticks(a, whatpercentiles=[1, 99], howmanysigmaarelinear=1.5, whatf
         if vmax is not None:
             vmin = -vmax
         else:
-            vmin, vmax = np.nanpercentile(a, whatpercentiles)
+            vmin, vmax = a.percentile(whatpercentiles)
             scale = np.maximum(np.abs(vmin), np.abs(vmax))
             vmin, vmax = -scale, scale
         span = np.log10(vmax)
-        sigma = mad(a)
+        sigma = a.mad()
 
         norm = SymLogNorm(howmanysigmaarelinear * sigma,
                           linscale=span * whatfractionislinear,
@@ -43,9 +184,9 @@ def cmap_norm_ticks(a, whatpercentiles=[1, 99], howmanysigmaarelinear=1.5, whatf
                  0, howmanysigmaarelinear * sigma, vmax]
     else:
         if vmax is None:
-            vmax = np.nanpercentile(a, whatpercentiles[1])
+            vmax = a.percentile(whatpercentiles[1])
         if vmin is None:
-            vmin = np.nanpercentile(a, whatpercentiles[0])
+            vmin = a.percentile(whatpercentiles[0])
 
         # go simple logarithmic, if this is all positive
         norm = LogNorm(vmin=vmin, vmax=vmax)
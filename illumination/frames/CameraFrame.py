@@ -4,6 +4,9 @@ from matplotlib.colors import SymLogNorm, LogNorm
 class CameraFrame(imshowFrame):
     frametype = 'camera'
 
+    # full-frame images have many more pixels than the screen
+    usepyramid = True
+
     def __init__(self, name='camera',
                        ax=None,
                        data=None,
@@ -173,6 +173,23 @@ class FrameBase(Talker):
         '''
         return self.data._find_timestep(time)
 
+    def find_timesteps(self, times):
+        '''
+        Given many times, identify their indices (all at once).
+
+        Parameters
+        ----------
+
+        times : astropy Time, array
+                The times to look up.
+
+        Returns
+        -------
+        indices : array of ints
+                The index of the *closest* time point to each.
+        '''
+        return self.data.find_timesteps(times)
+
     def _get_times(self):
         '''
         Get the available times associated with this frame.
@@ -65,6 +65,9 @@ class ZoomFrame(imshowFrame):
 
         self.cmapkw = copy.copy(cmapkw) # why do I have to do this?
 
+        # (the cutout gets defined the first time an image is pulled)
+        self.cutout = None
+
     def _get_times(self):
         '''
         Get the available times associated with this frame.
@@ -77,12 +80,46 @@ class ZoomFrame(imshowFrame):
         '''
         return self.source._find_timestep(time)
 
+    def _can_read_region(self):
+        '''
+        Can the cutout be read directly from the source's data?
+        (Only if the source displays its raw images, untransformed.)
+        '''
+        return ((self.cutout is not None) and
+                (len(self.source.processingsteps) == 0) and
+                (type(self.source)._transformimage is FrameBase._transformimage) and
+                hasattr(self.source.data, 'read_region'))
+
+    def _get_region(self, time=None):
+        '''
+        Read only the cutout (not the whole image) from the source's data.
+        '''
+        try:
+            if time is None:
+                time = self._get_times()[0]
+            timestep = self._find_timestep(time)
+            region = self.source.data.read_region(timestep, *self.cutout.slices_original)
+            actual_time = self._get_times()[timestep]
+        except (IndexError, AssertionError, ValueError):
+            return None, None
+
+        # pad (partial) cutouts that hang off the edge of the image
+        if region.shape != self.cutout.shape:
+            padded = np.full(self.cutout.shape, np.nan, dtype=np.result_type(region, np.float32))
+            padded[self.cutout.slices_cutout] = region
+            region = padded
+        return region, actual_time
+
     def _get_image(self, time=None):
         '''
         Get the image at a given time (defaulting to the first time),
         by pulling it from the source frame.
         '''
 
+        # after the first image, read only the pixels within the cutout
+        if self._can_read_region():
+            return self._get_region(time)
+
         bigimage, actual_time = self.source._get_image(time)
         self.cutout = Cutout2D(bigimage, self.position,
                                self.size, mode='partial')
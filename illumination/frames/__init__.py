@@ -6,6 +6,7 @@ Illustration.
 
 from .FrameBase import FrameBase
 from .imshowFrame import imshowFrame
+from .processing import ProcessingStage, BatchStage, ProcessingPipeline, register_stage, processingstages
 from .CameraFrame import CameraFrame, cameras
 from .CCDFrame import CCDFrame, ccds
 from .ZoomFrame import ZoomFrame
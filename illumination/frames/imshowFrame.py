@@ -1,6 +1,24 @@
 from .FrameBase import *
 from ..colors import cmap_norm_ticks
 from ..sequences import make_image_sequence
+from ..sequences.caches import LRUCache
+from .processing import ProcessingPipeline
+from .rendering import RenderCache, quantize, colormap_lut, _norm_signature, _files_signature, _hash
+
+def _bin2x(image):
+    '''
+    Bin an image down by 2x along both axes, averaging the
+    (finite) pixels in each 2x2 block. Odd-sized images are
+    padded with NaN along the top and right edges.
+    '''
+    ny, nx = image.shape
+    padded = np.full((ny + ny % 2, nx + nx % 2), np.nan, dtype=np.float32)
+    padded[:ny, :nx] = image
+    blocks = padded.reshape(padded.shape[0]//2, 2, padded.shape[1]//2, 2)
+    with warnings.catch_warnings():
+        # blocks that are entirely NaN should stay NaN quietly
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(blocks, axis=(1, 3))
 
 
 class imshowFrame(FrameBase):
@@ -15,6 +33,26 @@ class imshowFrame(FrameBase):
     xmin, xmax = None, None
     ymin, ymax = None, None
 
+    # should large images be binned down to roughly the on-screen pixel size?
+    usepyramid = False
+
+    # what's the coarsest binning (as a power of 2) that can be used?
+    maxpyramidlevel = 6
+
+    # how many bytes of binned images can be kept?
+    # (shared among all the imshowFrames in an illustration)
+    pyramidcachesize = 128e6
+
+    # how many recently read raw images should be kept for temporal processing?
+    rawwindowsize = 3
+
+    # how many bytes of raw + processed images can be kept?
+    # (shared among all the imshowFrames in an illustration)
+    processingcachesize = 256e6
+
+    # how many images should be processed together, while animating?
+    processingbatchsize = 16
+
     def __init__(self,
                  name='image',
                  ax=None,
@@ -90,12 +128,141 @@ class imshowFrame(FrameBase):
         # keep track of an extra keywords for generating the cmaps
         self.cmapkw = copy.copy(cmapkw) # why do I have to do this?
 
+        # keep the last few raw images, shared by all the temporal processing steps
+        self._rawwindow = LRUCache(maxitems=self.rawwindowsize, name='raw-window')
+
         # are there steps to apply to the image before displaying?
         self.processingsteps = processingsteps
 
         # should we plot something special for the first frame?
         self.firstframe = firstframe
 
+        # keep binned versions of recently displayed images
+        self._pyramid = LRUCache(maxbytes=self.pyramidcachesize, name='pyramid')
+
+        # optionally, keep rendered images on disk (see `open_rendercache`)
+        self._render = None
+
+    @property
+    def processingsteps(self):
+        '''
+        The processing steps applied (in order) to each
+        image before it's displayed, as a ProcessingPipeline.
+        '''
+        return self._pipeline
+
+    @processingsteps.setter
+    def processingsteps(self, steps):
+        '''
+        Set the processing steps, as a list of the names
+        of registered stages (like 'subtractmedian') and/or
+        ProcessingStage objects. They can be changed at any time.
+        '''
+        self._pipeline = ProcessingPipeline(steps,
+                                            read=self._get_raw_image,
+                                            data=self.data,
+                                            cachesize=self._cachebudget(self.processingcachesize))
+
+    def _cachebudget(self, total):
+        '''
+        This frame's share of a cache budget that's meant
+        for a whole illustration (split evenly among all
+        of its imshowFrames), so that an illustration with
+        many frames doesn't hold many times the budget.
+
+        Parameters
+        ----------
+        total : float
+            The number of bytes for the whole illustration.
+        '''
+        try:
+            frames = self.illustration.frames.values()
+            nframes = len({id(f) for f in frames if isinstance(f, imshowFrame)})
+        except AttributeError:
+            nframes = 1
+        return total/np.maximum(nframes, 1)
+
+    def _share_caches(self):
+        '''
+        Resize this frame's caches to its current share of the
+        illustration's budgets. (Frames are often added to an
+        illustration after they're made, so this is repeated
+        whenever images are fetched; shrunken caches evict
+        their extra images on their next `put`.)
+        '''
+        processing = self._cachebudget(self.processingcachesize)
+        # (the raw window gets a quarter of the processing share)
+        self._rawwindow.maxbytes = processing/4
+        self._pipeline._cache.maxbytes = processing - self._rawwindow.maxbytes
+        self._pyramid.maxbytes = self._cachebudget(self.pyramidcachesize)
+
+    def _pyramid_level(self, shape):
+        '''
+        Choose the level of the image pyramid (binned by 2**level)
+        whose pixels are closest to, but no bigger than, the pixels
+        of the axes on screen.
+
+        Parameters
+        ----------
+        shape : tuple
+            The (nrows, ncols) of the full-resolution image.
+        '''
+        if (not self.usepyramid) or (self.ax is None):
+            return 0
+
+        # how many image pixels fall into each screen pixel?
+        bbox = self.ax.get_window_extent()
+        perpixel = np.minimum(shape[1]/np.maximum(bbox.width, 1),
+                              shape[0]/np.maximum(bbox.height, 1))
+        if perpixel < 2:
+            return 0
+        return int(np.minimum(np.floor(np.log2(perpixel)), self.maxpyramidlevel))
+
+    def _get_display_image(self, image, key=None):
+        '''
+        Get the version of an image that should actually be shown,
+        binned down to match the axes' on-screen pixel size
+        (if `usepyramid` is set), along with its extent.
+
+        Each level of the pyramid is built by binning the one
+        below it, and cached (under `key`), so flipping back and
+        forth between timesteps doesn't require rebinning.
+
+        Parameters
+        ----------
+        image : array
+            The full-resolution (transformed) image.
+
+        key : hashable, None
+            Something identifying this image (like its timestep),
+            for caching its binned versions. None skips the cache.
+
+        Returns
+        -------
+        displayimage : array
+            The (possibly binned) image.
+
+        extent : list
+            The [left, right, bottom, top] extent of the
+            displayed image, in full-resolution pixels.
+        '''
+        self._share_caches()
+        level = self._pyramid_level(image.shape)
+        binned = image
+        for l in range(1, level + 1):
+            cachekey = (key, self.processingsteps.signature, l)
+            cached = None if key is None else self._pyramid.get(cachekey)
+            if cached is None:
+                cached = _bin2x(binned)
+                if key is not None:
+                    self._pyramid.put(cachekey, cached)
+            binned = cached
+
+        # binned pixels cover 2**level full-resolution pixels each
+        factor = 2**level
+        extent = [0, binned.shape[1]*factor, 0, binned.shape[0]*factor]
+        return binned, extent
+
     def _cmap_norm_ticks(self, *args, **cmapkw):
         '''
         Return the cmap and normalization.
@@ -259,20 +426,19 @@ class imshowFrame(FrameBase):
             # pull out the cmap, normalization, and suggested ticks
             cmap, norm, ticks = self._cmap_norm_ticks(image, **self.cmapkw)
 
-            # display the image for this frame
-            extent = [0, image.shape[1], 0, image.shape[0]]
-
             # make a stacked image
             if self.firstframe is None:
-                firstimage = image
+                firstimage, key = image, self._find_timestep(actual_time)
             elif self.firstframe == 'median':
                 #assert(np.size(image) < 10000 or self.data.N < 50)
-                firstimage = self.data.median()
+                firstimage, key = self.data.median(), 'median'
 
+            # display the image for this frame (binned, if it's big)
+            displayimage, extent = self._get_display_image(firstimage, key)
             self.plotted['image'] = self.ax.imshow(
-                firstimage, extent=extent, interpolation='nearest', origin='lower', norm=norm, cmap=cmap)
+                displayimage, extent=extent, interpolation='nearest', origin='lower', norm=norm, cmap=cmap)
 
-            self.speak('added image of shape {} to {}'.format(firstimage.shape, self))
+            self.speak('added image of shape {} to {}'.format(displayimage.shape, self))
 
         # plot the colorbar
         if ('colorbar' in self.plotingredients) and 'image' in self.plotted:
@@ -318,32 +484,60 @@ class imshowFrame(FrameBase):
             timestep = None
         self.currenttimestep = timestep
 
+    def _get_raw_image(self, timestep):
+        '''
+        Get the raw image at a timestep, through a small window of
+        recently read images. Stepping through the timesteps in
+        order, each image is read from the data only once, even
+        when processing steps also need its neighbors.
+
+        Parameters
+        ----------
+        timestep : int
+            The timestep to read (wrapping around the ends of the sequence).
+        '''
+        if self.data.N == 0:
+            raise IndexError('there are no images in {}'.format(self.data))
+        timestep = timestep % self.data.N
+        rawimage = self._rawwindow.get(timestep)
+        if rawimage is None:
+            rawimage = self.data[timestep]
+            self._rawwindow.put(timestep, rawimage)
+        return rawimage
+
     def get_processed_image(self, timestep):
         '''
         Get the image, and apply any extra processing
         steps to it (subtract differences, normalize,
         subtract smooth backgrounds, etc...?)
+
+        While stepping forward through the timesteps (as in an
+        animation), the next few images are processed together
+        in one batch, and cached until they're displayed.
         '''
 
-        # pull out the raw image
-        rawimage = self.data[timestep]
-        assert(rawimage is not None)
-
-        if 'subtractmedian' in self.processingsteps:
-            processedimage = rawimage - self.data.median()
-            #self.speak('subtracted median image')
-        elif 'subtractmean' in self.processingsteps:
-            processedimage = rawimage - self.data.mean()
-        elif 'subtractprevious' in self.processingsteps:
-            comparison = timestep - 1 #this wraps at the end
-            processedimage = rawimage - self.data[comparison]
-        elif 'subtractbeforeandafter' in self.processingsteps:
-            before = timestep - 1
-            after = (timestep + 1)%len(self.data)
-            processedimage = rawimage - 0.5*(self.data[before] + self.data[after])
-        else:
-            processedimage = rawimage
-        return processedimage
+        # keep this frame's caches within its share of the illustration's
+        self._share_caches()
+
+        # pull out the raw image, if there's nothing to do to it
+        if len(self.processingsteps) == 0:
+            rawimage = self._get_raw_image(timestep)
+            assert(rawimage is not None)
+            return rawimage
+
+        # process a batch, if we're moving forward to an unprocessed image
+        N = self.data.N
+        timestep = timestep % N
+        previous = getattr(self, 'currenttimestep', None)
+        movingforward = (previous is not None) and (timestep == (previous + 1) % N)
+        if movingforward and not self.processingsteps.is_cached(timestep):
+            # (make sure the whole batch, with every stage, fits in the cache)
+            rawimage = self._get_raw_image(timestep)
+            perimage = np.size(rawimage)*np.dtype(working_dtype(rawimage.dtype)).itemsize*len(self.processingsteps)
+            nbatch = int(np.clip(self.processingsteps._cache.maxbytes//(2*perimage), 1, np.minimum(self.processingbatchsize, N)))
+            batch = [(timestep + i) % N for i in range(nbatch)]
+            return self.processingsteps.get_batch(batch)[0]
+        return self.processingsteps.get(timestep)
 
     def _get_image(self, time=None):
         '''
@@ -378,10 +572,86 @@ class imshowFrame(FrameBase):
                 pass
         return actual_time
 
+    def open_rendercache(self, directory, dtype=np.uint8):
+        '''
+        Start keeping the images this frame displays, already
+        transformed and color-normalized, as colormap indices in
+        a memory-mapped file. Later updates to timesteps that have
+        been rendered before (even in an earlier session) skip
+        reading, processing, and normalizing the image entirely.
+
+        The cache is keyed by the data (its description, times,
+        first and last images, and the names and modification
+        times of any files it reads from), the type of frame, the
+        processing steps, the displayed size, and the color
+        normalization, so changing any of these starts a new cache.
+        This should be called after the frame has been plotted.
+
+        Parameters
+        ----------
+        directory : str
+            The directory in which to keep render caches.
+
+        dtype : numpy dtype
+            np.uint8 stores 255 color levels per pixel,
+            np.uint16 stores 65535 (at twice the size).
+        '''
+        mappable = self.plotted['image']
+        norm, cmap = mappable.norm, mappable.cmap
+
+        # figure out the shape of the displayed images
+        image, actual_time = self._get_image()
+        displayimage, extent = self._get_display_image(image, 0)
+
+        # summarize everything that affects what's displayed
+        times = self._get_times()
+        key = _hash(repr(self.data), self.data.N, np.asarray(getattr(times, 'jd', times)),
+                    self._get_raw_image(0), self._get_raw_image(-1),
+                    _files_signature(self.data),
+                    type(self).__name__, self.processingsteps.signature,
+                    displayimage.shape, extent,
+                    _norm_signature(norm, cmap), np.dtype(dtype).name)
+
+        self._render = RenderCache(directory, key, (self.data.N,) + displayimage.shape, dtype=dtype)
+        self._renderlut = colormap_lut(cmap, dtype)
+        self._renderextent = extent
+        return self._render
+
+    def _get_rendered(self, timestep, time):
+        '''
+        Get the RGBA image to display for a timestep,
+        from the render cache (rendering it, if need be).
+        '''
+        indices = self._render.get(timestep)
+        if indices is None:
+            image, actual_time = self._get_image(time)
+            if image is None:
+                return None
+            displayimage, extent = self._get_display_image(image, timestep)
+            indices = quantize(displayimage, self.plotted['image'].norm, self._render.dtype)
+            self._render.put(timestep, indices)
+        return self._renderlut[indices]
+
     def update(self, time):
         '''
         Update this frame to a particular time (for use in animations).
         '''
+        # draw straight from the render cache, if there is one
+        if self._render is not None:
+            timestep = self._find_timestep(time)
+            if timestep != self.currenttimestep:
+                if 'image' in self.plotingredients:
+                    rendered = self._get_rendered(timestep, time)
+                    if rendered is None:
+                        return
+                    self.plotted['image'].set_data(rendered)
+                    if list(self.plotted['image'].get_extent()) != self._renderextent:
+                        self.plotted['image'].set_extent(self._renderextent)
+                if 'time' in self.plotingredients:
+                    self.plotted['time'].set_text(self._timestring(self._get_times()[timestep]))
+            self.currenttimestep = timestep
+            return
+
         # update the data, if we need to
         timestep = self._find_timestep(time)
         image, actual_time = self._get_image(time)
@@ -390,7 +660,10 @@ class imshowFrame(FrameBase):
 
         if timestep != self.currenttimestep:
             if 'image' in self.plotingredients:
-                self.plotted['image'].set_data(image)
+                displayimage, extent = self._get_display_image(image, timestep)
+                self.plotted['image'].set_data(displayimage)
+                if list(self.plotted['image'].get_extent()) != extent:
+                    self.plotted['image'].set_extent(extent)
             if 'time' in self.plotingredients:
                 self.plotted['time'].set_text(self._timestring(actual_time))
         self.currenttimestep = timestep
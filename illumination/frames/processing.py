@@ -0,0 +1,383 @@
+'''
+Processing stages that can be chained together to change
+the images an imshowFrame displays (subtracting a median,
+removing a smooth background, differencing neighbors,
+masking cosmic rays, ...), and a pipeline to run them.
+'''
+
+from ..imports import *
+from ..sequences.caches import LRUCache
+
+__all__ = ['ProcessingStage', 'BatchStage', 'ProcessingPipeline', 'register_stage', 'processingstages']
+
+# the stages that can be named (as strings) in a list of processingsteps
+processingstages = {}
+
+def register_stage(stage):
+    '''
+    Make a processing stage available by its name,
+    so it can be included in `processingsteps` as a string.
+    (This can be used as a class decorator.)
+
+    Parameters
+    ----------
+    stage : ProcessingStage subclass
+        The stage to register (under `stage.name`).
+    '''
+    processingstages[stage.name] = stage
+    return stage
+
+def _as_working(image):
+    '''
+    Make sure an image (or stack of them) can hold
+    negative and fractional values, like differences.
+    '''
+    image = np.asarray(image)
+    return image.astype(working_dtype(image.dtype), copy=False)
+
+class ProcessingStage(Talker):
+    '''
+    One step of processing, which makes a new image out
+    of the images coming from the step before it.
+
+    Stages declare what they depend on, so the pipeline
+    can gather it for them:
+
+        `offsets` are the timesteps (relative to the one being
+        made) of the previous step's images that this stage needs,
+        like (0, -1) to compare each image to the one before it.
+        (They wrap around the ends of the sequence.)
+
+        `requires` are the names of whole-sequence reference
+        images (like 'median' or 'mean') that this stage needs,
+        which are calculated from the raw data, only once.
+
+    New stages should define `process`, and can define
+    `process_batch` to handle a whole stack of images at once.
+    '''
+
+    # the name of this stage, for including it in processingsteps
+    name = 'nothing'
+
+    # which of the previous step's images are needed?
+    offsets = (0,)
+
+    # which reference images (from the raw data) are needed?
+    requires = ()
+
+    def __init__(self, **settings):
+        '''
+        Initialize this stage, with any settings it needs.
+        '''
+        Talker.__init__(self)
+        self.settings = settings
+        for k, v in settings.items():
+            setattr(self, k, v)
+
+    def __repr__(self):
+        return '<{} stage>'.format(self.name)
+
+    @property
+    def signature(self):
+        '''
+        Something that identifies what this stage does
+        (its name and settings), for caching its results.
+        '''
+        return (self.name,) + tuple(sorted(self.settings.items()))
+
+    def process(self, inputs, references):
+        '''
+        Make one processed image.
+
+        Parameters
+        ----------
+        inputs : array
+            The previous step's images, with shape
+            (len(offsets) x nrows x ncols), in the order of `offsets`.
+
+        references : dict
+            The reference images listed in `requires`.
+
+        Returns
+        -------
+        image : array
+            The processed image.
+        '''
+        return inputs[0]
+
+    def process_batch(self, inputs, references):
+        '''
+        Make a whole stack of processed images at once.
+        (By default, this calls `process` on each one.)
+
+        Parameters
+        ----------
+        inputs : array
+            The previous step's images, with shape
+            (ntimes x len(offsets) x nrows x ncols).
+
+        references : dict
+            The reference images listed in `requires`.
+
+        Returns
+        -------
+        images : array
+            The processed images, with shape (ntimes x nrows x ncols).
+        '''
+        return np.array([self.process(i, references) for i in inputs])
+
+class BatchStage(ProcessingStage):
+    '''
+    A processing stage that's written to work on a whole stack
+    of images at once. These define only `process_batch`,
+    and a single image is processed as a stack of one.
+    '''
+
+    def process(self, inputs, references):
+        return self.process_batch(inputs[np.newaxis], references)[0]
+
+@register_stage
+class SubtractMedian(BatchStage):
+    '''
+    Subtract the median image of the whole sequence.
+    '''
+    name = 'subtractmedian'
+    requires = ('median',)
+
+    def process_batch(self, inputs, references):
+        return _as_working(inputs[:, 0]) - references['median']
+
+@register_stage
+class SubtractMean(SubtractMedian):
+    '''
+    Subtract the mean image of the whole sequence.
+    '''
+    name = 'subtractmean'
+    requires = ('mean',)
+
+    def process_batch(self, inputs, references):
+        return _as_working(inputs[:, 0]) - references['mean']
+
+@register_stage
+class SubtractPrevious(BatchStage):
+    '''
+    Subtract the image before each one.
+    (The first image has the last subtracted from it.)
+    '''
+    name = 'subtractprevious'
+    offsets = (0, -1)
+
+    def process_batch(self, inputs, references):
+        return _as_working(inputs[:, 0]) - inputs[:, 1]
+
+@register_stage
+class SubtractBeforeAndAfter(BatchStage):
+    '''
+    Subtract the average of the images before and after each one.
+    '''
+    name = 'subtractbeforeandafter'
+    offsets = (0, -1, 1)
+
+    def process_batch(self, inputs, references):
+        inputs = _as_working(inputs)
+        return inputs[:, 0] - 0.5*(inputs[:, 1] + inputs[:, 2])
+
+@register_stage
+class SubtractBackground(BatchStage):
+    '''
+    Subtract a smooth background, estimated as the median
+    within square boxes of pixels (of size `boxsize`).
+    '''
+    name = 'subtractbackground'
+    boxsize = 32
+
+    def background(self, images):
+        '''
+        Estimate the background for a stack of images.
+        '''
+        n, ny, nx = images.shape
+        b = self.boxsize
+        by, bx = -(-ny//b), -(-nx//b)
+        padded = np.full((n, by*b, bx*b), np.nan, dtype=working_dtype(images.dtype))
+        padded[:, :ny, :nx] = images
+        boxes = padded.reshape(n, by, b, bx, b)
+        with warnings.catch_warnings():
+            # boxes that are entirely NaN should stay NaN quietly
+            warnings.simplefilter('ignore', RuntimeWarning)
+            coarse = np.nanmedian(boxes, axis=(2, 4))
+        return np.repeat(np.repeat(coarse, b, axis=1), b, axis=2)[:, :ny, :nx]
+
+    def process_batch(self, inputs, references):
+        images = _as_working(inputs[:, 0])
+        return images - self.background(images)
+
+@register_stage
+class MaskCosmics(BatchStage):
+    '''
+    Mask (set to NaN) pixels that jump up above both the images
+    before and after them, by more than `nsigma` times the
+    (robust) noise in the difference, like cosmic rays do.
+    '''
+    name = 'maskcosmics'
+    offsets = (0, -1, 1)
+    nsigma = 5
+
+    def process_batch(self, inputs, references):
+        inputs = _as_working(inputs)
+        images = inputs[:, 0].copy()
+        difference = images - np.maximum(inputs[:, 1], inputs[:, 2])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            center = np.nanmedian(difference, axis=(1, 2))[:, np.newaxis, np.newaxis]
+            noise = 1.4826*np.nanmedian(np.abs(difference - center), axis=(1, 2))[:, np.newaxis, np.newaxis]
+            images[difference - center > self.nsigma*noise] = np.nan
+        return images
+
+class ProcessingPipeline(Talker):
+    '''
+    A chain of processing stages, each working on the images
+    made by the one before it, with their results cached
+    (by timestep) so that stepping back and forth, or sharing
+    intermediate steps, doesn't recompute anything.
+    '''
+
+    def __init__(self, steps=[], read=None, data=None, cachesize=256e6):
+        '''
+        Initialize a pipeline.
+
+        Parameters
+        ----------
+        steps : list
+            The processing steps to apply, in order, each either
+            the name of a registered stage (like 'subtractmedian')
+            or a ProcessingStage.
+
+        read : function
+            A function that returns the raw image for a timestep.
+
+        data : Image_Sequence
+            The sequence being processed (for its length,
+            and for calculating any reference images).
+
+        cachesize : float
+            The maximum number of bytes of processed images
+            to keep in memory. (Set to 0 to disable.)
+        '''
+        Talker.__init__(self)
+        self.read = read
+        self.data = data
+
+        # make sure every step is a stage
+        self.stages = []
+        for step in steps:
+            if isinstance(step, ProcessingStage):
+                self.stages.append(step)
+            else:
+                try:
+                    self.stages.append(processingstages[step]())
+                except KeyError:
+                    raise ValueError('"{}" is not a processing step; try one of {}'.format(
+                                        step, list(processingstages)))
+
+        # keep the intermediate results from every stage
+        self._cache = LRUCache(maxbytes=cachesize, name='processed')
+
+    def __len__(self):
+        return len(self.stages)
+
+    def __iter__(self):
+        return iter(self.stages)
+
+    def __repr__(self):
+        return '<pipeline of {}>'.format(' > '.join(s.name for s in self.stages) or 'nothing')
+
+    @property
+    def signature(self):
+        '''
+        Something that identifies all the steps in this pipeline.
+        '''
+        return tuple(s.signature for s in self.stages)
+
+    def clear(self):
+        '''
+        Forget every cached result (if the data have changed).
+        '''
+        self._cache.clear()
+
+    def is_cached(self, timestep):
+        '''
+        Has the fully processed image for this timestep already been made?
+        '''
+        return (self.signature, timestep % self.data.N) in self._cache
+
+    def _references(self, stage):
+        '''
+        Get the reference images a stage requires.
+        '''
+        return {name: getattr(self.data, name)() for name in stage.requires}
+
+    def get(self, timestep):
+        '''
+        Get one fully processed image.
+
+        Parameters
+        ----------
+        timestep : int
+            Which image to process.
+        '''
+        return self.get_batch([timestep])[0]
+
+    def get_batch(self, timesteps):
+        '''
+        Process a chunk of images at once. Each stage runs once,
+        on a stack of all the images it needs to make (including
+        any neighbors the next stage needs), so chained steps cost
+        one pass through the chunk, and every raw image is read
+        only once.
+
+        Parameters
+        ----------
+        timesteps : list
+            Which images to process.
+
+        Returns
+        -------
+        images : array
+            The processed images, with shape (ntimes x nrows x ncols).
+        '''
+
+        N = self.data.N
+        timesteps = [t % N for t in timesteps]
+        K = len(self.stages)
+
+        # work backward, to figure out what each stage still needs to make
+        # (and which of the previous stage's images it needs for that)
+        made = [dict() for _ in range(K+1)]
+        missing = [[] for _ in range(K+1)]
+        needed = set(timesteps)
+        for k in range(K, 0, -1):
+            prefix = self.signature[:k]
+            for t in sorted(needed):
+                cached = self._cache.get((prefix, t))
+                if cached is None:
+                    missing[k].append(t)
+                else:
+                    made[k][t] = cached
+            needed = set((t + o) % N for t in missing[k] for o in self.stages[k-1].offsets)
+
+        # read the raw images
+        made[0] = {t: self.read(t) for t in sorted(needed)}
+
+        # then work forward, running each stage on the whole chunk
+        for k in range(1, K+1):
+            if len(missing[k]) == 0:
+                continue
+            stage = self.stages[k-1]
+            inputs = np.array([[made[k-1][(t + o) % N] for o in stage.offsets] for t in missing[k]])
+            processed = stage.process_batch(inputs, self._references(stage))
+            for t, image in zip(missing[k], processed):
+                image.flags.writeable = False
+                self._cache.put((self.signature[:k], t), image)
+                made[k][t] = image
+
+        return np.array([made[K][t] for t in timesteps])
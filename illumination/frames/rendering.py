@@ -0,0 +1,185 @@
+'''
+A cache of images that have already been transformed and
+color-normalized for display, stored on disk as (memory-mapped)
+integer colormap indices, so animating the same data again
+(at a different fps, or into a different format) can skip
+reading, processing, and normalizing every image.
+'''
+
+import hashlib
+from ..imports import *
+
+__all__ = ['RenderCache', 'quantize', 'colormap_lut']
+
+def _levels(dtype):
+    '''
+    How many colors can be stored in an integer dtype?
+    (The largest value is saved for bad pixels.)
+    '''
+    return int(np.iinfo(dtype).max)
+
+def quantize(image, norm, dtype=np.uint8):
+    '''
+    Apply a color normalization to an image, and round
+    it to integer indices into a colormap lookup table.
+
+    Parameters
+    ----------
+    image : array
+        The (transformed) image to normalize.
+
+    norm : matplotlib.colors.Normalize
+        The normalization to apply.
+
+    dtype : numpy dtype
+        The integer dtype of the indices (np.uint8 or np.uint16).
+
+    Returns
+    -------
+    indices : array
+        The colormap index of each pixel, where the largest
+        value of the dtype marks bad (masked or NaN) pixels.
+    '''
+    levels = _levels(dtype)
+    scaled = np.ma.masked_invalid(norm(image), copy=False)
+    indices = np.clip(np.floor(scaled.filled(0)*levels), 0, levels - 1).astype(dtype)
+    indices[np.ma.getmaskarray(scaled)] = levels
+    return indices
+
+def colormap_lut(cmap, dtype=np.uint8):
+    '''
+    Make the lookup table that turns indices (from `quantize`)
+    into RGBA colors, as an (nlevels + 1) x 4 array of bytes.
+
+    Parameters
+    ----------
+    cmap : str, matplotlib.colors.Colormap
+        The colormap.
+
+    dtype : numpy dtype
+        The integer dtype of the indices.
+    '''
+    cmap = plt.get_cmap(cmap)
+    levels = _levels(dtype)
+    lut = np.empty((levels + 1, 4), dtype=np.uint8)
+    lut[:levels] = cmap((np.arange(levels) + 0.5)/levels, bytes=True)
+    lut[levels] = cmap(np.ma.masked_invalid([np.nan]), bytes=True)[0]
+    return lut
+
+def _norm_signature(norm, cmap):
+    '''
+    Summarize a normalization and colormap, for the cache key.
+    '''
+    cmap = plt.get_cmap(cmap)
+    return (type(norm).__name__,
+            [float(getattr(norm, k)) for k in ['vmin', 'vmax', 'linthresh', 'linscale', 'base']
+                                      if getattr(norm, k, None) is not None],
+            cmap.name, cmap.N)
+
+def _files_signature(data):
+    '''
+    Summarize the files a sequence reads from (their names and
+    modification times), for the cache key, so that files that
+    are rewritten (or added) don't reuse stale renders.
+    '''
+    filenames = getattr(data, 'filenames', None)
+    if filenames is None:
+        filename = getattr(data, 'filename', None)
+        filenames = [] if filename is None else [filename]
+    filenames = [str(f) for f in filenames]
+    mtimes = []
+    for f in filenames:
+        try:
+            mtimes.append(os.path.getmtime(f))
+        except (IOError, OSError):
+            mtimes.append(None)
+    return filenames, mtimes
+
+class RenderCache(Talker):
+    '''
+    An on-disk store of the color-normalized images
+    displayed by one frame, one per timestep.
+    '''
+
+    def __init__(self, directory, key, shape, dtype=np.uint8):
+        '''
+        Open a render cache (creating it, if it doesn't exist yet).
+
+        Parameters
+        ----------
+        directory : str
+            The directory where render caches are kept.
+
+        key : str
+            A key identifying the data and every setting that
+            affects what's displayed (see `imshowFrame.open_rendercache`).
+
+        shape : tuple
+            The (ntimes x nrows x ncols) shape of the displayed images.
+
+        dtype : numpy dtype
+            The integer dtype of the stored colormap indices.
+        '''
+        Talker.__init__(self)
+        mkdir(directory)
+        self.key = key
+        self.dtype = np.dtype(dtype)
+
+        indicespath = os.path.join(directory, '{}.npy'.format(key))
+        filledpath = os.path.join(directory, '{}-filled.npy'.format(key))
+        try:
+            self.indices = np.lib.format.open_memmap(indicespath, mode='r+')
+            self.filled = np.lib.format.open_memmap(filledpath, mode='r+')
+            assert(self.indices.shape == tuple(shape))
+            assert(self.indices.dtype == self.dtype)
+            self.speak('reusing {} rendered images from {}'.format(np.sum(self.filled), indicespath))
+        except (IOError, OSError, ValueError, AssertionError):
+            self.indices = np.lib.format.open_memmap(indicespath, mode='w+', dtype=self.dtype, shape=tuple(shape))
+            self.filled = np.lib.format.open_memmap(filledpath, mode='w+', dtype=bool, shape=(shape[0],))
+            self.speak('created a render cache at {}'.format(indicespath))
+
+    def __repr__(self):
+        return '<render cache {} | {}/{} rendered>'.format(self.key, np.sum(self.filled), len(self.filled))
+
+    @property
+    def complete(self):
+        '''
+        Has every timestep been rendered?
+        '''
+        return bool(np.all(self.filled))
+
+    def get(self, timestep):
+        '''
+        Get the stored indices for a timestep (or None, if it hasn't been rendered).
+        '''
+        if self.filled[timestep]:
+            return self.indices[timestep]
+        return None
+
+    def put(self, timestep, indices):
+        '''
+        Store the indices for a timestep.
+        '''
+        self.indices[timestep] = indices
+        self.filled[timestep] = True
+
+    def flush(self):
+        '''
+        Make sure everything stored so far is written to disk.
+        '''
+        self.indices.flush()
+        self.filled.flush()
+
+def _hash(*things):
+    '''
+    Make a short, stable hash of some things
+    (arrays are hashed by their contents).
+    '''
+    h = hashlib.sha1()
+    for thing in things:
+        if isinstance(thing, np.ndarray):
+            h.update(np.ascontiguousarray(thing).tobytes())
+            h.update(str((thing.shape, thing.dtype)).encode())
+        else:
+            h.update(repr(thing).encode())
+    return h.hexdigest()[:20]
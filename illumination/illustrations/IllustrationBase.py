@@ -1,10 +1,20 @@
+import multiprocessing
+import tempfile
 from ..imports import *
 from ..sequences import *
 from ..frames import *
-from ..colors import cmap_norm_ticks
+from ..colors import cmap_norm_ticks, ValueSketch
 from ..utilities import *
 
 
+def _render_segment(illustration, filename, times, fps, dpi, prefetch, prefetchkw):
+    '''
+    Render one segment of an animation (in a forked process,
+    which has its own copy of the illustration).
+    '''
+    illustration._render(filename, times, fps, dpi, prefetch, prefetchkw)
+
+
 class IllustrationBase(Talker):
     '''
     This contains the basic layout and organization
@@ -168,13 +178,65 @@ class IllustrationBase(Talker):
         for k, f in self.frames.items():
             f.update(*args, **kwargs)
 
-    def _cmap_norm_ticks(self, remake=False, **cmapkw):
+    def refresh(self):
+        '''
+        Pull any new images into the (live) sequences shown in this
+        illustration, and (if there were any) update every frame to
+        show the latest time.
+
+        Returns
+        -------
+        nnew : int
+            How many new images were added, across all sequences.
+        '''
+        nnew, refreshed = 0, []
+        for f in self.frames.values():
+            data = getattr(f, 'data', None)
+            if (not hasattr(data, 'refresh')) or np.any([data is r for r in refreshed]):
+                continue
+            nnew += data.refresh()
+            refreshed.append(data)
+        if nnew == 0:
+            return 0
+
+        # the set of times has changed, and timesteps may have shifted
+        self._precaculatedtimesandcadence = {}
+        for f in self.frames.values():
+            f.currenttimestep = None
+            f._precaculatedtimesandcadence = {}
+            if hasattr(f, '_pyramid'):
+                f._pyramid.clear()
+            if hasattr(f, '_rawwindow'):
+                f._rawwindow.clear()
+                f.processingsteps.clear()
+                f._render = None
+
+        # show the latest data
+        if self.hasbeenplotted:
+            self.update(self._get_times().max())
+        return nnew
+
+    def _cmap_norm_ticks(self, remake=False, ntimes=1, **cmapkw):
         '''
         Return the cmap and normalization.
 
         Make a colorbar for this illustration,
         using the first image from every frame.
 
+        Each image is summarized by a small sketch of its
+        values, and the sketches are merged, so the pixels
+        from all the frames never need to be collected at once.
+
+        Parameters
+        ----------
+        remake : bool
+            Should the color scheme be remade, even if it exists?
+
+        ntimes : int
+            How many (evenly spaced) times should be included,
+            for a color scheme that suits the whole animation?
+            (1 uses only the first image from each frame.)
+
         **kwargs are passed to colors.cmap_norm_ticks
         '''
 
@@ -187,11 +249,18 @@ class IllustrationBase(Talker):
             assert(remake == False)
         except (KeyError, AssertionError):
 
-            # collect all the (first) images
-            firstimages = []
+            # sketch all the (first) images
+            sketch = ValueSketch()
             for name, frame in self.frames.items():
                 try:
-                    firstimages.extend(frame._get_image()[0].flatten())
+                    if ntimes > 1:
+                        times = frame._get_times()
+                        indices = np.unique(np.linspace(0, len(times) - 1, ntimes).astype(int))
+                        times = [times[i] for i in indices]
+                    else:
+                        times = [None]
+                    for time in times:
+                        sketch.add(frame._get_image(time)[0])
                     self.speak('included {} in the shared color scheme'.format(frame))
                 except (TypeError, IndexError, AttributeError):
                     self.speak('found no color scheme data for {}'.format(frame))
@@ -199,7 +268,7 @@ class IllustrationBase(Talker):
             # create the cmap from the given data
             (self.plotted['cmap'],
              self.plotted['norm'],
-             self.plotted['ticks']) = cmap_norm_ticks(np.asarray(firstimages),
+             self.plotted['ticks']) = cmap_norm_ticks(sketch,
                                                       **cmapkw)
             self.speak('defined color scheme with \n cmap={}\n norm={}\n ticks={}'.format(self.plotted['cmap'],
                                                                                           self.plotted['norm'],
@@ -294,9 +363,41 @@ class IllustrationBase(Talker):
         self.speak('saved figure to {}'.format(filename))
 
 
+    def _prefetchers(self, times, **prefetchkw):
+        '''
+        Create a prefetcher for every sequence in this illustration,
+        following the order in which an animation will access them.
+
+        Parameters
+        ----------
+
+        times : array
+            The GPS times that will be animated, in order.
+
+        **prefetchkw are passed to Prefetcher
+        '''
+
+        # figure out which timesteps each (unique) sequence will need
+        prefetchers = []
+        for f in self.frames.values():
+            data = getattr(f, 'data', None)
+            if not getattr(data, '_prefetchable', False):
+                continue
+            if (getattr(f, '_render', None) is not None) and f._render.complete:
+                # (this frame won't need to read anything)
+                continue
+            if np.any([p.sequence is data for p in prefetchers]):
+                continue
+            schedule = data.find_timesteps(Time(times, format='gps', scale='tdb'))
+            prefetchers.append(Prefetcher(data, schedule, **prefetchkw))
+        return prefetchers
+
     def animate(self, filename='test.mp4',
                       mintime=None, maxtimespan=None, cadence=1 * u.s,
-                      fps=30, dpi=None, **kw):
+                      fps=30, dpi=None,
+                      prefetch=True, prefetchkw=dict(),
+                      rendercache=None, renderdtype=np.uint8,
+                      nprocesses=1, **kw):
         '''
         Create an animation from an Illustration,
         using the time axes associated with each frame.
@@ -307,11 +408,42 @@ class IllustrationBase(Talker):
         ----------
 
         filename : str
+
+        prefetch : bool
+            Should images be read (in the background) ahead of
+            when they are needed, following the animation's schedule?
+
+        prefetchkw : dict
+            Keywords (like `lookahead`, `nworkers`, `processes`)
+            to pass along to each sequence's Prefetcher.
+
+        rendercache : str, None
+            A directory in which to keep every displayed image,
+            already color-normalized, so animating the same data
+            again (with the same settings) can skip straight to
+            drawing. (None doesn't keep them.)
+
+        renderdtype : numpy dtype
+            np.uint8 (255 colors) or np.uint16 (65535 colors),
+            for the images in the render cache.
+
+        nprocesses : int
+            How many processes should render the animation at once?
+            With more than one, the times are split into consecutive
+            segments, each rendered (by a forked copy of this
+            illustration) into its own file, and the segments are
+            then joined together without re-encoding.
         '''
 
         if self.hasbeenplotted == False:
             self.plot()
 
+        # draw from (and fill) render caches, if requested
+        if rendercache is not None:
+            for f in self.frames.values():
+                if isinstance(f, imshowFrame) and (type(f).update is imshowFrame.update):
+                    f.open_rendercache(rendercache, dtype=renderdtype)
+
         # figure out the times to display
         if mintime is None:
             actualtimes, actualcadence = self._timesandcadence(
@@ -336,25 +468,118 @@ class IllustrationBase(Talker):
             len(times), cadence, self))
         fps = 3
 
-        # get the writer
-        writer = get_writer(filename, fps=fps)
         print("FPS:",fps)
         self.speak('the animation will be saved to {}'.format(filename))
-        # set up the animation writer
-        with writer.saving(self.figure,
-                           filename,
-                           dpi or self.figure.get_dpi()):
-            for i, t in enumerate(times):
-                self.speak('  {}/{} at {}'.format(i + 1,
-                            len(times), Time.now().iso), progress=True)
-
-                # update the illustration to a new time
-                print(Time(t, format='gps', scale='tdb'))
-                self.update(Time(t, format='gps', scale='tdb'))
-                writer.grab_frame()
+
+        if (nprocesses > 1) and ('fork' not in multiprocessing.get_all_start_methods()):
+            self.speak('processes cannot be forked here, so rendering with only one')
+            nprocesses = 1
+
+        if nprocesses > 1:
+            self._render_in_parallel(filename, times, fps, dpi, prefetch, prefetchkw, nprocesses)
+        else:
+            self._render(filename, times, fps, dpi, prefetch, prefetchkw)
         self.speak('')
         self.speak('the animation is finished!')
 
+    def _render(self, filename, times, fps, dpi, prefetch=True, prefetchkw=dict()):
+        '''
+        Render an animation of this illustration at a list of times.
+
+        Parameters
+        ----------
+
+        filename : str
+            The file to write the animation into.
+
+        times : array
+            The GPS times to animate, in order.
+
+        fps : float
+            Frames/second.
+
+        dpi : float, None
+            The resolution of each frame (None uses the figure's).
+
+        prefetch : bool
+            Should images be read (in the background) ahead of time?
+
+        prefetchkw : dict
+            Keywords to pass along to each sequence's Prefetcher.
+        '''
+
+        # get the writer
+        writer = get_writer(filename, fps=fps)
+
+        # read upcoming images in the background, while rendering
+        if prefetch:
+            prefetchers = [p.start() for p in self._prefetchers(times, **prefetchkw)]
+        else:
+            prefetchers = []
+
+        # set up the animation writer
+        try:
+            with writer.saving(self.figure,
+                               filename,
+                               dpi or self.figure.get_dpi()):
+                for i, t in enumerate(times):
+                    self.speak('  {}/{} at {}'.format(i + 1,
+                                len(times), Time.now().iso), progress=True)
+                    for p in prefetchers:
+                        p.advance(i)
+
+                    # update the illustration to a new time
+                    print(Time(t, format='gps', scale='tdb'))
+                    self.update(Time(t, format='gps', scale='tdb'))
+                    writer.grab_frame()
+        finally:
+            for p in prefetchers:
+                p.stop()
+            for f in self.frames.values():
+                if getattr(f, '_render', None) is not None:
+                    f._render.flush()
+
+    def _render_in_parallel(self, filename, times, fps, dpi, prefetch, prefetchkw, nprocesses):
+        '''
+        Render an animation in consecutive segments, each in its own
+        (forked) process, and then join the segments together.
+
+        Parameters are the same as for `_render`, plus:
+
+        nprocesses : int
+            How many segments should be rendered at once?
+        '''
+
+        # split the times into one consecutive segment per process
+        segments = [s for s in np.array_split(times, nprocesses) if len(s) > 0]
+        directory = tempfile.mkdtemp(prefix='segments-', dir=os.path.dirname(os.path.abspath(filename)))
+        extension = os.path.splitext(filename)[1]
+        filenames = [os.path.join(directory, 'segment{:04}{}'.format(i, extension)) for i in range(len(segments))]
+        self.speak('rendering {} segments in parallel, in {}'.format(len(segments), directory))
+
+        # render each segment in a forked copy of this illustration
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=_render_segment,
+                                     args=(self, f, s, fps, dpi, prefetch, prefetchkw))
+                     for f, s in zip(filenames, segments)]
+        try:
+            for p in processes:
+                p.start()
+            for p in processes:
+                p.join()
+            failed = [f for f, p in zip(filenames, processes) if p.exitcode != 0]
+            if len(failed) > 0:
+                raise RuntimeError('failed to render {}'.format(failed))
+
+            # stitch the segments together into the final animation
+            self.speak('joining {} segments into {}'.format(len(segments), filename))
+            join_animations(filenames, filename, fps=fps)
+        finally:
+            for p in processes:
+                if p.is_alive():
+                    p.terminate()
+            shutil.rmtree(directory, ignore_errors=True)
+
 """
 class Row(IllustrationBase):
 	'''
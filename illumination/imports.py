@@ -53,6 +53,47 @@ def mad(x):
     return np.nanmedian(np.abs(x - med))
 
 
+def storage_dtype(dtype):
+    '''
+    What dtype should raw images be stored in?
+
+    Images keep their native dtype (so uint16 or int32 counts
+    stay as compact integers), just converted to this machine's
+    byte order. Anything non-numeric is stored as float32.
+    '''
+    dtype = np.dtype(dtype)
+    if dtype.kind not in 'uif':
+        return np.dtype(np.float32)
+    return dtype.newbyteorder('=')
+
+
+def working_dtype(dtype):
+    '''
+    What dtype should products derived from images
+    (medians, means, differences, normalized images) be?
+
+    This is float32, unless the images hold more precision than
+    float32 can represent (float64, or integers wider than 16 bits),
+    in which case it's promoted to float64.
+    '''
+    return np.promote_types(storage_dtype(dtype), np.float32)
+
+
+def accumulator_dtype(dtype):
+    '''
+    What dtype should sums over many images be accumulated in?
+
+    Integers are summed as 64-bit integers (so they can't overflow)
+    and floats as float64 (so rounding errors don't pile up).
+    '''
+    dtype = storage_dtype(dtype)
+    if dtype.kind == 'u':
+        return np.dtype(np.uint64)
+    elif dtype.kind == 'i':
+        return np.dtype(np.int64)
+    return np.dtype(np.float64)
+
+
 def shared_directory(files, verbose=False):
     '''
     Find the shared base directory amongst a list of files.
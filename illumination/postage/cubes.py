@@ -122,7 +122,8 @@ class Cube(Talker):
 			self.colorbarlabelfordisplay = 'counts'
 
 		if what == 'differences':
-			self.todisplay = np.diff(self.photons, axis=0)
+			# (difference in the working dtype, so unsigned counts don't wrap)
+			self.todisplay = np.subtract(self.photons[1:], self.photons[:-1], dtype=working_dtype(self.photons.dtype))
 			#def label(i=0):
 			#	return '{}s - {}s (counts)'.format(self.temporal['TIME'][i+1], self.temporal['TIME'][i])
 			self.colorbarlabelfordisplay = 'difference (counts)'
@@ -206,24 +207,27 @@ class Cube(Talker):
 		'''
 		The median image.
 		'''
-		array = self.__dict__[which].astype(np.float64)
+		array = self.__dict__[which]
 		key = 'median'
 		try:
 			self.summaries[key+which]
 		except:
-			self.summaries[key+which] = np.median(array, timeaxis)
+			# (numpy sorts a copy in the native dtype)
+			self.summaries[key+which] = np.median(array, timeaxis).astype(working_dtype(array.dtype))
 		return self.summaries[key+which]
 
 	def mean(self, which='photons'):
 		'''
 		The mean image.
 		'''
-		array = self.__dict__[which].astype(np.float64)
+		array = self.__dict__[which]
 		key = 'mean'
 		try:
 			self.summaries[key+which]
 		except:
-			self.summaries[key+which] = np.mean(array, timeaxis)
+			# accumulate in float64, without copying the whole cube
+			mean = np.mean(array, timeaxis, dtype=np.float64)
+			self.summaries[key+which] = mean.astype(working_dtype(array.dtype))
 		return self.summaries[key+which]
 
 
@@ -231,11 +235,12 @@ class Cube(Talker):
 		'''
 		The median of the absolute deviation image.
 		'''
-		array = self.__dict__[which].astype(np.float64)
+		array = self.__dict__[which]
 		key = 'mad'
 		try:
 			self.summaries[key+which]
 		except:
+			# (subtracting the median promotes to the working dtype)
 			self.summaries[key+which] = np.median(np.abs(array - self.cubify(self.median(which))), timeaxis)
 		return self.summaries[key+which]
 
@@ -243,12 +248,13 @@ class Cube(Talker):
 		'''
 		The standard deviation image.
 		'''
-		array = self.__dict__[which].astype(np.float64)
+		array = self.__dict__[which]
 		key = 'std'
 		try:
 			self.summaries[key+which]
 		except:
-			self.summaries[key+which] = np.std(array, timeaxis)
+			std = np.std(array, timeaxis, dtype=np.float64)
+			self.summaries[key+which] = std.astype(working_dtype(array.dtype))
 		return self.summaries[key+which]
 
 	def sigma(self, which='photons', robust=True):
@@ -283,7 +289,7 @@ class Cube(Talker):
 		'''
 		Calculate the number of sigma of each deviation from the median.
 		'''
-		array = self.__dict__[which].astype(np.float64)
+		array = self.__dict__[which]
 		return (array - self.cubify(self.median(which)))/self.cubify(self.sigma(which, robust=robust))
 
 	def write(self, normalization='none', directory='cube'):
@@ -30,6 +30,18 @@ class Stacker(Talker):
 
         return np.sum(splitintosubexposures, 1)/nsubexposures
 
+    def _stacked_dtype(self, dtype):
+        '''
+        What dtype should a (rescaled) stack of images be returned in?
+        Floats keep their own precision, but integers are summed into
+        values that float32 can't always hold exactly, so they become
+        float64.
+        '''
+        dtype = storage_dtype(dtype)
+        if dtype.kind == 'f':
+            return dtype
+        return np.dtype(np.float64)
+
 class Sum(Stacker):
     '''
     Binning with Sum = simply sum along the time axis.
@@ -57,7 +69,11 @@ class Sum(Stacker):
         # reshape into something more convenient for summing
         splitintosubexposures = trimmed.reshape(exposures, nsubexposures, xpixels, ypixels)
 
-        return np.sum(splitintosubexposures, 1)
+        # (accumulate in 64 bits, so counts can't overflow or lose precision)
+        summed = np.sum(splitintosubexposures, 1, dtype=accumulator_dtype(array.dtype))
+        if summed.dtype.kind == 'f':
+            return summed.astype(self._stacked_dtype(array.dtype))
+        return summed
 
 
 class Central(Stacker):
@@ -102,11 +118,14 @@ class Central(Stacker):
         splitintochunks = splitintosubexposures.reshape( exposures, int(nsubexposures//self.n), self.n, xpixels, ypixels)
 
         # calculate the sum of the truncated means (and recalibrate to the original scale!!!)
-        sum = np.sum(splitintochunks, 2)
+        # (the min and max stay in the native dtype; sums are in 64 bits)
+        sum = np.sum(splitintochunks, 2, dtype=accumulator_dtype(array.dtype))
         min = np.min(splitintochunks, 2)
         max = np.max(splitintochunks, 2)
+        sum -= max
+        sum -= min
 
         # rescale back to the original scale
-        photons = np.sum(sum - max - min, 1)*self.n/self.m
+        photons = np.sum(sum, 1)*(float(self.n)/self.m)
 
-        return photons.squeeze()
+        return photons.astype(self._stacked_dtype(array.dtype), copy=False).squeeze()
@@ -105,7 +105,8 @@ class Stamp(Cube):
 		#	data = star.data.T
 		#else:
 		data = star.data
-		photons = np.empty((N, data.shape[0], data.shape[1]))
+		# (keep the photons in their native dtype, likely integer counts)
+		photons = np.empty((N, data.shape[0], data.shape[1]), dtype=storage_dtype(data.dtype))
 
 		# populate each time point
 		for i, f in enumerate(filenames):
@@ -195,7 +196,8 @@ class Stamp(Cube):
 
 		# make sure we're dealing with a npy saved file
 		assert('.npy' in filename)
-		loaded = np.load(filename, encoding='latin1')[()]
+		# (stamps are saved as a pickled dictionary, so they need to be unpickled)
+		loaded = np.load(filename, encoding='latin1', allow_pickle=True)[()]
 		self.__init__(self, **loaded)
 		self.speak('loaded from {}'.format(filename))
 
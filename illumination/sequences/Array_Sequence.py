@@ -4,24 +4,52 @@ Define a generic sequence of images.
 from .Image_Sequence import *
 
 class Array_Sequence(Image_Sequence):
-    def __init__(self, initial, name='array', time=None, temporal={}, spatial={}, **kwargs):
+    def __init__(self, initial, name='array', time=None, temporal=None, spatial=None,
+                 shape=None, dtype=None, offset=0, mmap_mode='r', memmap=True, **kwargs):
         '''
         Initialize a Sequence from 2D or 3D numpy array.
 
         Parameters
         ----------
-        initial : 2D/3D numpy array, or list of numpy arrays
+        initial : 2D/3D numpy array, or list of numpy arrays, or filename
             - a (ysize x = xsize)-shaped array = single image
             - a (ntimes x ysize x = xsize)-shaped array = multiple images
+            - a np.memmap of either of those shapes
+            - the path to a .npy file, which will be memory-mapped
+            - the path to a raw binary file (if `shape` and `dtype` are given)
 
         time : array, None
             An array of times for the sequence.
-        '''
 
+        shape : tuple, None
+            The (ntimes x ysize x xsize) shape of a raw binary file.
+
+        dtype : str, np.dtype, None
+            The dtype of the pixels in a raw binary file.
+
+        offset : int
+            How many bytes into a raw binary file do the images start?
 
+        mmap_mode : str
+            How should files be memory-mapped? ('r' = read-only)
+
+        memmap : bool
+            Should files be memory-mapped at all?
+            (If not, they're read into memory right away.)
+        '''
 
-        # make sure we're dealing with an array
-        array = np.atleast_2d(initial)
+        # open files as memory maps, which are read only as needed
+        if isinstance(initial, str):
+            self.filename = initial
+            if (shape is None) and (dtype is None):
+                initial = np.load(initial, mmap_mode=mmap_mode if memmap else None)
+            elif memmap:
+                initial = np.memmap(initial, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape)
+            else:
+                initial = np.fromfile(initial, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+
+        # make sure we're dealing with an array (without copying it)
+        array = np.asanyarray(initial)
 
         # handle a single image as a 1-element array
         if len(array.shape) == 2:
@@ -35,7 +63,32 @@ class Array_Sequence(Image_Sequence):
         # create a sequence
         Image_Sequence.__init__(self, name=name, time=time, temporal=temporal, spatial=spatial)
 
+    @property
+    def shape(self):
+        '''
+        Returns
+        -------
+        s : tuple
+            The shape of the image stack (ntimes x nrows x ncols)
+        '''
+        return self.images.shape
+
+    @property
+    def dtype(self):
+        '''
+        Returns
+        -------
+        dtype : numpy.dtype
+            The dtype in which the images are stored.
+        '''
+        return storage_dtype(self.images.dtype)
 
+    @property
+    def _ondisk(self):
+        '''
+        Are the images memory-mapped from a file (rather than in memory)?
+        '''
+        return isinstance(self.images, np.memmap) or isinstance(getattr(self.images, 'base', None), np.memmap)
 
     def __getitem__(self, timestep):
         '''
@@ -50,6 +103,8 @@ class Array_Sequence(Image_Sequence):
         '''
         if timestep is None:
             return None
+        elif self._is_selection(timestep):
+            return self.view(timestep)
         else:
             return self.images[timestep, :, :]
 
@@ -86,4 +141,7 @@ class Array_Sequence(Image_Sequence):
             The mean of the image sequence.
         '''
 
+        # stream through memory-mapped images, so they're never all loaded
+        if self._ondisk:
+            return Image_Sequence.mean(self)
         return np.mean(self.images, 0)
@@ -0,0 +1,261 @@
+'''
+Define a chunked, memory-mapped, on-disk store for a cube of
+images, and a sequence that reads from one. Reading a frame
+(or a pixel's time series) from a cube store is a contiguous
+read, no matter how many files the images originally came from.
+'''
+from .Image_Sequence import *
+from .Image_Sequence import _region_slices
+from .index import _encode, _decode
+
+__all__ = ['CubeStore_Sequence', 'write_cubestore']
+
+def _chunked_shape(shape, chunks):
+    '''
+    The shape of the stored array, which holds (ntimes x nrows x ncols)
+    as a grid of chunks, where each chunk is contiguous on disk.
+    '''
+    nchunks = [int(np.ceil(float(s)/c)) for s, c in zip(shape, chunks)]
+    return tuple(nchunks) + tuple(chunks)
+
+def write_cubestore(sequence, path, chunks=None, pixelmajor=False, maxmemory=256e6):
+    '''
+    Write the images in a sequence into a cube store.
+
+    Parameters
+    ----------
+    sequence : Image_Sequence
+        The sequence of images to store.
+
+    path : str
+        The directory where the cube store should be saved.
+
+    chunks : tuple, None
+        The (ntimes, nrows, ncols) shape of each chunk. Each chunk
+        is stored contiguously, so reads that line up with chunks
+        are fast. (None stores each whole frame as one chunk.)
+
+    pixelmajor : bool
+        Should we also store a transposed (nrows x ncols x ntimes)
+        copy, so each pixel's time series is one contiguous read?
+
+    maxmemory : float
+        Roughly how many bytes can be used while transposing?
+    '''
+
+    N, ny, nx = sequence.shape
+    if chunks is None:
+        chunks = (1, ny, nx)
+    chunks = tuple([int(np.minimum(c, s)) for c, s in zip(chunks, (N, ny, nx))])
+    ct, cy, cx = chunks
+
+    mkdir(path)
+
+    # don't let a transposed copy from an older store outlive it
+    stale = os.path.join(path, 'pixels.npy')
+    if os.path.exists(stale):
+        os.remove(stale)
+
+    first = sequence[0]
+    frames = np.lib.format.open_memmap(os.path.join(path, 'frames.npy'), mode='w+',
+                                       dtype=first.dtype, shape=_chunked_shape((N, ny, nx), chunks))
+    nty, ntx = frames.shape[1:3]
+
+    # write each frame into its spot in every chunk it touches
+    sequence.speak('writing {} frames into a cube store at {}'.format(N, path))
+    for i in range(N):
+        sequence.speak(' stored frame {}/{}'.format(i+1, N), progress=True)
+        padded = np.zeros((nty*cy, ntx*cx), dtype=first.dtype)
+        padded[:ny, :nx] = sequence[i]
+        frames[i//ct, :, :, i % ct] = padded.reshape(nty, cy, ntx, cx).transpose(0, 2, 1, 3)
+    frames.flush()
+
+    # save the time axis and metadata alongside the images
+    metadata = dict(shape=np.array([N, ny, nx]),
+                    chunks=np.array(chunks),
+                    gps=sequence.time.gps,
+                    scale=np.array(sequence.time.scale),
+                    format=np.array(sequence.time.format),
+                    timeisfake=np.array(sequence._timeisfake),
+                    name=np.array(sequence.name))
+    for k, v in getattr(sequence, 'temporal', {}).items():
+        if np.size(v) == N:
+            try:
+                array, missing, kind = _encode(list(v))
+            except (TypeError, ValueError):
+                continue
+            metadata['temporal/{}/{}'.format(k, kind)] = array
+            metadata['temporal/{}/missing'.format(k)] = missing
+    np.savez(os.path.join(path, 'metadata.npz'), **metadata)
+
+    store = CubeStore_Sequence(path)
+    if pixelmajor:
+        store.make_pixelmajor(maxmemory=maxmemory)
+    return store
+
+class CubeStore_Sequence(Image_Sequence):
+    '''
+    A sequence of images read from a (memory-mapped) cube store.
+    '''
+
+    def __init__(self, path, name=None, **kwargs):
+        '''
+        Initialize a Sequence from a cube store (see `write_cubestore`).
+
+        Parameters
+        ----------
+        path : str
+            The directory of the cube store.
+
+        name : str
+            The name of this sequence (defaults to the stored one).
+        '''
+
+        self.path = path
+        with np.load(os.path.join(path, 'metadata.npz'), allow_pickle=False) as z:
+            metadata = {k: z[k] for k in z.files}
+
+        Sequence.__init__(self, name=name or str(metadata['name']))
+        self._shape = tuple(metadata['shape'])
+        self.chunks = tuple(metadata['chunks'])
+
+        # the images, as a grid of chunks
+        self._frames = np.load(os.path.join(path, 'frames.npy'), mmap_mode='r')
+
+        # the (optional) pixel-major copy
+        try:
+            self._pixels = np.load(os.path.join(path, 'pixels.npy'), mmap_mode='r')
+        except (IOError, OSError):
+            self._pixels = None
+
+        # the time axis and temporal metadata
+        self.time = Time(metadata['gps'], format='gps', scale=str(metadata['scale']))
+        self.time.format = str(metadata['format'])
+        self._timeisfake = bool(metadata['timeisfake'])
+        self.temporal, self.static, self.spatial = {}, {}, {}
+        for key in metadata:
+            pieces = key.split('/')
+            if (pieces[0] == 'temporal') and (pieces[2] != 'missing'):
+                missing = metadata['temporal/{}/missing'.format(pieces[1])]
+                self.temporal[pieces[1]] = _decode(metadata[key], missing, pieces[2])
+
+    @property
+    def N(self):
+        '''
+        How many elements are in this sequence?
+        '''
+        return self._shape[0]
+
+    @property
+    def shape(self):
+        '''
+        Returns
+        -------
+        s : tuple
+            The shape of the image stack (ntimes x nrows x ncols)
+        '''
+        return self._shape
+
+    def _read(self, times, rows, cols):
+        '''
+        Read a (ntimes x nrows x ncols) block, touching only
+        the chunks that overlap it.
+
+        Parameters
+        ----------
+        times, rows, cols : slice
+            The ranges to read along each axis
+            (with positive steps, if any).
+        '''
+        ranges = [s.indices(n) for s, n in zip([times, rows, cols], self._shape)]
+
+        # which chunks are needed?
+        first = [start//c for (start, stop, step), c in zip(ranges, self.chunks)]
+        last = [np.maximum(stop - 1, start)//c + 1 for (start, stop, step), c in zip(ranges, self.chunks)]
+        block = self._frames[first[0]:last[0], first[1]:last[1], first[2]:last[2]]
+
+        # stitch those chunks together, and trim to the exact range
+        n = block.shape[:3]
+        block = block.transpose(0, 3, 1, 4, 2, 5).reshape(
+                    n[0]*self.chunks[0], n[1]*self.chunks[1], n[2]*self.chunks[2])
+        trimmed = [slice(start - f*c, stop - f*c, step)
+                   for (start, stop, step), f, c in zip(ranges, first, self.chunks)]
+        return block[tuple(trimmed)]
+
+    def __getitem__(self, timestep):
+        '''
+        Return the image data for a given timestep.
+
+        This function is called when you say `sequence[timestep]`.
+
+        Parameters
+        ----------
+        timestep : int
+            A timestep index (which element in the sequence do you want?)
+        '''
+        if timestep is None:
+            return None
+        elif self._is_selection(timestep):
+            return self.view(timestep)
+        else:
+            if timestep < 0:
+                timestep += self.N
+            if (timestep < 0) or (timestep >= self.N):
+                raise IndexError('timestep {} is out of range for {}'.format(timestep, self))
+            return self._read(slice(timestep, timestep + 1), slice(None), slice(None))[0]
+
+    def read_region(self, timestep, rows=None, cols=None, cache=True):
+        '''
+        Return a rectangular region of the image at a given timestep,
+        reading only the chunks that overlap it.
+        (see `Image_Sequence.read_region`)
+        '''
+        rows, cols = _region_slices(rows, cols)
+        if timestep < 0:
+            timestep += self.N
+        return self._read(slice(timestep, timestep + 1), rows, cols)[0]
+
+    def make_pixelmajor(self, maxmemory=256e6):
+        '''
+        Write a transposed (nrows x ncols x ntimes) copy of the
+        images, so each pixel's time series is contiguous.
+
+        Parameters
+        ----------
+        maxmemory : float
+            Roughly how many bytes can be used while transposing?
+        '''
+        N, ny, nx = self._shape
+        filename = os.path.join(self.path, 'pixels.npy')
+        pixels = np.lib.format.open_memmap(filename, mode='w+', dtype=self._frames.dtype, shape=(ny, nx, N))
+
+        # transpose one band of rows at a time
+        nrows = int(np.clip(maxmemory//(2*N*nx*self._frames.dtype.itemsize), 1, ny))
+        self.speak('writing a pixel-major copy of {}, {} rows at a time'.format(self, nrows))
+        for start in range(0, ny, nrows):
+            band = self._read(slice(None), slice(start, start + nrows), slice(None))
+            pixels[start:start + nrows] = band.transpose(1, 2, 0)
+        pixels.flush()
+        del pixels
+        self._pixels = np.load(filename, mmap_mode='r')
+
+    def pixel_timeseries(self, positions):
+        '''
+        Extract the time series of some individual pixels.
+
+        Parameters
+        ----------
+        positions : list of tuples
+            The (x, y) = (col, row) position of each pixel.
+
+        Returns
+        -------
+        timeseries : array
+            The pixel values, with shape (ntimes x npositions).
+        '''
+        x, y = np.atleast_2d(positions).astype(int).T
+        if self._pixels is not None:
+            # each pixel's time series is contiguous in the pixel-major copy
+            return np.array(self._pixels[y, x, :]).T
+        return np.array([self._read(slice(None), slice(j, j + 1), slice(i, i + 1))[:, 0, 0]
+                         for i, j in zip(x, y)]).T
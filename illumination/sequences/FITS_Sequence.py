@@ -4,9 +4,90 @@ Define a sequence of FITS images.
 
 from __future__ import print_function
 from .filenameparsers import *
+from .scanning import find_files
 from .Image_Sequence import *
+from .Image_Sequence import _region_slices
+from .caches import LRUCache
+from .headers import scan_headers, columns_from_headers
+from .index import SidecarIndex
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from astropy.io.fits.hdu.base import BITPIX2DTYPE
 
-__all__ = ['FITS_Sequence']
+__all__ = ['FITS_Sequence', 'is_fits_filename']
+
+# filename endings for FITS files (including compressed ones)
+fits_extensions = ['.fits', '.fit', '.fts', '.fz', '.fits.gz', '.fit.gz', '.fts.gz', '.fits.bz2']
+
+def is_fits_filename(filename):
+    '''
+    Does this filename look like a FITS file (compressed or not)?
+    '''
+    lower = filename.lower()
+    return ('fit' in lower) or np.any([lower.endswith(e) for e in fits_extensions])
+
+def _decode_fits_image(filename, ext_image, verify=True):
+    '''
+    Open a FITS file, and decode one image extension from it.
+
+    (This lives at the module level so it can be
+    handed off to other processes for prefetching.)
+    '''
+    with fits.open(filename, memmap=False, ignore_missing_end=True) as hdulist:
+        if verify:
+            hdulist.verify('fix+warn')
+        return hdulist[ext_image].data
+
+def _read_fits_pixels(filename, ext_image, x, y, verify=True):
+    '''
+    Read some individual pixels from one FITS image,
+    touching only the rows that contain them.
+
+    (This lives at the module level so it can be
+    handed off to other processes.)
+    '''
+    with fits.open(filename, memmap=True, ignore_missing_end=True) as hdulist:
+        if verify:
+            hdulist.verify('fix+warn')
+        hdu = hdulist[ext_image]
+        if _is_mappable(hdu):
+            # only the pages holding these pixels get read
+            return np.array(hdu.data[y, x])
+        rows = {r: hdu.section[r, :] for r in np.unique(y)}
+        return np.array([rows[j][i] for i, j in zip(x, y)])
+
+def _is_mappable(hdu):
+    '''
+    Are an HDU's pixels stored on disk exactly as they'd
+    be returned (so a memory map can be used directly)?
+
+    (Not if they're scaled, tile-compressed, or inside a gzipped file.)
+    '''
+    unscaled = (hdu.header.get('BSCALE', 1) == 1) and (hdu.header.get('BZERO', 0) == 0)
+    compressed = isinstance(hdu, fits.CompImageHDU) or (getattr(hdu._file, 'compression', None) is not None)
+    return unscaled and not compressed
+
+def _fits_layout(hdu):
+    '''
+    Where (and how) are a 2D image HDU's pixels stored in its
+    file, as (offset in bytes, dtype, shape)? This is None for
+    images that can't be read straight from the file.
+    '''
+    if (not _is_mappable(hdu)) or (hdu.header.get('NAXIS') != 2):
+        return None
+    dtype = np.dtype(BITPIX2DTYPE[hdu.header['BITPIX']]).newbyteorder('>')
+    return hdu.fileinfo()['datLoc'], dtype, hdu.shape
+
+def _read_fits_rows(filename, layout, rows):
+    '''
+    Read a band of rows straight from a FITS file, given its
+    `_fits_layout`, without opening (or verifying) it with astropy.
+    '''
+    offset, dtype, (ny, nx) = layout
+    start, stop, _ = rows.indices(ny)
+    nrows = np.maximum(stop - start, 0)
+    with open(filename, 'rb') as f:
+        f.seek(offset + start*nx*dtype.itemsize)
+        return np.fromfile(f, dtype=dtype, count=nrows*nx).reshape(nrows, nx)
 
 class FITS_Sequence(Image_Sequence):
     '''
@@ -18,6 +99,11 @@ class FITS_Sequence(Image_Sequence):
                        use_filenames=False,
                        filenameparser=flexible_filenameparser,
                        timekey=None, timeformat=None,
+                       cachesize=256e6, maxopenfiles=16,
+                       verify=True,
+                       nworkers=None, processes=False,
+                       index=False,
+                       memmap=False,
                        **kwargs):
         '''
         Initialize a Sequence of FITS images. The goal is
@@ -29,8 +115,9 @@ class FITS_Sequence(Image_Sequence):
             initial : many possible types
                 This is a flexible type of input, which could be...
                     - single FITS filename, and an extension to use.
-                    - list of FITS filenames, and an extension to use.
-                    - a glob-like search string containing '*'.
+                    - list (or array) of FITS filenames, and an extension to use.
+                    - a glob-like search string containing '*'
+                      (or '**', to search nested directories).
                     - single FITS HDUList, and an extension to use.
                     - list of loaded FITS HDULists, and an extension to use.
 
@@ -59,10 +146,62 @@ class FITS_Sequence(Image_Sequence):
             timeformt : string
                 What's the time format for defining the time axis?
 
+            cachesize : float
+                The maximum number of bytes of decoded images to keep
+                in memory, so recently viewed timesteps don't need to
+                be read from disk again. (Set to 0 to disable.)
+
+            maxopenfiles : int
+                The maximum number of FITS files to keep open at once.
+                (Set to 0 to reopen every file on every access.)
+
+            verify : bool
+                Should we run astropy's `verify('fix+warn')` on each file
+                as it is opened? (Skip this for files you trust.)
+
+            nworkers : int, None
+                How many threads (or processes) should be used to read
+                lots of files at once? (None picks a default; 1 is serial.)
+
+            processes : bool
+                Should those parallel reads use processes instead of threads?
+
+            index : bool, str
+                Should we keep a sidecar index of what's been learned
+                from the headers and filenames (and the time axis), so
+                only new or changed files need rescanning next time?
+                If True, the index is saved next to the files; if a
+                string, it's the path where the index should be saved.
+
+            memmap : bool
+                Should the files be memory-mapped? If so, images
+                are returned as views into the files (without
+                being copied into the cache), and `read_region`
+                touches only the bytes within the region.
+
         '''
         # initialize the basic sequence
         Sequence.__init__(self, name=name)
 
+        # keep recently decoded images (and open files) around
+        self.verify = verify
+        self.nworkers = nworkers
+        self.processes = processes
+        self.memmap = memmap
+        self._images = LRUCache(maxbytes=cachesize, name='image-cache')
+        self._openfiles = LRUCache(maxitems=maxopenfiles, name='file-cache',
+                                   onevict=lambda filename, hdulist: hdulist.close())
+        self._lastopened = None
+        self._imageshape = None
+        self._layouts = {}
+
+        # remember how this sequence was made, so new files can be added later
+        self._source = initial if isinstance(initial, str) else None
+        self._settings = dict(ext_image=ext_image, ext_primary=ext_primary, name=name,
+                              use_headers=use_headers, use_filenames=use_filenames,
+                              filenameparser=filenameparser, timekey=timekey, timeformat=timeformat,
+                              verify=verify, nworkers=nworkers, processes=processes, memmap=memmap)
+
         # we keep the HDUs out of memory, until we need them
         # (this should probably someday be rewritten as an iterator?)
         self._hdulists = None
@@ -74,10 +213,10 @@ class FITS_Sequence(Image_Sequence):
         elif type(initial) == str:
             # a search string
             if '*' in initial:
-                self.filenames = np.sort(glob.glob(initial))
+                self.filenames = find_files(initial)
                 #self.hdulists = [fits.open(f) for f in glob.glob(initial)]
             # a single file
-            elif 'fit' in initial.lower():
+            elif is_fits_filename(initial):
                 self.filenames = [initial]
                 #self.hdulists = [fits.open(initial)]
         elif type(initial) == list:
@@ -86,6 +225,9 @@ class FITS_Sequence(Image_Sequence):
                 self._hdulists = initial
             elif np.all([os.path.exists(s) for s in initial]):
                 self.filenames = initial
+        elif isinstance(initial, np.ndarray) and (initial.dtype.kind in 'US'):
+            # an array of filenames (as from `find_files` or `group_filenames`)
+            self.filenames = initial
 
         # if we're starting frmo hdulists, then get their filenames
         if self._hdulists is not None:
@@ -94,6 +236,9 @@ class FITS_Sequence(Image_Sequence):
 
         self.filenames = np.asarray(self.filenames)
 
+        # remember which files are already included (so refresh can skip them)
+        self._known = set(self.filenames)
+
         # make sure this FITS_Sequence isn't empty
         # assert(len(self.filenames) > 0)
 
@@ -105,7 +250,16 @@ class FITS_Sequence(Image_Sequence):
         self.temporal = {}
         self.static = {}
         self.spatial = {}
-        
+
+        # load the sidecar index (if we're using one)
+        self._index = None
+        if index and (self._hdulists is None) and (len(self.filenames) > 0):
+            settings = 'extensions={},{}'.format(self.ext_primary, self.ext_image)
+            if index is True:
+                self._index = SidecarIndex.near(self.filenames, settings=settings)
+            else:
+                self._index = SidecarIndex(index, settings=settings)
+
         # populate the temporal axes, somehow
         assert(use_headers or use_filenames)
         if use_headers:
@@ -119,8 +273,16 @@ class FITS_Sequence(Image_Sequence):
             except:
                 self.speak('unable to extract temporal things from filenames for {}'.format(self))
         
-        # make sure a time axis gets defined
-        self._define_time_axis(timekey=timekey, timeformat=timeformat)
+        # make sure a time axis gets defined (reusing the indexed one, if possible)
+        timesettings = 'timekey={}|timeformat={}|headers={}|filenames={}'.format(
+                            timekey, timeformat, use_headers, use_filenames and getattr(filenameparser, '__name__', filenameparser))
+        if not self._retrieve_time_axis(timesettings):
+            self._define_time_axis(timekey=timekey, timeformat=timeformat)
+            if (self._index is not None) and (not self._timeisfake):
+                self._index.store_time(self.filenames, self.time.gps, timesettings,
+                                       resolved='{}|{}'.format(self.time.scale, self.time.format))
+        if self._index is not None:
+            self._index.save()
 
         # Debug why sort breaks
         # self._count()
@@ -128,6 +290,27 @@ class FITS_Sequence(Image_Sequence):
         # make sure everything gets sorted by time
         self._sort()
     
+    def _retrieve_time_axis(self, timesettings):
+        '''
+        Try to pull an already-resolved time axis out of the sidecar index.
+
+        Returns
+        -------
+        success : bool
+            Was a time axis found for every file?
+        '''
+        if self._index is None:
+            return False
+        gps, resolved = self._index.retrieve_time(self.filenames, timesettings)
+        if gps is None:
+            return False
+        scale, format = resolved.split('|')
+        self.time = Time(gps, format='gps', scale=scale)
+        self.time.format = format
+        self._timeisfake = False
+        self.speak('using the indexed time axis for {}'.format(self))
+        return True
+
     def _count(self):
         '''
         Count the temporals
@@ -140,8 +323,13 @@ class FITS_Sequence(Image_Sequence):
         Sort the images, and the temporals.
         '''
 
+        # files that are already in order (as grouped by `group_filenames`) stay put
+        gps = self.time.gps
+        if np.all(np.diff(gps) >= 0):
+            return
+
         # calculate sorting indices
-        i = np.argsort(np.unique(self.time.gps))
+        i = np.argsort(gps, kind='stable')
         # print('i',i)
         # sort the temporal values
         for k in self.temporal.keys():
@@ -167,26 +355,357 @@ class FITS_Sequence(Image_Sequence):
         '''
         return len(self.filenames)
 
+    @property
+    def shape(self):
+        '''
+        Returns
+        -------
+        s : tuple
+            The shape of the image stack (ntimes x nrows x ncols),
+            figured out from the headers without reading any images.
+        '''
+        # (the image shape is found once, and remembered)
+        if self._imageshape is None:
+            self._imageshape = self._find_imageshape()
+        return (self.N,) + self._imageshape
+
+    def _find_imageshape(self):
+        '''
+        Figure out the (nrows x ncols) shape of each image,
+        from the index or the first file's header.
+        '''
+        if self._index is not None:
+            known = self._index.shapes(self.filenames[:1])[0]
+            if known is not None:
+                return tuple(known[0])
+        imageshape = self._get_hdulist(0)[self.ext_image].shape
+        if len(imageshape) < 2:
+            return tuple(Image_Sequence.shape.fget(self)[1:])
+        return (imageshape[0], imageshape[1])
+
     def _get_hdulist(self, i):
         '''
         Return an HDUlist for the ith element in the sequence.
 
-        (We might want to open them only one at a time, for memory's sake.)
+        (Files stay open in a small cache, so we don't need to
+        reopen and reverify them every time they are accessed.)
         '''
         if self._hdulists is not None:
             return self._hdulists[i]
         else:
-            hdulist = fits.open(self.filenames[i], memmap=False, ignore_missing_end=True)
-            hdulist.verify('fix+warn') 
+            filename = self.filenames[i]
+            hdulist = self._openfiles.get(filename)
+            if hdulist is None:
+                opened = fits.open(filename, memmap=self.memmap, ignore_missing_end=True)
+                if self.verify:
+                    opened.verify('fix+warn')
+
+                if not self._openfiles.enabled:
+                    # without a cache, keep only the latest file open
+                    if self._lastopened is not None:
+                        self._lastopened.close()
+                    self._lastopened = opened
+                    return opened
+
+                # (another thread might have opened the same file meanwhile)
+                hdulist = self._openfiles.setdefault(filename, opened, nbytes=0)
+                if hdulist is not opened:
+                    opened.close()
             return hdulist
 
+    @property
+    def _prefetchable(self):
+        '''
+        Can images be read ahead of time into the cache?
+        '''
+        return (self._hdulists is None) and (not self.memmap) and self._images.enabled
+
+    def _cachekey(self, timestep):
+        '''
+        The key under which a timestep's image is cached.
+        '''
+        return (self.filenames[timestep], self.ext_image)
+
+    def _prefetch_task(self, timestep):
+        '''
+        A (function, arguments) pair that will decode one
+        timestep's image, without touching any shared open files.
+        '''
+        return _decode_fits_image, (self.filenames[timestep], self.ext_image, self.verify)
+
+    def cache_statistics(self):
+        '''
+        Summarize how well the image and file caches are working.
+
+        Returns
+        -------
+        stats : dict
+            Dictionaries of hits, misses, evictions, items, and bytes,
+            for both the 'images' and the open 'files'.
+        '''
+        return dict(images=self._images.statistics(),
+                    files=self._openfiles.statistics())
+
+    def clear_cache(self):
+        '''
+        Forget all decoded images, and close all open files.
+        '''
+        self._images.clear()
+        self._openfiles.clear()
+        self._layouts.clear()
+        if self._lastopened is not None:
+            self._lastopened.close()
+            self._lastopened = None
+
+    def refresh(self, filenames=None):
+        '''
+        Add any new files to this sequence, as they arrive.
+
+        Only the new files are scanned (for headers, filenames,
+        and times); they're inserted into the sorted time axis,
+        and any summary images are updated (or forgotten) to match.
+        Each refresh costs (roughly) the same, however many
+        files are already in the sequence.
+
+        Parameters
+        ----------
+        filenames : list, None
+            The files that might be new. If None, the search
+            string this sequence was made from is checked again.
+
+        Returns
+        -------
+        nnew : int
+            How many new files were added.
+        '''
+        if self._hdulists is not None:
+            return 0
+        if filenames is None:
+            if self._source is None:
+                return 0
+            filenames = find_files(self._source)
+
+        # which files haven't been seen yet?
+        new = [f for f in filenames if f not in self._known]
+        if len(new) == 0:
+            return 0
+        self.speak('adding {} new files to {}'.format(len(new), self))
+
+        # scan only the new files (sharing the same sidecar index)
+        settings = dict(**self._settings)
+        settings['index'] = False if self._index is None else self._index.path
+        other = FITS_Sequence(new, cachesize=0, maxopenfiles=4, **settings)
+        self._insert(other)
+        other.clear_cache()
+        self._known.update(other.filenames)
+        if self._index is not None:
+            self._index = other._index
+        return other.N
+
+    def watch(self, interval=60.0, timeout=None):
+        '''
+        Watch for new files (by checking every so often),
+        adding them to this sequence as they arrive.
+
+        This is a generator, which waits until new files have
+        been added and then yields how many there were, as in:
+
+            for nnew in sequence.watch(interval=30):
+                illustration.refresh()
+
+        Parameters
+        ----------
+        interval : float
+            How often (in seconds) should we check for new files?
+
+        timeout : float, None
+            Stop after this many seconds. (None watches forever.)
+        '''
+        import time as clock
+        start = clock.time()
+        while (timeout is None) or (clock.time() - start < timeout):
+            nnew = self.refresh()
+            if nnew > 0:
+                yield nnew
+            else:
+                clock.sleep(interval)
+
+    def _insert(self, other):
+        '''
+        Insert the files from another (sorted) FITS_Sequence into this
+        one, keeping everything in time order without re-sorting.
+        '''
+        N, M = self.N, other.N
+
+        # where does each new file go? (after any existing ones with the same time)
+        fake = self._timeisfake or other._timeisfake
+        if fake:
+            positions = np.full(M, N)
+        else:
+            positions = np.searchsorted(self.time.gps, other.time.gps, side='right')
+        isnew = np.zeros(N + M, dtype=bool)
+        isnew[positions + np.arange(M)] = True
+        take = np.empty(N + M, dtype=int)
+        take[~isnew] = np.arange(N)
+        take[isnew] = N + np.arange(M)
+
+        def combine(mine, theirs):
+            return np.concatenate([np.atleast_1d(mine), np.atleast_1d(theirs)])[take]
+
+        def column(sequence, key, n):
+            if key in sequence.temporal:
+                return np.asarray(sequence.temporal[key])
+            elif key in sequence.static:
+                return np.asarray([sequence.static[key]]*n)
+            else:
+                return np.asarray([None]*n)
+
+        # things that stayed the same are still static; anything else is temporal
+        keys = set(self.temporal) | set(self.static) | set(other.temporal) | set(other.static)
+        for k in keys:
+            if (k in self.static) and (k in other.static) and (repr(self.static[k]) == repr(other.static[k])):
+                self.temporal.pop(k, None)
+            else:
+                self.temporal[k] = combine(column(self, k, N), column(other, k, M))
+                self.static.pop(k, None)
+
+        # insert the filenames and times
+        self.filenames = combine(self.filenames, other.filenames)
+        if fake:
+            self.time = Time(np.arange(N + M), format='gps', scale='tdb')
+            self._timeisfake = True
+        else:
+            format = self.time.format
+            self.time = Time(combine(self.time.gps, other.time.gps), format='gps', scale=self.time.scale)
+            self.time.format = format
+
+        # update the streaming statistics with just the new images;
+        # anything else (like the median) is recalculated when it's next needed
+        spatial = {}
+        if ('statistics' in self.spatial) and (getattr(self, '_running', None) is not None):
+            self._running.merge(streaming_statistics(other, nworkers=self.nworkers))
+            spatial['statistics'] = self._running.images()
+        self.spatial = spatial
+
+    def preload(self, timesteps=None, nworkers=None, processes=None):
+        '''
+        Decode (and decompress) many images at once, in parallel,
+        and put them in the cache. This is most useful for gzipped
+        or tile-compressed files, where decompression is slow.
+
+        Parameters
+        ----------
+        timesteps : array of ints, None
+            Which timesteps to load? (None loads as
+            many as will fit in the cache, from the start.)
+
+        nworkers : int, None
+            How many threads (or processes) should decode at once?
+            (None uses the sequence's `nworkers`.)
+
+        processes : bool, None
+            Should decoding happen in processes instead of threads?
+            (None uses the sequence's `processes`.)
+        '''
+        if not self._prefetchable:
+            return
+        if timesteps is None:
+            timesteps = np.arange(self.N)
+        if nworkers is None:
+            nworkers = self.nworkers
+        if processes is None:
+            processes = self.processes
+
+        # don't load more than the cache can hold
+        todo = [t for t in timesteps if self._cachekey(t) not in self._images]
+        if len(todo) == 0:
+            return
+        if self._images.maxbytes is not None:
+            framebytes = np.maximum(self[todo[0]].nbytes, 1)
+            todo = todo[1:int(self._images.maxbytes//framebytes)]
+        self.speak('preloading {} images for {}'.format(len(todo), self))
+
+        if len(todo) == 0:
+            return
+
+        pool = [ThreadPoolExecutor, ProcessPoolExecutor][processes]
+        with pool(max_workers=nworkers) as executor:
+            arguments = [self._prefetch_task(t)[1] for t in todo]
+            images = executor.map(_decode_fits_image, *zip(*arguments))
+            for t, image in zip(todo, images):
+                if image is not None:
+                    image.flags.writeable = False
+                    self._images.put(self._cachekey(t), image)
+
+    def pixel_timeseries(self, positions, nworkers=None, processes=None):
+        '''
+        Extract the time series of some individual pixels,
+        reading only the rows that hold them from each file
+        (and reading many files in parallel).
+
+        Parameters
+        ----------
+        positions : list of tuples
+            The (x, y) = (col, row) position of each pixel.
+
+        nworkers : int, None
+            How many threads (or processes) should read at once?
+            (None uses the sequence's `nworkers`.)
+
+        processes : bool, None
+            Should reading happen in processes instead of threads?
+            (None uses the sequence's `processes`.)
+
+        Returns
+        -------
+        timeseries : array
+            The pixel values, with shape (ntimes x npositions).
+        '''
+        if self._hdulists is not None:
+            return Image_Sequence.pixel_timeseries(self, positions)
+        if nworkers is None:
+            nworkers = self.nworkers
+        if processes is None:
+            processes = self.processes
+
+        x, y = np.atleast_2d(positions).astype(int).T
+        values = [None]*self.N
+
+        # use any images that have already been decoded
+        todo = []
+        for i in range(self.N):
+            key = self._cachekey(i)
+            if key in self._images:
+                values[i] = self._images.get(key)[y, x]
+            else:
+                todo.append(i)
+
+        # read the rest straight from the files
+        self.speak('reading {} pixels from {} files'.format(len(x), len(todo)))
+        n = len(todo)
+        arguments = (self.filenames[todo], [self.ext_image]*n, [x]*n, [y]*n, [self.verify]*n)
+        if (nworkers == 1) or (n <= 1):
+            pixels = list(map(_read_fits_pixels, *arguments))
+        else:
+            pool = [ThreadPoolExecutor, ProcessPoolExecutor][processes]
+            with pool(max_workers=nworkers) as executor:
+                pixels = list(executor.map(_read_fits_pixels, *arguments))
+        for i, v in zip(todo, pixels):
+            values[i] = v
+        return np.array(values)
+
     def _clean_temporal(self):
         '''
         Move anything that's non-changing from temporal to static.
         '''
         # move non-changing things to static
         for k in list(self.temporal.keys()):
-            if len(np.unique(self.temporal[k])) == 1:
+            try:
+                nunique = len(np.unique(self.temporal[k]))
+            except TypeError:
+                # (mixed types, like values with some missing, can't be sorted)
+                nunique = len(set([repr(v) for v in self.temporal[k]]))
+            if nunique == 1:
                 # if we have a one-element sequence, repeat it in both static and temporal
                 if len(self.temporal[k]) == 1:
                     self.static[k] = self.temporal[k][0]
@@ -203,18 +722,24 @@ class FITS_Sequence(Image_Sequence):
         Pull the basic information and temporal axis from the filenames.
         '''
         self.speak('populating {} information from the filenames (like {})'.format(self, self.filenames[0]))
-        for i, f in enumerate(self.filenames):
-            this = filenameparser(f)
 
-            # create empty lists, if necessary
-            if i == 0:
-                for k in this.keys():
-                    self.temporal[k] = []
+        def parse(filenames):
+            return parse_filenames(filenames, filenameparser)
 
-            # tack this file onto the list
-            for k in this.keys():
-                #print(this[k])
-                self.temporal[k].append(this[k])
+        if self._index is not None:
+            section = 'filenames:{}'.format(getattr(filenameparser, '__name__', filenameparser))
+            self.temporal.update(self._index.retrieve(section, self.filenames, parse))
+        else:
+            for i, this in enumerate(parse(self.filenames)):
+
+                # create empty lists, if necessary
+                if i == 0:
+                    for k in this.keys():
+                        self.temporal[k] = []
+
+                # tack this file onto the list
+                for k in this.keys():
+                    self.temporal[k].append(this[k])
 
         # move static things away from temporal
         self._clean_temporal()
@@ -222,6 +747,9 @@ class FITS_Sequence(Image_Sequence):
     def _populate_from_headers(self):
         '''
         Attempt to populate the sequence from the headers.
+
+        Only the header blocks are read (never the pixel data),
+        using a pool of threads (or processes) to read many files at once.
         '''
 
         self.speak('populating {} information from the headers'.format(self))
@@ -249,23 +777,22 @@ class FITS_Sequence(Image_Sequence):
 
             # look through the unique extensions
             extensions = np.unique([self.ext_primary, self.ext_image])
-            
-            # create lists for each key in the headers
-            for e in extensions[0]:   # DEBUG 
-                h = first[e].header
-                for k in h.keys():
-                    self.temporal[k] = []
 
             # compile all values from the headers
-            for i in range(self.N):
-                hdulist = self._get_hdulist(i)
-                self.speak("populating header {} of {}".format(i+1, self.N), progress=True)
-                for e in extensions:
-                    h = hdulist[e].header
-                    for k in h.keys():
-                        # print("populating",k, "with", h[k])
-                        #print(k,self.temporal[k])
-                        self.temporal[k].append(h[k])
+            def scan(filenames):
+                return scan_headers(filenames, extensions,
+                                    nworkers=self.nworkers,
+                                    processes=self.processes)
+
+            # create lists for each key in the headers
+            if self._hdulists is not None:
+                headers = [{k: h[e].header[k] for e in extensions for k in h[e].header.keys()}
+                           for h in self._hdulists]
+                self.temporal.update(columns_from_headers(headers))
+            elif self._index is not None:
+                self.temporal.update(self._index.retrieve('headers', self.filenames, scan))
+            else:
+                self.temporal.update(columns_from_headers(scan(self.filenames)))
 
             # move static things away from temporal
             self._clean_temporal()
@@ -323,5 +850,94 @@ class FITS_Sequence(Image_Sequence):
         '''
         if timestep is None:
             return None
+        elif self._is_selection(timestep):
+            return self.view(timestep)
+        elif self._hdulists is not None:
+            return self._hdulists[timestep][self.ext_image].data
         else:
-            return self._get_hdulist(timestep)[self.ext_image].data
+            if self.memmap:
+                # memory-mapped images stay in the (open) file
+                hdu = self._get_hdulist(timestep)[self.ext_image]
+                if _is_mappable(hdu):
+                    return hdu.data
+
+            # recently decoded images can be pulled straight from the cache
+            key = self._cachekey(timestep)
+            image = self._images.get(key)
+            if image is None:
+                hdu = self._get_hdulist(timestep)[self.ext_image]
+                image = hdu.data
+                if (image is not None) and self._images.enabled:
+                    # let the cache (not the open file) hold onto the image
+                    del hdu.data
+                    image.flags.writeable = False
+                    self._images.put(key, image)
+            return image
+
+    def read_region(self, timestep, rows=None, cols=None, cache=True):
+        '''
+        Return a rectangular region of the image at a given timestep,
+        reading as little of the file as possible.
+
+        If the whole image is already in memory, this is a view into it.
+        For memory-mapped, unscaled images it's a view into the file.
+        Otherwise, only the rows needed get read from the file
+        (through astropy's `section`), and the region gets cached;
+        once a file has been closed again, its rows are read
+        directly from where astropy found its pixels.
+
+        Parameters
+        ----------
+        timestep : int
+            A timestep index (which element in the sequence do you want?)
+
+        rows : slice, tuple, None
+            The rows to include, as a slice or (start, stop).
+
+        cols : slice, tuple, None
+            The columns to include, as a slice or (start, stop).
+
+        cache : bool
+            Should a region that had to be read from
+            the file be kept in the image cache?
+
+        Returns
+        -------
+        region : 2D array
+            The image data within that region.
+        '''
+
+        rows, cols = _region_slices(rows, cols)
+        if self._hdulists is not None:
+            return self[timestep][rows, cols]
+
+        # use the whole image, if it's already been decoded
+        key = self._cachekey(timestep)
+        if key in self._images:
+            return self._images.get(key)[rows, cols]
+
+        # read the rows straight from a file that's been closed since
+        # we learned its layout (so streaming bands of rows through
+        # many files doesn't reopen and reverify every one of them)
+        filename = self.filenames[timestep]
+        layout = self._layouts.get(key)
+        if (layout is not None) and (rows.step in (None, 1)) and (filename not in self._openfiles):
+            return _read_fits_rows(filename, layout, rows)[:, cols]
+
+        hdu = self._get_hdulist(timestep)[self.ext_image]
+        if hdu._data_loaded or (self.memmap and _is_mappable(hdu)):
+            return hdu.data[rows, cols]
+
+        # otherwise, read just the region (and remember it)
+        self._layouts[key] = _fits_layout(hdu)
+        regionkey = key + ((rows.start, rows.stop, rows.step), (cols.start, cols.stop, cols.step))
+        region = self._images.get(regionkey)
+        if region is None:
+            try:
+                region = hdu.section[rows, cols]
+            except (AttributeError, TypeError):
+                region = hdu.data[rows, cols].copy()
+            if cache:
+                region.flags.writeable = False
+                self._images.put(regionkey, region)
+        return region
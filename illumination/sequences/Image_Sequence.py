@@ -2,9 +2,33 @@
 Define a generic sequence of images.
 '''
 from .Sequence import *
+from .reductions import tiled_percentiles, streaming_statistics
+
+def _region_slices(rows, cols):
+    '''
+    Convert row + column ranges into a pair of slices.
+
+    Parameters
+    ----------
+    rows, cols : slice, tuple, None
+        Each can be a slice, a (start, stop) tuple, or None (everything).
+
+    Returns
+    -------
+    rows, cols : slice
+        The ranges, as slices.
+    '''
+    def convert(r):
+        if r is None:
+            return slice(None)
+        elif isinstance(r, slice):
+            return r
+        else:
+            return slice(*r)
+    return convert(rows), convert(cols)
 
 class Image_Sequence(Sequence):
-    def __init__(self, name='images', time=None, temporal={}, spatial={}, **kwargs):
+    def __init__(self, name='images', time=None, temporal=None, spatial=None, **kwargs):
         '''
         Initialize a Sequence from a Cube.
         (a Cube is a custom, simplified, set of images)
@@ -25,8 +49,9 @@ class Image_Sequence(Sequence):
         Sequence.__init__(self, name=name)
 
 
-        self.temporal = temporal
-        self.spatial = spatial
+        # (each sequence needs its own dictionaries, not shared defaults)
+        self.temporal = {} if temporal is None else temporal
+        self.spatial = {} if spatial is None else spatial
 
         # pull out the shape of the array
         N, ysize, xsize = self.shape
@@ -49,6 +74,133 @@ class Image_Sequence(Sequence):
         '''
         raise RuntimeError("Sorry! No image-getting procedure is defined for the generic Image_Sequence!")
 
+    @staticmethod
+    def _is_selection(timestep):
+        '''
+        Is this index asking for many timesteps (a slice,
+        a boolean mask, or an array of indices), not just one?
+        '''
+        return isinstance(timestep, (slice, list)) or (np.ndim(timestep) > 0)
+
+    def view(self, timesteps):
+        '''
+        Create a lightweight view into some of this sequence's timesteps,
+        without copying any images (or rereading any files).
+
+        (This is what you get from `sequence[a:b:step]`,
+        or from `sequence[mask]` with a boolean array.)
+
+        Parameters
+        ----------
+        timesteps : slice, array of bools, array of ints
+            Which timesteps to include.
+
+        Returns
+        -------
+        view : View_Sequence
+            A sequence of just those timesteps.
+        '''
+        from .View_Sequence import View_Sequence
+        return View_Sequence(self, timesteps)
+
+    def between(self, start, end):
+        '''
+        Create a lightweight view of the timesteps within a time window.
+
+        Parameters
+        ----------
+        start : astropy Time, float
+            The beginning of the window (as GPS seconds, if a float).
+
+        end : astropy Time, float
+            The end of the window (as GPS seconds, if a float).
+
+        Returns
+        -------
+        view : View_Sequence
+            A sequence of just the timesteps with start <= time <= end.
+        '''
+        start, end = [t.gps if isinstance(t, Time) else t for t in [start, end]]
+        gps, order = self._get_time_index()
+        lower, upper = np.searchsorted(gps, start, side='left'), np.searchsorted(gps, end, side='right')
+        return self.view(np.sort(order[lower:upper]))
+
+    def pixel_timeseries(self, positions):
+        '''
+        Extract the time series of some individual pixels.
+
+        Only the rows spanned by the pixels are read
+        from each image (if the sequence can do that).
+
+        Parameters
+        ----------
+        positions : list of tuples
+            The (x, y) = (col, row) position of each pixel.
+
+        Returns
+        -------
+        timeseries : array
+            The pixel values, with shape (ntimes x npositions).
+        '''
+        x, y = np.atleast_2d(positions).astype(int).T
+        rows, cols = (y.min(), y.max() + 1), (x.min(), x.max() + 1)
+        return np.array([self.read_region(i, rows, cols, cache=False)[y - rows[0], x - cols[0]]
+                         for i in range(self.N)])
+
+    def aperture_timeseries(self, masks):
+        '''
+        Extract the summed time series within some apertures.
+
+        Parameters
+        ----------
+        masks : list of 2D arrays of bools
+            Each mask (with the same shape as the images)
+            is True for the pixels within that aperture.
+
+        Returns
+        -------
+        timeseries : array
+            The sum of the (finite) pixel values within each
+            aperture, with shape (ntimes x nmasks).
+        '''
+
+        # extract every pixel that's in any of the apertures, all at once
+        masks = np.array(masks, dtype=bool).reshape(-1, self.shape[1], self.shape[2])
+        y, x = np.nonzero(np.any(masks, axis=0))
+        pixels = self.pixel_timeseries(np.transpose([x, y]))
+
+        # sum up the pixels within each aperture
+        return np.array([np.nansum(pixels[:, m[y, x]], axis=1) for m in masks]).T
+
+    def to_cubestore(self, path, chunks=None, pixelmajor=False, maxmemory=256e6):
+        '''
+        Save this sequence's images into a chunked, memory-mapped cube
+        store, which can be reopened (quickly) as a CubeStore_Sequence.
+
+        Parameters
+        ----------
+        path : str
+            The directory where the cube store should be saved.
+
+        chunks : tuple, None
+            The (ntimes, nrows, ncols) shape of each contiguous chunk.
+            (None stores each whole frame as one chunk.)
+
+        pixelmajor : bool
+            Should we also store a transposed copy, so each
+            pixel's time series is one contiguous read?
+
+        maxmemory : float
+            Roughly how many bytes can be used while transposing?
+
+        Returns
+        -------
+        store : CubeStore_Sequence
+            A sequence that reads from the new cube store.
+        '''
+        from .CubeStore_Sequence import write_cubestore
+        return write_cubestore(self, path, chunks=chunks, pixelmajor=pixelmajor, maxmemory=maxmemory)
+
     @property
     def shape(self):
         '''
@@ -60,6 +212,47 @@ class Image_Sequence(Sequence):
         d = self[0]
         return (self.N, d.shape[0], d.shape[1])
 
+    @property
+    def dtype(self):
+        '''
+        Returns
+        -------
+        dtype : numpy.dtype
+            The dtype in which the images are stored
+            (their native one, wherever possible).
+        '''
+        return storage_dtype(self[0].dtype)
+
+    def read_region(self, timestep, rows=None, cols=None, cache=True):
+        '''
+        Return a rectangular region of the image at a given timestep.
+
+        (Sequences that can read part of an image without
+        reading the whole thing should write over this.)
+
+        Parameters
+        ----------
+        timestep : int
+            A timestep index (which element in the sequence do you want?)
+
+        rows : slice, tuple, None
+            The rows to include, as a slice or (start, stop).
+
+        cols : slice, tuple, None
+            The columns to include, as a slice or (start, stop).
+
+        cache : bool
+            Should the region be kept in the sequence's
+            cache (for sequences that have one)?
+
+        Returns
+        -------
+        region : 2D array
+            The image data within that region.
+        '''
+        rows, cols = _region_slices(rows, cols)
+        return self[timestep][rows, cols]
+
     def _gather_3d(self):
         '''
         Gather a 3D cube of images.
@@ -75,17 +268,29 @@ class Image_Sequence(Sequence):
         The image stack, with shape (ntimes x nrows x ncols)
         '''
 
-        s = np.zeros(self.shape)
-        self.speak('gathering the sequence cube, with shape {}'.format(self.shape))
+        s = np.empty(self.shape, dtype=self.dtype)
+        self.speak('gathering the sequence cube, with shape {} and dtype {}'.format(self.shape, s.dtype))
         for i in range(self.N):
             self.speak(' loaded frame {}/{}'.format(i+1, self.N), progress=True)
             s[i, :, :] = self[i]
         return s
 
-    def median(self):
+    def median(self, maxmemory=1e9, nworkers=None):
         '''
         Calculate the median image.
 
+        The images are read in bands of rows, so the whole
+        cube never needs to fit in memory at once.
+
+        Parameters
+        ----------
+        maxmemory : float
+            Roughly how many bytes can be used at once?
+
+        nworkers : int, None
+            How many bands can be reduced in parallel?
+            (None uses every CPU.)
+
         Returns
         -------
         median : 2D image
@@ -96,10 +301,77 @@ class Image_Sequence(Sequence):
             self.spatial['median']
         except KeyError:
             self.speak('creating a median image for {}'.format(self))
-            s = self._gather_3d()
-            self.spatial['median'] = np.nanmedian(s, axis=0)
+            self.spatial['median'] = tiled_percentiles(self, 50, maxmemory=maxmemory, nworkers=nworkers)
         return self.spatial['median']
 
+    def percentile(self, q, maxmemory=1e9, nworkers=None):
+        '''
+        Calculate percentile image(s), like the 5th or 95th.
+
+        The images are read in bands of rows, so the whole
+        cube never needs to fit in memory at once.
+
+        Parameters
+        ----------
+        q : float, array
+            The percentile(s) to calculate, between 0 and 100.
+
+        maxmemory : float
+            Roughly how many bytes can be used at once?
+
+        nworkers : int, None
+            How many bands can be reduced in parallel?
+            (None uses every CPU.)
+
+        Returns
+        -------
+        percentile : 2D image (or 3D, if q is an array)
+            The percentile(s) of the image sequence.
+        '''
+
+        # reuse any percentiles that have already been calculated
+        percentiles = np.atleast_1d(q).astype(np.float64)
+        keys = ['percentile{}'.format(p) for p in percentiles]
+        needed = [p for p, k in zip(percentiles, keys) if k not in self.spatial]
+        if len(needed) > 0:
+            self.speak('creating {} percentile images for {}'.format(needed, self))
+            images = tiled_percentiles(self, needed, maxmemory=maxmemory, nworkers=nworkers)
+            for p, image in zip(needed, images):
+                self.spatial['percentile{}'.format(p)] = image
+
+        images = np.array([self.spatial[k] for k in keys])
+        if np.ndim(q) == 0:
+            return images[0]
+        return images
+
+    def statistics(self, nworkers=None):
+        '''
+        Calculate summary images (mean, variance, std, min, max,
+        sum, and count of finite values) all at once, in a
+        single pass through the images.
+
+        Parameters
+        ----------
+        nworkers : int, None
+            How many chunks of images can be accumulated
+            in parallel? (None uses every CPU.)
+
+        Returns
+        -------
+        statistics : dict
+            The summary images, each with shape (nrows x ncols).
+            (Non-finite values are ignored; pixels that are never
+            finite are NaN in everything but sum and count.)
+        '''
+
+        try:
+            self.spatial['statistics']
+        except KeyError:
+            self.speak('creating summary images for {}'.format(self))
+            self._running = streaming_statistics(self, nworkers=nworkers)
+            self.spatial['statistics'] = self._running.images()
+        return self.spatial['statistics']
+
     def sum(self):
         '''
         Calculate the sum of all the images.
@@ -107,15 +379,13 @@ class Image_Sequence(Sequence):
         Returns
         -------
         sum : 2D image
-            The median of the image sequence.
+            The sum of the image sequence (ignoring non-finite values).
         '''
-
-        s = self._gather_3d()
-        return np.nansum(s, axis=0)
+        return self.statistics()['sum']
 
     def mean(self):
         '''
-        Calculate the sum of all the images.
+        Calculate the mean of all the images.
         It works in an inline fashion, so you
         don't need to load the entire image
         cube into memory (that might get big!)
@@ -123,24 +393,14 @@ class Image_Sequence(Sequence):
         Returns
         -------
         mean : 2D image
-            The median of the image sequence.
+            The mean of the image sequence, where each
+            pixel is averaged over only its finite values.
         '''
 
         try:
             self.spatial['mean']
         except KeyError:
-            self.speak('creating a mean image for {}'.format(self))
-
-            # calculate the mean in a running fashion (less memory)
-            total = np.zeros_like(self[0])
-            for i in range(self.N):
-                self.speak(' included frame {}/{} in mean'.format(i+1, self.N), progress=True)
-                thisimage = self[i]
-                ok = np.isfinite(thisimage)
-                total[ok] += thisimage[ok]
-
-            self.spatial['mean'] = total/self.N
-
+            self.spatial['mean'] = self.statistics()['mean']
         return self.spatial['mean']
 
     def __repr__(self):
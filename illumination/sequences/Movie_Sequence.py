@@ -1,25 +1,55 @@
 '''
 Define a generic sequence of images.
 '''
+import re
+import threading
 from .Image_Sequence import *
+from .caches import LRUCache
 try:
     import imageio
+    import imageio_ffmpeg
 except ImportError:
     pass
 
+def _index_keyframes(filename, fps):
+    '''
+    Find which frames of a movie are keyframes (where decoding
+    can start after a seek), by having ffmpeg decode only those.
+    Returns an array of timesteps, or None if that didn't work.
+    '''
+    try:
+        result = subprocess.run([imageio_ffmpeg.get_ffmpeg_exe(), '-hide_banner', '-nostats',
+                                 '-skip_frame', 'nokey', '-i', filename, '-map', '0:v:0',
+                                 '-vf', 'showinfo', '-f', 'null', '-'],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    except (NameError, OSError, subprocess.CalledProcessError):
+        return None
+    seconds = [float(t) for t in re.findall(r'pts_time:\s*([-+0-9.eE]+)', result.stderr.decode(errors='replace'))]
+    if len(seconds) == 0:
+        return None
+    return np.unique(np.round(np.array(seconds)*fps).astype(int))
+
 class Movie_Sequence(Image_Sequence):
     @property
     def N(self):
         '''
         How many frames are in this movie?
         '''
-        return self.video.get_length()
+        return len(self.timestamps)
 
 
-    def __init__(self, filename, name='movie', time=None, temporal={}, spatial={}, **kwargs):
+    def __init__(self, filename, name='movie', time=None, temporal=None, spatial=None, buffersize=32, **kwargs):
         '''
         Initialize a Sequence from a .MP4 or .MOV movie file.
 
+        Opening a movie reads only its container metadata; the
+        number of frames comes from its duration and frame rate.
+        The first time a frame is requested far ahead of the last
+        one decoded, the movie's keyframes are indexed (with one
+        pass of ffmpeg that decodes only the keyframes), so jumps
+        that don't cross a keyframe can read forward rather than
+        seek back and decode from an earlier keyframe again.
+
         Parameters
         ----------
         filename : string
@@ -27,19 +57,117 @@ class Movie_Sequence(Image_Sequence):
 
         time : array, None
             An array of times for the sequence.
+
+        buffersize : int
+            How many recently decoded frames should be kept
+            around, so stepping back and forth doesn't
+            require decoding them again?
         '''
 
 
         # hang on to the original filename
         self.filename = filename
 
-        # set up the video reader
-        self.video = imageio.get_read(filename, 'ffmpeg')
+        # set up the video reader (which can only be used by one thread at a time)
+        self.video = imageio.get_reader(filename, 'ffmpeg')
+        self._lock = threading.RLock()
+
+        # the timestep of the frame the reader will decode next
+        self._position = 0
+
+        # index the frames, with their timestamps (in seconds from the start),
+        # counting them from the metadata (which doesn't decode the movie)
+        self.metadata = self.video.get_meta_data()
+        self.fps = self.metadata.get('fps', 1.0)
+        if np.isfinite(self.metadata.get('nframes', np.inf)):
+            nframes = int(self.metadata['nframes'])
+        elif self.metadata.get('duration', 0) > 0:
+            nframes = int(np.round(self.metadata['duration']*self.fps))
+        else:
+            nframes = self.video.count_frames()
+        self.timestamps = np.arange(nframes)/self.fps
+
+        # the keyframes get indexed only when they're first needed
+        self._keyframes = None
+
+        # keep a ring of recently decoded frames
+        self._images = LRUCache(maxitems=buffersize, name='frame-buffer')
 
         # create a sequence
         Image_Sequence.__init__(self, name=name, time=time, temporal=temporal, spatial=spatial)
 
+    @property
+    def keyframes(self):
+        '''
+        The timesteps of the movie's keyframes
+        (or None, if they couldn't be found).
+        '''
+        if self._keyframes is None:
+            found = _index_keyframes(self.filename, self.fps)
+            self._keyframes = np.array([], dtype=int) if found is None else found
+            self._keyframes.flags.writeable = False
+        return self._keyframes if len(self._keyframes) > 0 else None
+
+    def _reads_forward(self, timestep):
+        '''
+        Is reading forward from the current position to a timestep
+        at least as quick as seeking to it? (It is, unless there's a
+        keyframe after the current position to start decoding from.)
+        '''
+        if timestep < self._position:
+            return False
+        if timestep < self._position + self._images.maxitems:
+            return True
+        keyframes = self.keyframes
+        if keyframes is None:
+            return False
+        return not np.any((keyframes > self._position) & (keyframes <= timestep))
+
+    def _decode(self, timestep):
+        '''
+        Decode one frame, reading forward from the current position
+        whenever that's no slower than seeking. Any frames
+        passed along the way are kept in the buffer too.
+        '''
+        with self._lock:
+            start = timestep
+            if self._reads_forward(timestep):
+                start = self._position
+            for t in range(start, timestep + 1):
+                image = self.video.get_data(t)
+                image.flags.writeable = False
+                self._images.put(t, image)
+            self._position = timestep + 1
+            return image
+
+    def decode(self, timesteps):
+        '''
+        Decode a batch of frames, all at once.
+
+        The frames are decoded in one forward pass through the
+        movie (in order of time), no matter what order they're
+        requested in, so no frame needs to be decoded twice.
+
+        Parameters
+        ----------
+        timesteps : array of ints
+            Which frames to decode.
 
+        Returns
+        -------
+        images : array
+            The decoded frames, in the order they were requested,
+            with shape (ntimesteps x nrows x ncols x ncolors).
+        '''
+        timesteps = np.arange(self.N)[timesteps]
+        decoded = {}
+        with self._lock:
+            for t in np.unique(timesteps):
+                image = self._images.get(t)
+                if image is None:
+                    image = self._decode(t)
+                decoded[t] = image
+        return np.array([decoded[t] for t in timesteps])
 
     def __getitem__(self, timestep):
         '''
@@ -54,6 +182,12 @@ class Movie_Sequence(Image_Sequence):
         '''
         if timestep is None:
             return None
+        elif self._is_selection(timestep):
+            return self.view(timestep)
         else:
-            # it's possible this is really slow + inefficient
-            return self.get_data(timestep)
+            if timestep < 0:
+                timestep += self.N
+            image = self._images.get(timestep)
+            if image is None:
+                image = self._decode(timestep)
+            return image
@@ -0,0 +1,109 @@
+'''
+Define a sequence of images from ordinary picture files (PNG, JPEG).
+'''
+from .Image_Sequence import *
+from .caches import LRUCache
+from .scanning import find_files
+try:
+    import imageio
+except ImportError:
+    pass
+
+__all__ = ['Picture_Sequence']
+
+def _read_picture(filename):
+    '''
+    Decode one picture file into an array.
+    '''
+    try:
+        image = imageio.v2.imread(filename)
+    except AttributeError:
+        image = imageio.imread(filename)
+    return np.asarray(image)
+
+class Picture_Sequence(Image_Sequence):
+    '''
+    A sequence of pictures, one file per timestep.
+    '''
+
+    def __init__(self, initial, name='pictures', time=None, temporal=None, spatial=None,
+                 cachesize=256e6, **kwargs):
+        '''
+        Initialize a Sequence from a group of picture files.
+
+        Parameters
+        ----------
+        initial : str, list
+            A picture filename, a list of them,
+            or a search string (containing '*').
+
+        time : array, None
+            An array of times for the sequence.
+
+        cachesize : float
+            The maximum number of bytes of decoded pictures
+            to keep in memory. (Set to 0 to disable.)
+        '''
+
+        if isinstance(initial, str):
+            if '*' in initial:
+                initial = find_files(initial)
+            else:
+                initial = [initial]
+        self.filenames = np.asarray(initial)
+
+        # keep recently decoded pictures around
+        self._images = LRUCache(maxbytes=cachesize, name='picture-cache')
+
+        # create a sequence
+        Image_Sequence.__init__(self, name=name, time=time, temporal=temporal, spatial=spatial)
+
+    @property
+    def N(self):
+        '''
+        How many pictures are in this sequence?
+        '''
+        return len(self.filenames)
+
+    @property
+    def _prefetchable(self):
+        '''
+        Can pictures be decoded ahead of time?
+        '''
+        return self._images.enabled
+
+    def _cachekey(self, timestep):
+        '''
+        The key under which a timestep's picture is cached.
+        '''
+        return self.filenames[timestep]
+
+    def _prefetch_task(self, timestep):
+        '''
+        A (function, arguments) pair that will decode one timestep's picture.
+        '''
+        return _read_picture, (self.filenames[timestep],)
+
+    def __getitem__(self, timestep):
+        '''
+        Return the image data for a given timestep.
+
+        This function is called when you say `sequence[timestep]`.
+
+        Parameters
+        ----------
+        timestep : int
+            A timestep index (which element in the sequence do you want?)
+        '''
+        if timestep is None:
+            return None
+        elif self._is_selection(timestep):
+            return self.view(timestep)
+        else:
+            key = self._cachekey(timestep)
+            image = self._images.get(key)
+            if image is None:
+                image = _read_picture(key)
+                image.flags.writeable = False
+                self._images.put(key, image)
+            return image
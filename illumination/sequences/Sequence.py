@@ -46,6 +46,66 @@ class Sequence(Talker):
 
         return np.median(np.diff(self.time))
 
+    def _get_time_index(self):
+        '''
+        Get a sorted, numeric index of this sequence's times,
+        so timesteps can be found by binary search.
+
+        (The index is rebuilt whenever the time axis gets replaced.)
+
+        Returns
+        -------
+        gps : array
+                The GPS times (in seconds, as float64), sorted.
+        order : array
+                The timestep corresponding to each sorted time.
+        '''
+        times = self._get_times()
+        try:
+            cachedtimes, gps, order = self._timeindex
+            if cachedtimes is times:
+                return gps, order
+        except AttributeError:
+            pass
+
+        gps = np.asarray(times.gps, dtype=np.float64)
+        order = np.argsort(gps, kind='stable')
+        self._timeindex = (times, gps[order], order)
+        return gps[order], order
+
+    def find_timesteps(self, times):
+        '''
+        Given many times, identify their indices (all at once).
+
+        Parameters
+        ----------
+
+        times : astropy Time, array
+                The times to look up (as a Time array,
+                or as an array of GPS times in seconds).
+
+        Returns
+        -------
+        indices : array of ints
+                The index of the *closest* time point to each.
+        '''
+
+        gps, order = self._get_time_index()
+        if isinstance(times, Time):
+            times = times.gps
+        times = np.asarray(times, dtype=np.float64)
+
+        # find the sorted times on either side of each requested time
+        right = np.clip(np.searchsorted(gps, times), 1, len(gps) - 1)
+        left = right - 1
+
+        # pick whichever neighbor is closer (the earlier one, if they tie)
+        if len(gps) == 1:
+            closest = np.zeros_like(right)
+        else:
+            closest = np.where(np.abs(times - gps[left]) <= np.abs(gps[right] - times), left, right)
+        return order[closest]
+
     def _find_timestep(self, time):
         '''
         Given a time, identify its index.
@@ -62,17 +122,12 @@ class Sequence(Talker):
                 The index of the *closest* time point.
         '''
 
-        # pull out actual times associated with this sequence
-        times = self._get_times()
-
         # if there are no times, return nothing
-        if len(times) == 0:
+        if len(self._get_times()) == 0:
             return None
         else:
             # find the index of the timepoint that is closest to this one
-            diff = time - times
-            step = np.argmin(abs(diff))
-            return step
+            return int(self.find_timesteps(time))
 
     def _get_times(self):
         '''
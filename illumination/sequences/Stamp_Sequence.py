@@ -58,6 +58,8 @@ class Stamp_Sequence(Image_Sequence):
         '''
         if timestep is None:
             return None
+        elif self._is_selection(timestep):
+            return self.view(timestep)
         else:
             return self.stamp.todisplay[timestep, :, :]
 
@@ -51,6 +51,8 @@ class TPF_Sequence(Image_Sequence):
         '''
         if timestep is None:
             return None
+        elif self._is_selection(timestep):
+            return self.view(timestep)
         else:
             return self.tpf.flux[timestep, :, :]
 
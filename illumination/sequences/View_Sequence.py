@@ -0,0 +1,137 @@
+'''
+Define a lightweight view into a subset of another image sequence.
+'''
+from .Image_Sequence import *
+
+__all__ = ['View_Sequence']
+
+class View_Sequence(Image_Sequence):
+    '''
+    A subset of the timesteps of another (parent) image sequence.
+
+    No images are copied and no files are reread to make a view;
+    images are pulled from the parent (through its cache) only
+    when they are requested.
+    '''
+
+    def __init__(self, parent, timesteps, name=None):
+        '''
+        Initialize a view into a parent sequence.
+
+        Parameters
+        ----------
+        parent : Image_Sequence
+            The sequence to view.
+
+        timesteps : array of ints
+            Which of the parent's timesteps to include, in order.
+
+        name : str
+            The name of this view (defaults to the parent's).
+        '''
+
+        # views of views just point back to the original parent
+        timesteps = np.arange(parent.N)[timesteps]
+        if isinstance(parent, View_Sequence):
+            timesteps = parent._timesteps[timesteps]
+            parent = parent.parent
+
+        Sequence.__init__(self, name=name or parent.name)
+        self.parent = parent
+        self._timesteps = timesteps
+
+        # share the parent's metadata, for just these timesteps
+        self.time = parent.time[timesteps]
+        self._timeisfake = parent._timeisfake
+        self.static = getattr(parent, 'static', {})
+        self.temporal = {}
+        for k, v in parent.temporal.items():
+            if np.size(v) == parent.N:
+                self.temporal[k] = np.asarray(v)[timesteps]
+            else:
+                self.temporal[k] = v
+
+        # summary images depend on which timesteps are included
+        self.spatial = {}
+
+    def __repr__(self):
+        '''
+        How should this sequence be represented, by default, as a string.
+        '''
+        return '<view of {} timesteps from {}>'.format(self.N, self.parent)
+
+    @property
+    def N(self):
+        '''
+        How many elements are in this sequence?
+        '''
+        return len(self._timesteps)
+
+    @property
+    def shape(self):
+        '''
+        Returns
+        -------
+        s : tuple
+            The shape of the image stack (ntimes x nrows x ncols)
+        '''
+        return (self.N,) + tuple(self.parent.shape[1:])
+
+    @property
+    def titlefordisplay(self):
+        return self.parent.titlefordisplay
+
+    @property
+    def colorbarlabelfordisplay(self):
+        return self.parent.colorbarlabelfordisplay
+
+    def __getitem__(self, timestep):
+        '''
+        Return the image data for a given timestep.
+
+        This function is called when you say `sequence[timestep]`.
+
+        Parameters
+        ----------
+        timestep : int
+            A timestep index (which element in the sequence do you want?)
+        '''
+        if timestep is None:
+            return None
+        elif self._is_selection(timestep):
+            return self.view(timestep)
+        else:
+            return self.parent[self._timesteps[timestep]]
+
+    def read_region(self, timestep, rows=None, cols=None, cache=True):
+        '''
+        Return a rectangular region of the image at a given timestep.
+        (see the parent sequence's `read_region`)
+        '''
+        return self.parent.read_region(self._timesteps[timestep], rows, cols, cache=cache)
+
+    @property
+    def _prefetchable(self):
+        '''
+        Can images be read ahead of time into the (parent's) cache?
+        '''
+        return getattr(self.parent, '_prefetchable', False)
+
+    @property
+    def _images(self):
+        '''
+        The parent's image cache.
+        '''
+        return self.parent._images
+
+    def _cachekey(self, timestep):
+        '''
+        The key under which a timestep's image is cached (by the parent).
+        '''
+        return self.parent._cachekey(self._timesteps[timestep])
+
+    def _prefetch_task(self, timestep):
+        '''
+        A (function, arguments) pair that will decode one timestep's image.
+        '''
+        return self.parent._prefetch_task(self._timesteps[timestep])
@@ -4,8 +4,90 @@ from .Stamp_Sequence import *
 from .TPF_Sequence import *
 from .Timeseries_Sequence import *
 from .Array_Sequence import *
+from .View_Sequence import *
+from .CubeStore_Sequence import *
 from .filenameparsers import *
 from .Movie_Sequence import *
+from .prefetch import *
+from .headers import *
+from .index import *
+from .reductions import *
+from .scanning import *
+from .Picture_Sequence import *
+from .formats import *
+
+def is_npy_filename(filename):
+    '''
+    Does this filename look like it holds a single numpy array?
+    (Stamps saved as .npy files are pickled dictionaries, not arrays.)
+    '''
+    if not filename.endswith('.npy'):
+        return False
+    try:
+        with open(filename, 'rb') as f:
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+        return not dtype.hasobject
+    except (IOError, OSError, ValueError):
+        return False
+
+# recognize files by their first few bytes (and their names)
+def _is_tpf(filename, head):
+    lower = os.path.basename(filename).lower().replace('.gz', '')
+    return (head[:6] == b'SIMPLE' or head[:2] == b'\x1f\x8b') and lower.endswith(('_tp.fits', '-targ.fits'))
+
+def _is_fits(filename, head):
+    return head[:9] == b'SIMPLE  ='
+
+def _is_gzipped_fits(filename, head):
+    return (head[:2] == b'\x1f\x8b') and is_fits_filename(filename)
+
+def _is_bzipped_fits(filename, head):
+    return (head[:3] == b'BZh') and is_fits_filename(filename)
+
+def _is_npy(filename, head):
+    return (head[:6] == b'\x93NUMPY') and is_npy_filename(filename)
+
+def _is_stamp(filename, head):
+    return head[:6] == b'\x93NUMPY'
+
+def _is_movie(filename, head):
+    return head[4:8] in [b'ftyp', b'moov', b'mdat']
+
+def _is_picture(filename, head):
+    return (head[:8] == b'\x89PNG\r\n\x1a\n') or (head[:3] == b'\xff\xd8\xff')
+
+register_format('tpf', _is_tpf, TPF_Sequence, regions=False)
+register_format('fits', _is_fits, FITS_Sequence, regions=True, memmap=True)
+register_format('fits.gz', _is_gzipped_fits, FITS_Sequence, regions=True)
+register_format('fits.bz2', _is_bzipped_fits, FITS_Sequence, regions=True)
+register_format('npy', _is_npy, Array_Sequence, regions=True, memmap=True)
+register_format('stamp', _is_stamp, Stamp_Sequence)
+register_format('movie', _is_movie, Movie_Sequence, randomaccess=False)
+register_format('picture', _is_picture, Picture_Sequence)
+
+def _search(initial):
+    '''
+    If `initial` is a search string, find the files it matches
+    (otherwise, return None).
+    '''
+    if isinstance(initial, str) and any(c in initial for c in '*?['):
+        return find_files(initial)
+    return None
+
+def _first_filename(initial):
+    '''
+    Pull out the first filename from a filename, or a list (or
+    array) of them. Returns None if `initial` isn't made of filenames.
+    '''
+    if isinstance(initial, str):
+        return initial
+    elif isinstance(initial, (list, np.ndarray)) and (len(initial) > 0):
+        if isinstance(initial[0], (str, np.str_)):
+            return str(initial[0])
+    return None
 
 def make_image_sequence(initial, *args, **kwargs):
     '''
@@ -22,11 +104,23 @@ def make_image_sequence(initial, *args, **kwargs):
         initial : (many possible types)
                 This is the input that initializes an image sequence.
                     - single FITS filename, and an extension to use.
-                    - list of FITS filenames, and an extension to use.
+                    - list (or array) of FITS filenames, and an extension to use.
                     - a glob pattern to search for FITS files (and extension)
+                      (any of these FITS files can be gzipped or tile-compressed)
                     - single FITS HDUList, and an extension to use.
                     - list of loaded FITS HDULists, and an extension to use.
                     - a Stamp object from the `cosmics` package.
+                    - a 3D array, or an np.memmap of one.
+                    - a .npy filename (which will be memory-mapped).
+                    - a raw binary filename, with `shape=` and `dtype=`.
+                    - an .mp4 or .mov movie filename.
+                    - a PNG or JPEG filename (or a list, or a search string).
+
+                Files are recognized by their first few bytes (see
+                `register_format` to add more kinds), and the sequence
+                that's made records the format's `capabilities`. Images
+                are memory-mapped only if asked for (with `memmap=True`),
+                and only for formats that can be.
 
         *args
             Positional arguments will be passed on to whatever Sequence is initialized
@@ -36,6 +130,13 @@ def make_image_sequence(initial, *args, **kwargs):
 
     '''
 
+    # if it's made of filenames, which is the first one?
+    # (a search only happens once, and its results are handed on)
+    search, found = initial, _search(initial)
+    if (found is not None) and (len(found) > 0):
+        initial = found
+    first = _first_filename(initial)
+
     # is it already a sequence?
     if issubclass(initial.__class__, Sequence):
         return initial
@@ -45,8 +146,33 @@ def make_image_sequence(initial, *args, **kwargs):
     # is it a Stamp?
     elif isinstance(initial, Cube):
         return Stamp_Sequence(initial, *args, **kwargs)
-    elif type(initial) == np.ndarray:
+    # is it an array (maybe memory-mapped from a file)?
+    elif isinstance(initial, np.ndarray) and (initial.dtype.kind not in 'USO'):
+        return Array_Sequence(initial, **kwargs)
+    # is it a raw binary file (with a shape and dtype)?
+    elif isinstance(initial, str) and ('shape' in kwargs and 'dtype' in kwargs):
         return Array_Sequence(initial, **kwargs)
+    # is it a file (or files)? sniff the first one, to choose a reader up front
+    elif first is not None:
+        entry = sniff_format(first)
+        if entry is None:
+            raise ValueError("{} doesn't look like any known kind of images ({})".format(
+                              first, ', '.join([f['name'] for f in formats])))
+        if kwargs.get('memmap', False) and not entry['capabilities']['memmap']:
+            # (this format can't be memory-mapped, so read it normally)
+            kwargs['memmap'] = False
+        if entry['constructor'] is TPF_Sequence:
+            # (a TPF_Sequence shows just one target pixel file)
+            if (not isinstance(initial, str)) and (len(initial) > 1):
+                raise ValueError("a TPF_Sequence can only show one target pixel file at a time, "
+                                 "not {} of them (like {}); make one for each".format(len(initial), first))
+            initial = first
+        sequence = entry['constructor'](initial, *args, **kwargs)
+        sequence.capabilities = entry['capabilities']
+        if found is not None and hasattr(sequence, '_source'):
+            # (so new files can still be searched for later)
+            sequence._source = search
+        return sequence
     else:
         # try:
         #	# is initial a 1D thing?
@@ -0,0 +1,295 @@
+'''
+Define a small least-recently-used cache, for keeping
+decoded images (and open files) around between accesses.
+'''
+
+import threading
+from collections import OrderedDict
+from ..imports import *
+
+__all__ = ['LRUCache']
+
+class LRUCache(Talker):
+    '''
+    A least-recently-used cache, bounded by the total number
+    of bytes it holds and/or by the number of items it holds.
+
+    Whenever a new item would push the cache past either limit,
+    the items that were used least recently get evicted first.
+
+    If the future order of accesses is known (for example, while
+    animating), `nextuse` can be set to a function that returns how
+    far in the future each key will next be needed; the cache will
+    then evict whichever item will be needed farthest in the future.
+    '''
+
+    def __init__(self, maxbytes=None, maxitems=None, onevict=None, name='cache'):
+        '''
+        Initialize an (empty) cache.
+
+        Parameters
+        ----------
+
+        maxbytes : float, None
+            The maximum number of bytes to hold in the cache.
+            (None means there is no limit on the size.)
+
+        maxitems : int, None
+            The maximum number of items to hold in the cache.
+            (None means there is no limit on the number.)
+
+        onevict : function, None
+            A function that will be called as `onevict(key, value)`
+            on every item that gets evicted from the cache
+            (for example, to close an open file).
+
+        name : str
+            A name for this cache.
+        '''
+
+        Talker.__init__(self, nametag=name, prefixformat='{:>32}')
+
+        self.maxbytes = maxbytes
+        self.maxitems = maxitems
+        self.onevict = onevict
+
+        # optionally, a function saying when each key will next be used
+        self.nextuse = None
+
+        # items that are on their way (as futures), from a prefetcher
+        self.pending = {}
+
+        # the items, in order from least to most recently used
+        self._items = OrderedDict()
+        self._sizes = {}
+        self.nbytes = 0
+
+        # keep track of how well the cache is working
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # the cache might be shared by multiple threads
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        '''
+        How should this cache be represented, as a string?
+        '''
+        return '<{} | {} items, {:.1f}MB | {} hits, {} misses>'.format(
+                    self.nametag, len(self), self.nbytes/1e6, self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    @property
+    def enabled(self):
+        '''
+        Is this cache allowed to hold anything at all?
+        '''
+        return (self.maxbytes is None or self.maxbytes > 0) and (self.maxitems is None or self.maxitems > 0)
+
+    def get(self, key, default=None):
+        '''
+        Retrieve an item from the cache (marking it as recently used).
+
+        If the item is missing but is still being made
+        (it's in `pending`), this waits for it to arrive,
+        rather than making the caller produce it a second time.
+
+        Parameters
+        ----------
+
+        key : hashable
+            The key of the item to retrieve.
+
+        default : anything
+            What to return if the key isn't in the cache.
+
+        Returns
+        -------
+
+        value : anything
+            The cached item (or the default, if it's missing).
+        '''
+        with self._lock:
+            try:
+                value = self._items[key]
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+            except KeyError:
+                future = self.pending.get(key)
+
+        # wait (outside the lock) for an item that's on its way
+        if future is not None:
+            try:
+                value = future.result()
+            except Exception:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value, nbytes=None):
+        '''
+        Store an item in the cache, evicting older ones if necessary.
+
+        Parameters
+        ----------
+
+        key : hashable
+            The key under which this item should be stored.
+
+        value : anything
+            The item to store.
+
+        nbytes : int, None
+            The size of this item, in bytes. If None,
+            this will use `value.nbytes` (or 0, if that
+            doesn't exist).
+        '''
+
+        if not self.enabled:
+            return
+
+        if nbytes is None:
+            nbytes = getattr(value, 'nbytes', 0)
+
+        # don't bother caching something that could never fit
+        if (self.maxbytes is not None) and (nbytes > self.maxbytes):
+            return
+
+        with self._lock:
+            displaced = self._remove(key)
+            self._items[key] = value
+            self._sizes[key] = nbytes
+            self.nbytes += nbytes
+            if (displaced is not None) and (displaced is not value) and (self.onevict is not None):
+                # (an item replaced by a different one counts as evicted)
+                self.onevict(key, displaced)
+            self._evict()
+
+    def setdefault(self, key, value, nbytes=None):
+        '''
+        Store an item in the cache, unless something is
+        already stored under its key. The check and the store
+        happen together, so two threads that both missed the
+        same key end up sharing one item.
+
+        Parameters
+        ----------
+
+        key : hashable
+            The key under which this item should be stored.
+
+        value : anything
+            The item to store (if the key is missing).
+
+        nbytes : int, None
+            The size of this item, in bytes (see `put`).
+
+        Returns
+        -------
+
+        value : anything
+            Whichever item is now stored under the key
+            (or the given value, if the cache is disabled).
+        '''
+        with self._lock:
+            if key in self._items:
+                return self._items[key]
+            self.put(key, value, nbytes=nbytes)
+            return value
+
+    def discard(self, key):
+        '''
+        Remove an item from the cache (without calling `onevict`).
+
+        Parameters
+        ----------
+
+        key : hashable
+            The key of the item to remove.
+        '''
+        with self._lock:
+            return self._remove(key)
+
+    def clear(self):
+        '''
+        Empty the cache, calling `onevict` on everything in it.
+        '''
+        with self._lock:
+            while len(self._items) > 0:
+                key = next(iter(self._items))
+                self._evictone(key)
+
+    def _remove(self, key):
+        '''
+        Remove an item, updating the byte count.
+        '''
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            return None
+        self.nbytes -= self._sizes.pop(key)
+        return value
+
+    def _overbudget(self):
+        '''
+        Is the cache holding more than it's allowed?
+        '''
+        toomanybytes = (self.maxbytes is not None) and (self.nbytes > self.maxbytes)
+        toomanyitems = (self.maxitems is not None) and (len(self._items) > self.maxitems)
+        return toomanybytes or toomanyitems
+
+    def _choose_victim(self):
+        '''
+        Pick which key should be evicted next
+        (by default, the least recently used one).
+        '''
+        if self.nextuse is not None:
+            # evict whatever will be needed farthest in the future
+            # (`max` keeps the first, least recently used, of any ties)
+            return max(self._items, key=self.nextuse)
+        return next(iter(self._items))
+
+    def _evictone(self, key):
+        '''
+        Evict one item from the cache.
+        '''
+        value = self._remove(key)
+        self.evictions += 1
+        if self.onevict is not None:
+            self.onevict(key, value)
+
+    def _evict(self):
+        '''
+        Evict items until the cache is back within its budget.
+        '''
+        while self._overbudget() and len(self._items) > 0:
+            self._evictone(self._choose_victim())
+
+    def statistics(self):
+        '''
+        Summarize how well the cache is working.
+
+        Returns
+        -------
+
+        stats : dict
+            The number of hits, misses, evictions, items, and bytes.
+        '''
+        return dict(hits=self.hits,
+                    misses=self.misses,
+                    evictions=self.evictions,
+                    items=len(self),
+                    nbytes=self.nbytes)
@@ -3,8 +3,15 @@ Define some filename parsers than can pull details from filenames,
 and convert them to dictionaries.
 '''
 
+import re
 from ..imports import *
 
+__all__ = ['generic_filenameparser', 'explicit_filenameparser',
+           'tessqlp_filenameparser', 'tessqlp_fullcamera_filenameparser',
+           'mast_filenameparser', 'flexible_filenameparser',
+           'filenameparsers', 'choose_filenameparser', 'parse_filenames',
+           'ydays_to_time']
+
 
 
 def generic_filenameparser(filename):
@@ -140,23 +147,98 @@ def mast_filenameparser(filename):
         and the image type.
     '''
 
+    d = _mast_fields(filename)
+    d['astropytime'] = Time(_yday(d['datetime']), format='yday')
+    d['jd'] =  d['astropytime'].jd
+    return d
+
+def _mast_fields(filename):
+    '''
+    Pull everything but the time out of a MAST-type filename
+    (leaving the datetime string, to be converted later).
+    '''
     d = {}
     d['filename'] = os.path.basename(filename)
     s = d['filename'].split('.fit')[0]
     components = s.split('-')
 
     d['datetime'] = components[0][4:]
-    dt=d['datetime']
-    year, day, hour, minute, second = dt[0:4], dt[4:7], dt[7:9], dt[9:11], dt[11:13]
-    yday = '{}:{}:{}:{}:{}'.format(year, day, hour, minute, second)
-    d['astropytime'] = Time(yday, format='yday')
-    d['jd'] =  d['astropytime'].jd
     d['camera'] = int(components[2])
     d['ccd'] = int(components[3])
     d['crm'] = components[5][0] == 's'
     d['type'] = components[5][2:6]
     return d
 
+def _yday(dt):
+    '''
+    Convert a "YYYYDDDHHMMSS" string into astropy's "yday" format.
+    '''
+    year, day, hour, minute, second = dt[0:4], dt[4:7], dt[7:9], dt[9:11], dt[11:13]
+    return '{}:{}:{}:{}:{}'.format(year, day, hour, minute, second)
+
+def ydays_to_time(datetimes):
+    '''
+    Convert many "YYYYDDDHHMMSS" strings (as in MAST filenames)
+    into one astropy Time, with a single vectorized conversion.
+
+    Parameters
+    ----------
+    datetimes : list of str
+        The datetime strings.
+
+    Returns
+    -------
+    time : astropy Time
+        The times, as one array-valued Time.
+    '''
+    return Time([_yday(dt) for dt in datetimes], format='yday')
+
+# filename parsers, in order of priority, each with a (compiled)
+# pattern that filenames must match for that parser to work on them
+filenameparsers = [
+    (mast_filenameparser, re.compile(r'^.{4}\d{13}[^-]*-[^-]*-\d+-\d+-[^-]*-[^-]')),
+    (tessqlp_filenameparser, re.compile(r'^[^-]*-\d+(\.\d*)?-\d+-[^-]*-[^-]*(-.*)?ccd.')),
+    (tessqlp_fullcamera_filenameparser, re.compile(r'^[^-]*-\d+(\.\d*)?-\d+-[^-]*-')),
+    (explicit_filenameparser, re.compile(r'')),
+    (generic_filenameparser, re.compile(r''))]
+
+def _first_working_parser(filename):
+    '''
+    Find the first registered filename parser whose pattern
+    matches a filename, and that parses it without an error
+    (like a MAST-type name with an impossible day of the year),
+    returning (parser, pattern, features).
+    '''
+    stem = os.path.basename(filename).split('.fit')[0]
+    for parser, pattern in filenameparsers:
+        if pattern.match(stem):
+            try:
+                return parser, pattern, parser(filename)
+            except Exception:
+                continue
+
+def choose_filenameparser(filename):
+    '''
+    Choose the first registered filename parser whose
+    pattern matches a filename (skipping any parsers
+    that raise an error when they try to parse it).
+
+    Parameters
+    ----------
+    filename : str
+        The filename of a single FITS image.
+
+    Returns
+    -------
+    parser : function
+        The filename parser to use.
+
+    pattern : compiled regular expression
+        The pattern that filename matched.
+    '''
+    parser, pattern, features = _first_working_parser(filename)
+    return parser, pattern
+
 def flexible_filenameparser(filename):
     '''
     Parse a generic FITS filename,
@@ -174,17 +256,87 @@ def flexible_filenameparser(filename):
         This dictionary of details contains at least the filename, and
         hopefully some other stuff too.
     '''
+    parser, pattern, features = _first_working_parser(filename)
+    return features
 
-    # filename parsers, in order of priority
-    parsers = [ mast_filenameparser,
-                tessqlp_filenameparser,
-                tessqlp_fullcamera_filenameparser,
-                explicit_filenameparser,
-                generic_filenameparser]
+def parse_filenames(filenames, filenameparser=flexible_filenameparser):
+    '''
+    Parse many filenames at once.
+
+    With the flexible parser, the parser chosen for the first file
+    is used for every other file that matches its pattern (only
+    files that don't are sent back through the whole registry).
+    The datetimes in MAST-type filenames are converted to JDs
+    all at once, rather than one file at a time.
+
+    Parameters
+    ----------
+    filenames : list
+        The filenames to parse.
+
+    filenameparser : function
+        The parser to use (or flexible_filenameparser to guess).
+
+    Returns
+    -------
+    features : list of dicts
+        The details parsed from each filename. (For speed, MAST-type
+        filenames get a 'jd' but no individual 'astropytime'.)
+    '''
+
+    if len(filenames) == 0:
+        return []
+    if filenameparser is not flexible_filenameparser:
+        if filenameparser is not mast_filenameparser:
+            return [filenameparser(f) for f in filenames]
+        parsers = [mast_filenameparser]*len(filenames)
+    else:
+        # remember which parser worked on the first file
+        parser, pattern = choose_filenameparser(filenames[0])
+        priority = [pat for p, pat in filenameparsers].index(pattern)
+        higher = [pat for p, pat in filenameparsers[:priority]]
+        parsers = []
+        for f in filenames:
+            # (a file goes straight to that parser, as long as
+            #  no parser with higher priority would claim it)
+            stem = os.path.basename(f).split('.fit')[0]
+            if pattern.match(stem) and not any(h.match(stem) for h in higher):
+                parsers.append(parser)
+            else:
+                parsers.append(choose_filenameparser(f)[0])
+
+    # parse everything but the MAST times
+    flexible = filenameparser is flexible_filenameparser
+    parsed, needtime = [], []
+    for i, (f, p) in enumerate(zip(filenames, parsers)):
+        try:
+            if p is mast_filenameparser:
+                parsed.append(_mast_fields(f))
+                needtime.append(i)
+            else:
+                parsed.append(p(f))
+        except Exception:
+            if not flexible:
+                raise
+            parsed.append(_first_working_parser(f)[2])
 
-    # try each parser in turn, moving to the next if one complains
-    for p in parsers:
+    # convert all the MAST times in one go
+    if len(needtime) > 0:
         try:
-            return p(filename)
-        except:
-            pass
+            jd = ydays_to_time([parsed[i]['datetime'] for i in needtime]).jd
+        except ValueError:
+            if not flexible:
+                raise
+            # (some aren't real times, so find those one at a time,
+            #  and send them on to the next parser that works)
+            jd = []
+            for i in needtime:
+                try:
+                    jd.append(ydays_to_time([parsed[i]['datetime']]).jd[0])
+                except ValueError:
+                    parsed[i] = _first_working_parser(filenames[i])[2]
+                    jd.append(None)
+        for i, j in zip(needtime, jd):
+            if j is not None:
+                parsed[i]['jd'] = j
+    return parsed
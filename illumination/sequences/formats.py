@@ -0,0 +1,84 @@
+'''
+A registry of the kinds of files that can become image sequences,
+each recognized by cheaply sniffing the first few bytes of a file
+(and its filename), so the right reader can be chosen up front.
+'''
+
+from ..imports import *
+
+__all__ = ['register_format', 'sniff_format', 'formats']
+
+# the registered formats, in the order they're checked
+formats = []
+
+def register_format(name, sniffer, constructor, randomaccess=True, regions=False, memmap=False, first=False):
+    '''
+    Register a kind of file that can be turned into an image sequence.
+
+    Parameters
+    ----------
+    name : str
+        A short name for this format.
+
+    sniffer : function
+        A function that takes (filename, head), where head is the first
+        (up to) 512 bytes of the file, and returns True if the file is in
+        this format. It should be cheap (never read the whole file).
+
+    constructor : function
+        A function (like a Sequence class) that takes the filename
+        (or list of filenames, or search string) and keywords,
+        and returns an image sequence.
+
+    randomaccess : bool
+        Can any timestep be read about as quickly as any other?
+
+    regions : bool
+        Can part of an image be read without decoding all of it?
+
+    memmap : bool
+        Can images be memory-mapped straight from the file?
+
+    first : bool
+        Should this format be checked before the others
+        (to override one that's already registered)?
+    '''
+    entry = dict(name=name, sniffer=sniffer, constructor=constructor,
+                 capabilities=dict(randomaccess=randomaccess, regions=regions, memmap=memmap))
+    if first:
+        formats.insert(0, entry)
+    else:
+        formats.append(entry)
+    return entry
+
+def _read_head(filename, nbytes=512):
+    '''
+    Read the first few bytes of a file.
+    '''
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(nbytes)
+    except (IOError, OSError):
+        return b''
+
+def sniff_format(filename):
+    '''
+    Figure out which registered format a file is in.
+
+    Parameters
+    ----------
+    filename : str
+        The file to check.
+
+    Returns
+    -------
+    entry : dict, None
+        The registry entry for the format (with its name,
+        constructor, and capabilities), or None if the
+        file doesn't look like any registered format.
+    '''
+    head = _read_head(filename)
+    for entry in formats:
+        if entry['sniffer'](filename, head):
+            return entry
+    return None
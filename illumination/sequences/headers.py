@@ -0,0 +1,98 @@
+'''
+Tools to read (only) the headers from lots of FITS files,
+in parallel, without ever touching their pixel data.
+'''
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from ..imports import *
+
+__all__ = ['read_headers', 'scan_headers', 'columns_from_headers']
+
+def read_headers(filename, extensions=[0, 1]):
+    '''
+    Read the headers from a FITS file, skipping past its data.
+
+    Parameters
+    ----------
+    filename : str
+        The FITS file to read.
+
+    extensions : list
+        The extensions whose headers should be read.
+
+    Returns
+    -------
+    header : dict
+        The keys and values from all the requested extensions,
+        merged into one dictionary (later extensions take
+        precedence over earlier ones, if a key is repeated).
+    '''
+
+    merged = {}
+
+    # HDUs are loaded lazily, so only the header blocks get read
+    with fits.open(filename, memmap=False, lazy_load_hdus=True, ignore_missing_end=True) as hdulist:
+        for e in extensions:
+            h = hdulist[e].header
+            for k in h.keys():
+                v = h[k]
+                # COMMENT + HISTORY cards are kept as simple strings
+                if not isinstance(v, (str, int, float, bool, np.number, np.bool_)):
+                    v = str(v)
+                merged[k] = v
+    return merged
+
+def scan_headers(filenames, extensions=[0, 1], nworkers=None, processes=False):
+    '''
+    Read the headers from many FITS files, in parallel.
+
+    Parameters
+    ----------
+    filenames : list
+        The FITS files to read.
+
+    extensions : list
+        The extensions whose headers should be read from each file.
+
+    nworkers : int, None
+        How many threads (or processes) should read at once?
+        (None lets concurrent.futures choose a default; 1 reads serially.)
+
+    processes : bool
+        Should we use separate processes (True) instead of threads (False)?
+
+    Returns
+    -------
+    headers : list of dicts
+        The merged header dictionary for each file, in the same order as `filenames`.
+    '''
+
+    extensions = [int(e) for e in extensions]
+    if (nworkers == 1) or (len(filenames) <= 1):
+        return [read_headers(f, extensions) for f in filenames]
+
+    pool = [ThreadPoolExecutor, ProcessPoolExecutor][processes]
+    with pool(max_workers=nworkers) as executor:
+        return list(executor.map(read_headers, filenames, [extensions]*len(filenames)))
+
+def columns_from_headers(headers):
+    '''
+    Convert a list of header dictionaries (one per file)
+    into a dictionary of lists (one per header key).
+
+    Parameters
+    ----------
+    headers : list of dicts
+        The header dictionary for each file.
+
+    Returns
+    -------
+    columns : dict
+        For each key that appears in any header, a list of its
+        values across all the files (with None where it's missing).
+    '''
+    keys = {}
+    for h in headers:
+        for k in h.keys():
+            keys[k] = None
+    return {k: [h.get(k) for h in headers] for k in keys}
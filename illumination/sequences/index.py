@@ -0,0 +1,458 @@
+'''
+Define a sidecar index, which remembers what was learned from
+a set of files (their parsed headers and filenames, time axis,
+and image shapes) so it doesn't need to be rediscovered
+the next time a sequence is made from the same files.
+'''
+
+import hashlib
+from ..imports import *
+
+__all__ = ['SidecarIndex']
+
+# how to store each kind of value as a column
+kinds = dict(bool=bool, int=np.int64, float=np.float64, str=str)
+
+def _kind(value):
+    '''
+    Figure out which kind of column a single value belongs in.
+    '''
+    if isinstance(value, (bool, np.bool_)):
+        return 'bool'
+    elif isinstance(value, (int, np.integer)):
+        return 'int'
+    elif isinstance(value, (float, np.floating)):
+        return 'float'
+    elif isinstance(value, Time):
+        return 'time'
+    else:
+        return 'str'
+
+def _simplest_kind(found):
+    '''
+    Pick the simplest kind of column that can hold every kind found.
+    '''
+    if found == set(['time']):
+        return 'time'
+    elif found <= set(['bool']):
+        return 'bool'
+    elif found <= set(['int']):
+        return 'int'
+    elif found <= set(['int', 'float']):
+        return 'float'
+    else:
+        return 'str'
+
+def _encode(values):
+    '''
+    Convert a list of values (with None for missing ones)
+    into a compact (array, missing, kind) column.
+    '''
+    missing = np.array([v is None for v in values], dtype=bool)
+    present = [v for v in values if v is not None]
+    kind = _simplest_kind(set([_kind(v) for v in present]))
+
+    if kind == 'time':
+        # times are stored as UTC JDs
+        array = np.zeros(len(values))
+        array[~missing] = Time(present).utc.jd
+    else:
+        filler = kinds[kind]()
+        array = np.array([filler if v is None else v for v in values]).astype(kinds[kind])
+    return array, missing, kind
+
+def _decode(array, missing, kind):
+    '''
+    Convert a column back into an array of values.
+    '''
+    if kind == 'time':
+        values = np.array([Time(jd, format='jd', scale='utc') for jd in array], dtype=object)
+    else:
+        values = array
+    if missing.any():
+        values = values.astype(object)
+        values[missing] = None
+    return values
+
+def _dtype_from_header(header):
+    '''
+    Guess the dtype astropy will give an image, from its header.
+    '''
+    bitpix = header.get('BITPIX', None)
+    bzero, bscale = header.get('BZERO', 0), header.get('BSCALE', 1)
+    if bitpix is None:
+        return ''
+    native = {8:'uint8', 16:'int16', 32:'int32', 64:'int64', -32:'float32', -64:'float64'}[bitpix]
+    if bscale != 1:
+        return ['float32', 'float64'][int(abs(bitpix) > 16)]
+    if (bitpix > 8) and (bzero == 2**(bitpix - 1)):
+        return native.replace('int', 'uint')
+    if bzero != 0:
+        return ['float32', 'float64'][int(abs(bitpix) > 16)]
+    return native
+
+class SidecarIndex(Talker):
+    '''
+    A small columnar (.npz) file that sits next to some data files,
+    remembering what has been learned about each of them.
+
+    Each file is identified by its path, size, and modification time;
+    if any of these change, that file needs to be rescanned.
+    '''
+
+    def __init__(self, path, settings=''):
+        '''
+        Initialize an index, loading it from disk if it exists.
+
+        Parameters
+        ----------
+        path : str
+            The filename of the index (ending in .npz).
+
+        settings : str
+            A description of the settings that produced this index.
+            (An index made with different settings will be ignored.)
+        '''
+
+        Talker.__init__(self, prefixformat='{:>32}')
+
+        self.path = path
+        self.settings = settings
+        self.changed = False
+
+        # one row for each file
+        self.paths = []
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.mtimes = np.zeros(0)
+        self._rows = {}
+
+        # columns of values: {section: {key: (array, missing, kind)}}
+        self.sections = {}
+
+        # which rows have been scanned for each section: {section: bool array}
+        self.scanned = {}
+
+        # the time axis, as one GPS time for each file
+        self.timesettings = ''
+        self.timeresolved = ''
+        self.gps = np.zeros(0)
+        self.hasgps = np.zeros(0, dtype=bool)
+
+        self.load()
+
+    def __repr__(self):
+        return '<sidecar index of {} files at {}>'.format(len(self.paths), self.path)
+
+    @classmethod
+    def near(cls, filenames, settings=''):
+        '''
+        Create an index in the directory shared by some files.
+
+        Parameters
+        ----------
+        filenames : list
+            The files to be indexed.
+
+        settings : str
+            A description of the settings that produced this index.
+            (Each different set of settings gets its own index file.)
+        '''
+        directory = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in filenames])
+        tag = hashlib.md5(settings.encode()).hexdigest()[:8]
+        return cls(os.path.join(directory, '.illumination-index-{}.npz'.format(tag)), settings=settings)
+
+    def load(self):
+        '''
+        Load the index from disk (if it exists and has matching settings).
+        '''
+        try:
+            with np.load(self.path, allow_pickle=False) as z:
+                if str(z['settings']) != self.settings:
+                    self.speak('ignoring {}, which has different settings'.format(self.path))
+                    return
+                self.paths = list(z['path'])
+                self.sizes = z['size']
+                self.mtimes = z['mtime']
+                self.timesettings = str(z['timesettings'])
+                self.timeresolved = str(z['timeresolved'])
+                self.gps = z['gps']
+                self.hasgps = z['hasgps']
+                for name in z.files:
+                    pieces = name.split('/')
+                    if pieces[0] == 'scanned':
+                        self.scanned[pieces[1]] = z[name]
+                    elif (len(pieces) == 3) and (pieces[2] != 'missing'):
+                        section, key, kind = pieces
+                        columns = self.sections.setdefault(section, {})
+                        columns[key] = (z[name], z['{}/{}/missing'.format(section, key)], kind)
+        except (IOError, OSError, KeyError, ValueError):
+            return
+        self._rows = {p: i for i, p in enumerate(self.paths)}
+        self.speak('loaded {}'.format(self))
+
+    def save(self):
+        '''
+        Write the index to disk (if anything has changed).
+        '''
+        if not self.changed:
+            return
+        tosave = dict(settings=np.array(self.settings),
+                      path=np.array(self.paths, dtype=str),
+                      size=self.sizes,
+                      mtime=self.mtimes,
+                      timesettings=np.array(self.timesettings),
+                      timeresolved=np.array(self.timeresolved),
+                      gps=self.gps,
+                      hasgps=self.hasgps)
+        for section, columns in self.sections.items():
+            tosave['scanned/{}'.format(section)] = self.scanned[section]
+            for key, (array, missing, kind) in columns.items():
+                tosave['{}/{}/{}'.format(section, key, kind)] = array
+                tosave['{}/{}/missing'.format(section, key)] = missing
+
+        # write to a temporary file first, so the index is never half-written
+        try:
+            temporary = self.path + '.tmp'
+            with open(temporary, 'wb') as f:
+                np.savez(f, **tosave)
+            os.replace(temporary, self.path)
+            self.changed = False
+            self.speak('saved {}'.format(self))
+        except (IOError, OSError):
+            self.speak('unable to save {}'.format(self))
+
+    def _stat(self, filenames):
+        '''
+        Find the index rows for some files, and whether they're up to date.
+        '''
+        paths = [os.path.abspath(f) for f in filenames]
+        stats = [os.stat(p) for p in paths]
+        rows = np.array([self._rows.get(p, -1) for p in paths], dtype=int)
+        sizes = np.array([s.st_size for s in stats], dtype=np.int64)
+        mtimes = np.array([s.st_mtime for s in stats])
+        known = rows >= 0
+        current = np.zeros(len(paths), dtype=bool)
+        current[known] = (self.sizes[rows[known]] == sizes[known]) & (self.mtimes[rows[known]] == mtimes[known])
+        return paths, sizes, mtimes, rows, current
+
+    def _update_rows(self, paths, sizes, mtimes):
+        '''
+        Make sure every path has a row, with its current size + mtime.
+        (Any row whose file has changed forgets what it knew.)
+        '''
+        rows, newsizes, newmtimes = [], [], []
+        existing = len(self.paths)
+        for p, size, mtime in zip(paths, sizes, mtimes):
+            i = self._rows.get(p, -1)
+            if i < 0:
+                # (new rows are collected, and added all at once below)
+                i = len(self.paths)
+                self._rows[p] = i
+                self.paths.append(p)
+                newsizes.append(size)
+                newmtimes.append(mtime)
+            elif (i < existing) and ((self.sizes[i] != size) or (self.mtimes[i] != mtime)):
+                self.sizes[i], self.mtimes[i] = size, mtime
+                self.hasgps[i] = False
+                for section, columns in self.sections.items():
+                    self.scanned[section][i] = False
+                    for key, (array, missing, kind) in columns.items():
+                        missing[i] = True
+            rows.append(i)
+
+        # grow every array just once
+        n = len(newsizes)
+        if n > 0:
+            self.sizes = np.concatenate([self.sizes, np.array(newsizes, dtype=self.sizes.dtype)])
+            self.mtimes = np.concatenate([self.mtimes, np.array(newmtimes, dtype=self.mtimes.dtype)])
+            self.gps = np.concatenate([self.gps, np.zeros(n)])
+            self.hasgps = np.concatenate([self.hasgps, np.zeros(n, dtype=bool)])
+            for section, columns in self.sections.items():
+                self.scanned[section] = np.concatenate([self.scanned[section], np.zeros(n, dtype=bool)])
+                for key, (array, missing, kind) in columns.items():
+                    filler = 0.0 if kind == 'time' else kinds[kind]()
+                    columns[key] = (np.concatenate([array, np.full(n, filler, dtype=array.dtype)]),
+                                    np.concatenate([missing, np.ones(n, dtype=bool)]), kind)
+        self.changed = True
+        return np.array(rows, dtype=int)
+
+    def _columns(self, section, rows):
+        '''
+        Pull out the values of every key in a section, for some rows.
+        '''
+        return {k: _decode(array[rows], missing[rows], kind)
+                for k, (array, missing, kind) in self.sections.get(section, {}).items()}
+
+    def retrieve(self, section, filenames, scanner):
+        '''
+        Retrieve the values for some files, rescanning only those
+        that are new (or have changed) since the index was made.
+
+        Parameters
+        ----------
+        section : str
+            Which kind of information is this (e.g. 'headers')?
+
+        filenames : list
+            The files whose values should be retrieved.
+
+        scanner : function
+            A function that takes a list of filenames, and
+            returns a list of dictionaries (one per file).
+
+        Returns
+        -------
+        columns : dict
+            For each key, an array of values across the files
+            (with None wherever a file didn't have that key).
+        '''
+
+        paths, sizes, mtimes, rows, current = self._stat(filenames)
+
+        # a file is up to date only if it's unchanged and has been scanned for this section
+        ok = current.copy()
+        if section in self.scanned:
+            ok[current] = self.scanned[section][rows[current]]
+        else:
+            ok[:] = False
+        stale = np.nonzero(~ok)[0]
+
+        if len(stale) == 0:
+            # everything is up to date, so just pull the columns
+            self.speak('all {} files are up to date in {}'.format(len(paths), self))
+            return self._columns(section, rows)
+
+        # rescan whatever is new or has changed
+        self.speak('scanning {} new or changed files (of {}) for {}'.format(len(stale), len(paths), self))
+        new = scanner([filenames[i] for i in stale])
+        rows = self._update_rows(paths, sizes, mtimes)
+        nrows = len(self.paths)
+        columns = self.sections.setdefault(section, {})
+        self.scanned.setdefault(section, np.zeros(nrows, dtype=bool))
+
+        # write the rescanned values into every column (including any new keys),
+        # leaving the rows that didn't change alone
+        keys = list(columns.keys())
+        for d in new:
+            keys.extend([k for k in d.keys() if k not in columns and k not in keys])
+        targets = rows[stale]
+        for k in keys:
+            fragment, fragmentmissing, fragmentkind = _encode([d.get(k, None) for d in new])
+            if k not in columns:
+                filler = 0.0 if fragmentkind == 'time' else kinds[fragmentkind]()
+                columns[k] = (np.full(nrows, filler, dtype=fragment.dtype), np.ones(nrows, dtype=bool), fragmentkind)
+            array, missing, kind = columns[k]
+
+            # (only if the new values need a different kind of column
+            #  does the whole column get converted)
+            found = set()
+            if not missing.all():
+                found.add(kind)
+            if not fragmentmissing.all():
+                found.add(fragmentkind)
+            combined = _simplest_kind(found) if len(found) > 0 else kind
+            if combined != kind:
+                if (combined == 'float') and (kind == 'int'):
+                    array = array.astype(np.float64)
+                elif missing.all():
+                    array = np.full(nrows, fragment.dtype.type(), dtype=fragment.dtype)
+                else:
+                    values = _decode(array, missing, kind).astype(object)
+                    values[targets] = _decode(fragment, fragmentmissing, fragmentkind)
+                    columns[k] = _encode(list(values))
+                    continue
+            elif kind == 'str':
+                # (make sure longer strings fit)
+                array = array.astype(np.result_type(array, fragment), copy=False)
+            array[targets] = fragment.astype(array.dtype)
+            missing[targets] = fragmentmissing
+            columns[k] = (array, missing, combined)
+        self.scanned[section][rows[stale]] = True
+
+        return self._columns(section, rows)
+
+    def retrieve_time(self, filenames, timesettings):
+        '''
+        Retrieve the (previously resolved) time axis for some files.
+
+        Parameters
+        ----------
+        filenames : list
+            The files whose times are needed.
+
+        timesettings : str
+            A description of how the time axis was defined.
+
+        Returns
+        -------
+        gps : array, None
+            The GPS time for each file, or None if any
+            file is missing a time (or the settings differ).
+
+        resolved : str
+            A description of the resolved time axis (e.g. its scale + format).
+        '''
+        paths, sizes, mtimes, rows, current = self._stat(filenames)
+        if (timesettings != self.timesettings) or (not current.all()):
+            return None, None
+        if not self.hasgps[rows].all():
+            return None, None
+        return self.gps[rows], self.timeresolved
+
+    def store_time(self, filenames, gps, timesettings, resolved=''):
+        '''
+        Remember the resolved time axis for some files.
+
+        Parameters
+        ----------
+        filenames : list
+            The files whose times were resolved.
+
+        gps : array
+            The GPS time for each file.
+
+        timesettings : str
+            A description of how the time axis was defined.
+
+        resolved : str
+            A description of the resolved time axis (e.g. its scale + format).
+        '''
+        paths, sizes, mtimes, rows, current = self._stat(filenames)
+        if (timesettings != self.timesettings) or (resolved != self.timeresolved):
+            self.hasgps[:] = False
+            self.timesettings = timesettings
+            self.timeresolved = resolved
+        rows = self._update_rows(paths, sizes, mtimes)
+        self.gps[rows] = gps
+        self.hasgps[rows] = True
+        self.changed = True
+
+    def shapes(self, filenames, section='headers'):
+        '''
+        Look up image shapes and dtypes (as derived from the indexed headers).
+
+        Parameters
+        ----------
+        filenames : list
+            The files whose image shapes are needed.
+
+        section : str
+            The section holding the headers of the image extension.
+
+        Returns
+        -------
+        shapes : list
+            A ((nrows, ncols), dtype) tuple for each file
+            (or None, if it can't be figured out).
+        '''
+        paths, sizes, mtimes, rows, current = self._stat(filenames)
+        columns = self._columns(section, np.maximum(rows, 0))
+        shapes = []
+        for i in range(len(paths)):
+            h = {k: columns[k][i] for k in ['NAXIS1', 'NAXIS2', 'BITPIX', 'BZERO', 'BSCALE']
+                 if (k in columns) and (columns[k][i] is not None)}
+            if current[i] and ('NAXIS1' in h) and ('NAXIS2' in h):
+                shapes.append(((int(h['NAXIS2']), int(h['NAXIS1'])), _dtype_from_header(h)))
+            else:
+                shapes.append(None)
+        return shapes
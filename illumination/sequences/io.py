@@ -2,19 +2,45 @@ from ..imports import *
 import skimage.io
 from astropy.io import fits
 
-def read_fits(path, ext_image=1):
+def read_fits(path, ext_image=1, memmap=False, section=None):
     '''
     Read an image from a FITS file.
+
+    Parameters
+    ----------
+    path : str
+        The filename of the image to read.
+
+    ext_image : int
+        The extension that is the image.
+
+    memmap : bool
+        Should the file be memory-mapped? (If so, the image
+        is a view into the file, rather than a copy in memory.)
+
+    section : tuple, None
+        A (rows, cols) region to read, each a slice or (start, stop).
+        Only the part of the file covering this region is read.
+        (None reads the whole image.)
+
+    Returns
+    -------
+    image : array
+        The image data.
     '''
 
     # open the fits file
-    hdu_list = fits.open(path)
+    hdu_list = fits.open(path, memmap=memmap)
 
     # make sure we're asking for a reasonable image extension
     ext_image = np.minimum(ext_image, len(hdu_list)-1)
 
     # extract the image data from the FITs file
-    image = hdu_list[ext_image].data
+    if section is None:
+        image = hdu_list[ext_image].data
+    else:
+        rows, cols = [s if isinstance(s, slice) else slice(*s) for s in section]
+        image = hdu_list[ext_image].section[rows, cols]
 
     print('read a {} grayscale image from {}'.format(image.shape, path))
 
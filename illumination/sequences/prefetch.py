@@ -0,0 +1,212 @@
+'''
+Define a prefetcher, which decodes the images a sequence
+is about to need (in background threads or processes),
+so they're waiting in the sequence's cache by the time
+they are actually requested.
+'''
+
+import bisect
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, InvalidStateError
+from ..imports import *
+
+__all__ = ['Prefetcher']
+
+class Prefetcher(Talker):
+    '''
+    Read upcoming timesteps of a sequence ahead of time,
+    following a known schedule of accesses.
+
+    The sequence must define `_prefetchable`, `_cachekey(timestep)`,
+    `_prefetch_task(timestep)` (which returns a picklable function
+    and its arguments), and an `_images` cache, as a FITS_Sequence
+    does. For any other sequence, the prefetcher quietly does nothing.
+    '''
+
+    def __init__(self, sequence, schedule, lookahead=8, nworkers=2, processes=False):
+        '''
+        Initialize a prefetcher for one sequence.
+
+        Parameters
+        ----------
+
+        sequence : Sequence
+            The sequence whose images should be read ahead of time.
+
+        schedule : array of ints
+            The timesteps that will be requested, in the order
+            they will be requested (for example, one per frame
+            of an animation). Repeats are allowed.
+
+        lookahead : int
+            How many positions in the schedule should we read ahead?
+            (This gets reduced if the sequence's cache is too small.)
+
+        nworkers : int
+            How many threads (or processes) should do the reading?
+
+        processes : bool
+            Should the reading happen in separate processes (True)
+            or in threads (False)? Processes sidestep the GIL,
+            but the decoded images must be copied back to us.
+        '''
+
+        Talker.__init__(self, prefixformat='{:>32}')
+
+        self.sequence = sequence
+        self.schedule = np.asarray(schedule)
+        self.nworkers = nworkers
+        self.processes = processes
+        self.lookahead = lookahead
+        self.active = getattr(sequence, '_prefetchable', False) and (len(self.schedule) > 0)
+
+        # where are we in the schedule?
+        self.position = 0
+        self._submitted = {}
+        self._executor = None
+
+        if self.active:
+            # record every position at which each image will be needed
+            self._keys = [sequence._cachekey(t) for t in self.schedule]
+            self._uses = {}
+            for i, k in enumerate(self._keys):
+                self._uses.setdefault(k, []).append(i)
+
+            # don't read farther ahead than the cache can hold
+            cache = sequence._images
+            if cache.maxbytes is not None:
+                nbytes = np.maximum(sequence[self.schedule[0]].nbytes, 1)
+                lookahead = int(np.minimum(lookahead, cache.maxbytes//nbytes - 1))
+            self.lookahead = int(np.maximum(lookahead, 0))
+
+    def __repr__(self):
+        return '<prefetcher for {} | {}/{}>'.format(self.sequence, self.position, len(self.schedule))
+
+    def _nextuse(self, key):
+        '''
+        How far in the future will this key next be needed?
+        (Keys that are never needed again are infinitely far away.)
+        '''
+        try:
+            uses = self._uses[key]
+        except KeyError:
+            return np.inf
+        i = bisect.bisect_left(uses, self.position)
+        if i == len(uses):
+            return np.inf
+        return uses[i] - self.position
+
+    def start(self):
+        '''
+        Start reading the beginning of the schedule.
+        '''
+        if self.active:
+            pool = [ThreadPoolExecutor, ProcessPoolExecutor][self.processes]
+            self._executor = pool(max_workers=self.nworkers)
+            self.sequence._images.nextuse = self._nextuse
+            self.speak('prefetching {} timesteps, {} ahead, for {}'.format(
+                        len(self.schedule), self.lookahead, self.sequence))
+            self.advance(0)
+        return self
+
+    def stop(self):
+        '''
+        Stop reading ahead (and let the cache go back to LRU eviction).
+        '''
+        if self._executor is not None:
+            for future in self._submitted.values():
+                future.cancel()
+                if hasattr(future, 'decoding'):
+                    future.decoding.cancel()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            for key in self._submitted:
+                self.sequence._images.pending.pop(key, None)
+            self._submitted = {}
+            self.sequence._images.nextuse = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _store(self, key, image):
+        '''
+        Put a freshly decoded image into the sequence's cache.
+        '''
+        if image is not None:
+            image.flags.writeable = False
+            self.sequence._images.put(key, image)
+
+    def _fetch(self, key, function, args):
+        '''
+        Decode one image (in a background thread), and cache it.
+        '''
+        image = function(*args)
+        self._store(key, image)
+        return image
+
+    def _submit(self, key, function, args):
+        '''
+        Start decoding one image, returning a future that finishes
+        only once the image has been stored in the cache.
+        '''
+        if not self.processes:
+            return self._executor.submit(self._fetch, key, function, args)
+
+        # decoded images come back from the other process, to be stored here
+        stored = Future()
+        def finish(future):
+            try:
+                image = future.result()
+                self._store(key, image)
+            except BaseException as e:
+                image, error = None, e
+            else:
+                error = None
+            try:
+                if error is None:
+                    stored.set_result(image)
+                else:
+                    stored.set_exception(error)
+            except InvalidStateError:
+                # (the prefetcher was stopped, and this was cancelled)
+                pass
+        stored.decoding = self._executor.submit(function, *args)
+        stored.decoding.add_done_callback(finish)
+        return stored
+
+    def advance(self, position):
+        '''
+        Tell the prefetcher the renderer has reached a given
+        position in the schedule, so it can read further ahead.
+
+        Parameters
+        ----------
+
+        position : int
+            The index (within the schedule) that's about to be displayed.
+        '''
+        if self._executor is None:
+            return
+
+        self.position = position
+        cache = self.sequence._images
+
+        # forget about the reads that have finished
+        for key in list(self._submitted.keys()):
+            if self._submitted[key].done():
+                self._submitted.pop(key)
+                cache.pending.pop(key, None)
+
+        # queue up the next few timesteps
+        upcoming = range(position, np.minimum(position + self.lookahead + 1, len(self.schedule)))
+        for i in upcoming:
+            key = self._keys[i]
+            if (key in cache) or (key in self._submitted):
+                continue
+            function, args = self.sequence._prefetch_task(self.schedule[i])
+            self._submitted[key] = self._submit(key, function, args)
+
+            # (so a request for this image waits for it, instead of decoding it again)
+            cache.pending[key] = self._submitted[key]
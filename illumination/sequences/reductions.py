@@ -0,0 +1,313 @@
+'''
+Tools to reduce a whole sequence of images down to summary
+images (like a median), without ever holding every image
+in memory at once.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from ..imports import *
+
+__all__ = ['tiled_percentiles', 'RunningStatistics', 'streaming_statistics']
+
+def _rows_per_band(shape, maxmemory, nworkers, itemsize=8):
+    '''
+    How many rows fit in each band, so that all the bands
+    in flight (with room for numpy's working copies)
+    stay within the memory budget?
+    '''
+    N, ny, nx = shape
+    bytesperrow = N*nx*itemsize
+    nrows = maxmemory//(2*(nworkers + 1)*bytesperrow)
+    return int(np.clip(nrows, 1, ny))
+
+def _gather_band(sequence, rows):
+    '''
+    Gather one band of rows from every image in a sequence,
+    as a (ntimes x nrows x ncols) cube.
+    '''
+    N, ny, nx = sequence.shape
+    band = np.empty((N, rows.stop - rows.start, nx), dtype=sequence.dtype)
+    for i in range(N):
+        band[i, :, :] = sequence.read_region(i, rows, None, cache=False)
+    return band
+
+def _percentiles_of_band(band, q):
+    '''
+    Calculate percentiles through time, for one band of rows.
+
+    Every pixel's time series is sorted at once (NaNs sort to the
+    end), and then interpolated exactly as np.nanpercentile does
+    (or averaged, as np.nanmedian does, for the median). Unlike
+    those, this never loops over pixels in python, so it releases
+    the GIL and bands can really be reduced in parallel threads.
+    '''
+    N = band.shape[0]
+    ordered = np.sort(band, axis=0)
+    if ordered.dtype.kind == 'f':
+        n = N - np.count_nonzero(np.isnan(ordered), axis=0)
+    else:
+        n = np.full(band.shape[1:], N)
+        ordered = ordered.astype(np.float64)
+
+    def take(indices):
+        indices = np.clip(indices, 0, N - 1).astype(np.intp)
+        return np.take_along_axis(ordered, indices[np.newaxis], axis=0)[0]
+
+    results = []
+    for p in q:
+        if p == 50:
+            low, high = take((n - 1)//2), take(n//2)
+            results.append(np.where(n % 2 == 1, low, (low + high)/2))
+        else:
+            virtual = (n - 1)*np.true_divide(p, 100.0)
+            previous = np.floor(virtual)
+            above = virtual >= n - 1
+            previous[above] = n[above] - 1
+            gamma = virtual - previous
+            a, b = take(previous), take(np.where(above, previous, previous + 1))
+            diff = np.subtract(b, a)
+            result = np.add(a, diff*gamma)
+            np.subtract(b, diff*(1 - gamma), out=result, where=gamma >= 0.5)
+            results.append(result)
+    return np.array(results)
+
+def tiled_percentiles(sequence, q=50, maxmemory=1e9, nworkers=None):
+    '''
+    Calculate percentile images for a sequence, one band of
+    rows at a time, without loading the whole cube into memory.
+
+    Each band is gathered by streaming through all the images
+    (reading only the rows in that band, if the sequence can),
+    and handed off to a thread to be reduced while the next
+    band is read. The results match np.nanpercentile (and
+    np.nanmedian) on the full cube exactly, because every
+    pixel's time series is always reduced all at once.
+
+    Parameters
+    ----------
+    sequence : Image_Sequence
+        The sequence of images to reduce.
+
+    q : float, array
+        The percentile(s) to calculate, between 0 and 100.
+
+    maxmemory : float
+        Roughly how many bytes can be used for the bands?
+
+    nworkers : int, None
+        How many bands can be reduced at once? (None uses every CPU.)
+
+    Returns
+    -------
+    image : array
+        The percentile image, with shape (nrows x ncols),
+        or (len(q) x nrows x ncols) if q is an array.
+    '''
+
+    percentiles = np.atleast_1d(q).astype(np.float64)
+    nworkers = nworkers or os.cpu_count() or 1
+
+    # decide how to divide the image into bands of rows
+    N, ny, nx = sequence.shape
+    dtype = sequence.dtype
+    nrows = _rows_per_band((N, ny, nx), maxmemory, nworkers, dtype.itemsize)
+    bands = [slice(r, np.minimum(r + nrows, ny)) for r in range(0, ny, nrows)]
+    sequence.speak('calculating {} percentiles in {} bands of {} rows'.format(
+                    list(percentiles), len(bands), nrows))
+
+    result = np.empty((len(percentiles), ny, nx), dtype=working_dtype(dtype))
+    with ThreadPoolExecutor(max_workers=nworkers) as executor:
+        pending = []
+        for i, rows in enumerate(bands):
+            sequence.speak(' gathering band {}/{}'.format(i+1, len(bands)), progress=True)
+            band = _gather_band(sequence, rows)
+            pending.append((rows, executor.submit(_percentiles_of_band, band, percentiles)))
+
+            # don't let too many bands pile up in memory
+            while len(pending) > nworkers:
+                done, future = pending.pop(0)
+                result[:, done, :] = future.result()
+
+        for done, future in pending:
+            result[:, done, :] = future.result()
+
+    if np.ndim(q) == 0:
+        return result[0]
+    return result
+
+class RunningStatistics(Talker):
+    '''
+    Accumulate summary images (mean, variance, min, max, sum,
+    and the number of finite values) for a stream of images,
+    one image at a time, ignoring any non-finite pixels.
+
+    The mean and variance are updated with Welford's method,
+    and two accumulators can be merged (with Chan et al.'s
+    pairwise update), so chunks of a sequence can be
+    accumulated separately and combined afterward.
+    '''
+
+    def __init__(self, shape):
+        '''
+        Initialize an empty accumulator.
+
+        Parameters
+        ----------
+        shape : tuple
+            The (nrows x ncols) shape of the images.
+        '''
+        Talker.__init__(self, prefixformat='{:>32}')
+        self.count = np.zeros(shape, dtype=np.int64)
+        self._mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+        self._min = np.full(shape, np.inf)
+        self._max = np.full(shape, -np.inf)
+        self.sum = np.zeros(shape)
+
+    def __repr__(self):
+        return '<running statistics of {} images>'.format(np.max(self.count))
+
+    def update(self, image):
+        '''
+        Include one more image.
+
+        Parameters
+        ----------
+        image : 2D array
+            The image to include.
+        '''
+        x = np.asarray(image, dtype=np.float64)
+        ok = np.isfinite(x)
+        x = np.where(ok, x, 0.0)
+
+        self.count += ok
+        delta = np.where(ok, x - self._mean, 0.0)
+        self._mean += delta/np.maximum(self.count, 1)
+        self._m2 += delta*np.where(ok, x - self._mean, 0.0)
+        self.sum += x
+        self._min = np.where(ok, np.minimum(self._min, x), self._min)
+        self._max = np.where(ok, np.maximum(self._max, x), self._max)
+
+    def merge(self, other):
+        '''
+        Fold another accumulator into this one.
+
+        Parameters
+        ----------
+        other : RunningStatistics
+            Statistics accumulated from other images.
+        '''
+        n = self.count + other.count
+        delta = other._mean - self._mean
+        fraction = other.count/np.maximum(n, 1)
+        self._mean = self._mean + delta*fraction
+        self._m2 = self._m2 + other._m2 + delta**2*self.count*fraction
+        self.count = n
+        self.sum = self.sum + other.sum
+        self._min = np.minimum(self._min, other._min)
+        self._max = np.maximum(self._max, other._max)
+        return self
+
+    def _finite_only(self, image):
+        '''
+        Blank out pixels that never had a finite value.
+        '''
+        return np.where(self.count > 0, image, np.nan)
+
+    @property
+    def mean(self):
+        return self._finite_only(self._mean)
+
+    @property
+    def variance(self):
+        return self._finite_only(self._m2/np.maximum(self.count, 1))
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def min(self):
+        return self._finite_only(self._min)
+
+    @property
+    def max(self):
+        return self._finite_only(self._max)
+
+    def images(self):
+        '''
+        Returns
+        -------
+        images : dict
+            The mean, variance, std, min, max, sum, and count images.
+        '''
+        return dict(mean=self.mean, variance=self.variance, std=self.std,
+                    min=self.min, max=self.max, sum=self.sum.copy(), count=self.count.copy())
+
+def _read_independently(sequence, timestep):
+    '''
+    Read one image, in a way that's safe to do from many threads at once.
+
+    (Sequences that read from files, like FITS_Sequence, describe
+    how to decode an image without touching any shared open files;
+    they're used just as the Prefetcher uses them.)
+    '''
+    if getattr(sequence, '_prefetchable', False):
+        key = sequence._cachekey(timestep)
+        if key in sequence._images:
+            return sequence._images.get(key)
+        function, args = sequence._prefetch_task(timestep)
+        return function(*args)
+    return sequence[timestep]
+
+def _accumulate_chunk(sequence, timesteps, shape):
+    '''
+    Accumulate statistics for a chunk of timesteps.
+    '''
+    running = RunningStatistics(shape)
+    for i in timesteps:
+        running.update(_read_independently(sequence, i))
+    return running
+
+def streaming_statistics(sequence, nworkers=None, chunksize=None):
+    '''
+    Calculate summary images for a sequence in one pass
+    through its images, by accumulating chunks of timesteps
+    in parallel and then merging them together.
+
+    Parameters
+    ----------
+    sequence : Image_Sequence
+        The sequence of images to summarize.
+
+    nworkers : int, None
+        How many chunks can be accumulated at once? (None uses every CPU.)
+
+    chunksize : int, None
+        How many timesteps go into each chunk?
+        (None divides the sequence evenly among the workers.)
+
+    Returns
+    -------
+    running : RunningStatistics
+        The accumulated statistics (which can be merged with more later).
+    '''
+
+    nworkers = nworkers or os.cpu_count() or 1
+    N, ny, nx = sequence.shape
+    if chunksize is None:
+        chunksize = int(np.ceil(N/nworkers))
+    chunks = [range(start, np.minimum(start + chunksize, N)) for start in range(0, N, np.maximum(chunksize, 1))]
+    sequence.speak('accumulating statistics over {} images in {} chunks'.format(N, len(chunks)))
+
+    if (nworkers == 1) or (len(chunks) <= 1):
+        partials = [_accumulate_chunk(sequence, c, (ny, nx)) for c in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=nworkers) as executor:
+            partials = list(executor.map(_accumulate_chunk, [sequence]*len(chunks), chunks, [(ny, nx)]*len(chunks)))
+
+    # merge the chunks together, in order
+    running = partials[0]
+    for other in partials[1:]:
+        running.merge(other)
+    return running
@@ -0,0 +1,216 @@
+'''
+Tools to find lots of image files (in nested directories)
+quickly, and to sort them into groups by camera and CCD.
+'''
+
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from ..imports import *
+from .filenameparsers import flexible_filenameparser, parse_filenames
+
+__all__ = ['find_files', 'group_filenames']
+
+def _has_magic(component):
+    '''
+    Does this piece of a path contain any glob wildcards?
+    '''
+    return any(c in component for c in '*?[')
+
+def _list_directory(directory):
+    '''
+    List the files and subdirectories in one directory,
+    with a single scandir call.
+    '''
+    files, directories = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    isdirectory = entry.is_dir()
+                except OSError:
+                    continue
+                (directories if isdirectory else files).append(entry.name)
+    except (IOError, OSError):
+        pass
+    return files, directories
+
+def _matches(name, component):
+    '''
+    Does a file or directory name match one piece of a glob pattern?
+    (Like glob, hidden names only match patterns that start with '.')
+    '''
+    if name.startswith('.') and not component.startswith('.'):
+        return False
+    return fnmatch.fnmatchcase(name, component)
+
+def _scan_directory(directory, active, components):
+    '''
+    Scan one directory, for a set of positions in the pattern.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to scan.
+
+    active : set
+        Which components of the pattern could match entries in
+        this directory. ('**' matches any number of directories.)
+
+    components : list
+        The pieces of the pattern (after the starting directory).
+
+    Returns
+    -------
+    found : list
+        The files in this directory that match the pattern.
+
+    deeper : dict
+        The subdirectories to scan next, and the positions
+        in the pattern that could match inside them.
+    '''
+
+    # '**' can match no directories at all
+    active = set(active)
+    for i in sorted(active):
+        j = i
+        while (j < len(components)) and (components[j] == '**'):
+            j += 1
+            active.add(j)
+
+    files, directories = _list_directory(directory)
+    found, deeper = [], {}
+    for i in active:
+        if i >= len(components):
+            continue
+        component = components[i]
+        last = i == len(components) - 1
+        if component == '**':
+            # match any (non-hidden) subdirectory, and stay at this position
+            for d in directories:
+                if not d.startswith('.'):
+                    deeper.setdefault(d, set()).add(i)
+            if last:
+                found.extend([f for f in files if not f.startswith('.')])
+        elif last:
+            found.extend([f for f in files if _matches(f, component)])
+        else:
+            for d in directories:
+                if _matches(d, component):
+                    deeper.setdefault(d, set()).add(i + 1)
+
+    found = [os.path.join(directory, f) for f in sorted(set(found))]
+    deeper = {os.path.join(directory, d): v for d, v in deeper.items()}
+    return found, deeper
+
+def find_files(pattern, nworkers=None):
+    '''
+    Find the files that match a glob-style pattern,
+    scanning many directories in parallel.
+
+    This understands the same wildcards as glob ('*', '?', '[...]'),
+    in any part of the path, plus '**' to match any number of nested
+    directories (as in 'sector1/**/*.fits'). Each directory is listed
+    only once, with os.scandir, and directories are scanned by a pool
+    of threads (which helps most on network filesystems).
+
+    Parameters
+    ----------
+    pattern : str
+        The search pattern.
+
+    nworkers : int, None
+        How many directories can be scanned at once?
+        (None lets concurrent.futures choose a default.)
+
+    Returns
+    -------
+    filenames : array
+        The matching filenames, sorted.
+    '''
+
+    # split into the starting directory, and the pieces with wildcards
+    pieces = os.path.normpath(pattern).split(os.sep)
+    first = 0
+    while (first < len(pieces)) and not _has_magic(pieces[first]):
+        first += 1
+    if first == len(pieces):
+        # there are no wildcards, so it's either a file or not
+        return np.array([pattern] if os.path.isfile(pattern) else [], dtype=str)
+    start = os.sep.join(pieces[:first]) or ('.' if not pattern.startswith(os.sep) else os.sep)
+    components = pieces[first:]
+
+    # scan directories breadth-first, with one task per directory
+    filenames = []
+    with ThreadPoolExecutor(max_workers=nworkers) as executor:
+        pending = [executor.submit(_scan_directory, start, {0}, components)]
+        while len(pending) > 0:
+            found, deeper = pending.pop(0).result()
+            filenames.extend(found)
+            for directory, active in deeper.items():
+                pending.append(executor.submit(_scan_directory, directory, active, components))
+
+    # (relative patterns give relative paths, as glob does)
+    if not pattern.startswith('.' + os.sep) and (start == '.'):
+        filenames = [os.path.relpath(f) for f in filenames]
+    return np.sort(np.array(filenames, dtype=str))
+
+def group_filenames(filenames, filenameparser=flexible_filenameparser,
+                    keys=['camera', 'ccd'], sortkey=None):
+    '''
+    Sort many files into groups (by camera and CCD, for example),
+    by parsing all their filenames at once.
+
+    Parameters
+    ----------
+    filenames : list
+        The filenames to organize.
+
+    filenameparser : function
+        The parser that pulls details out of each filename
+        (see `parse_filenames`).
+
+    keys : list
+        Which details should define the groups? Add more keys
+        (like 'type') to split the groups further. Files missing
+        a key are grouped under '?'.
+
+    sortkey : str, None
+        Which detail should the files in each group be sorted by
+        (like 'cadence' or 'jd')? If it's missing for any file
+        in a group, that group is sorted by filename.
+
+    Returns
+    -------
+    groups : dict
+        For each group, keyed by a tuple of the values of `keys`
+        (as strings), a sorted array of filenames.
+    '''
+
+    filenames = np.asarray(filenames, dtype=str)
+    if len(filenames) == 0:
+        return {}
+    parsed = parse_filenames(list(filenames), filenameparser)
+
+    # label every file with its group
+    labels = np.array([[str(d.get(k, '?')) for k in keys] for d in parsed], dtype=str).reshape(len(parsed), len(keys))
+    unique, inverse = np.unique(labels, axis=0, return_inverse=True)
+    inverse = np.ravel(inverse)
+
+    # sort by group, then by the sort key (or the filename)
+    values = np.full(len(parsed), np.nan)
+    if sortkey is not None:
+        for i, d in enumerate(parsed):
+            try:
+                values[i] = float(d[sortkey])
+            except (KeyError, TypeError, ValueError):
+                pass
+    order = np.lexsort((filenames, values, inverse))
+
+    # split into one sorted array per group
+    boundaries = np.searchsorted(inverse[order], np.arange(1, len(unique)))
+    groups = {}
+    for label, indices in zip(unique, np.split(order, boundaries)):
+        if np.isnan(values[indices]).any():
+            indices = indices[np.argsort(filenames[indices], kind='stable')]
+        groups[tuple(label)] = filenames[indices]
+    return groups
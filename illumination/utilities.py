@@ -33,6 +33,55 @@ def get_writer(filename, fps=30, **kw):
     return writer
 
 
+def join_animations(filenames, filename, fps=30):
+    '''
+    Join several animations (rendered with the same settings)
+    end to end into one, without re-encoding them.
+
+    MP4 segments are joined by ffmpeg's concat demuxer
+    (copying the encoded streams as they are); anything
+    else (like GIFs) is joined frame by frame with Pillow.
+
+    Parameters
+    ----------
+
+    filenames : list
+        The segments to join, in order.
+
+    filename : str
+        The output filename for the joined animation.
+
+    fps : float
+        Frames/second (for GIFs).
+    '''
+    if '.mp4' not in filename:
+        from PIL import Image, ImageSequence
+
+        def frames():
+            for f in filenames:
+                with Image.open(f) as image:
+                    for frame in ImageSequence.Iterator(image):
+                        yield frame.copy()
+
+        # (like matplotlib's pillow writer, for anything but .mp4)
+        allframes = frames()
+        first = next(allframes)
+        first.save(filename, save_all=True, append_images=allframes,
+                   duration=int(np.round(1000.0/fps)), loop=0)
+    else:
+        listfilename = filename + '-segments.txt'
+        with open(listfilename, 'w') as f:
+            for segment in filenames:
+                f.write("file '{}'\n".format(os.path.abspath(segment).replace("'", "'\\''")))
+        try:
+            subprocess.check_call([plt.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                                   '-f', 'concat', '-safe', '0', '-i', listfilename,
+                                   '-c', 'copy', filename])
+        finally:
+            os.remove(listfilename)
+    return filename
+
+
 def guess_time_format(t, default='jd'):
     '''
     For a given array of times,
@@ -29,7 +29,7 @@ def camera_from_filename(f):
 def organize_sequences(pattern='*.fits',
                        filenameparser=flexible_filenameparser,
                        ext_image=1, use_headers=False, use_filenames=True,
-                       timekey='cadence'):
+                       timekey='cadence', index=False, nworkers=None):
     '''
     Take a group of filenames, and group them in
     one of the following ways:
@@ -43,7 +43,8 @@ def organize_sequences(pattern='*.fits',
     Parameters
     ----------
     pattern : str, list
-        If a string, a file-search pattern (e.g. with '*') for glob
+        If a string, a file-search pattern (e.g. with '*', or with
+        '**' to search nested directories; see `find_files`)
         If a list, a list of filenames.
 
     filenameparser : function
@@ -54,40 +55,31 @@ def organize_sequences(pattern='*.fits',
         It is used to decide how to group images.
 
      ext_image=0, use_headers=False, use_filenames=True,
+
+    index : bool, str
+        Should each sequence keep a sidecar index of its
+        headers/filenames/times, so reopening is faster?
+        (see FITS_Sequence)
+
+    nworkers : int, None
+        How many directories can be scanned at once?
+        (see `find_files`)
     '''
     # create a list of filenames
     if type(pattern) == list:
         # if given a list, use those as the filenames
         filenames = pattern
     else:
-        # if given a string, use it as a glob search string
-        filenames = list(np.sort(glob.glob(pattern)))
+        # if given a string, use it as a search string (scanning directories in parallel)
+        filenames = find_files(pattern, nworkers=nworkers)
 
-    # create an empty dictionary of cameras + CCDs
-    cameras = {'cam{}'.format(c):{
-                    'ccd{}'.format(d):[] for d in [1,2,3,4,'?']}
-               for c in [1,2,3,4,'?']}
-
-    # loop through images, and figure out where they belong
-    for f in filenames:
-
-        # parse the filename into a dictionary
-        i = filenameparser(f)
-
-        # figure out an appropriate camera key
-        if 'camera' in i:
-            camerakey = 'cam{}'.format(i['camera'])
-        else:
-            camerakey = 'cam?'
-
-        # figure out an appropriate CCD key
-        if 'ccd' in i:
-            ccdkey = 'ccd{}'.format(i['ccd'])
-        else:
-            ccdkey = 'ccd?'
-
-        # store the filename into its appropriate key
-        cameras[camerakey][ccdkey].append(f)
+    # parse all the filenames at once, and group them by camera + CCD
+    # (each group comes out sorted, so the sequences don't need to re-sort)
+    groups = group_filenames(filenames, filenameparser=filenameparser,
+                             keys=['camera', 'ccd'], sortkey=timekey)
+    cameras = {}
+    for (camera, ccd), files in groups.items():
+        cameras.setdefault('cam{}'.format(camera), {})['ccd{}'.format(ccd)] = files
 
     # convert each list of filenames into a sequence
     sequences = {}
@@ -100,7 +92,8 @@ def organize_sequences(pattern='*.fits',
                                                    ext_image=ext_image,
                                                    use_headers=use_headers,
                                                    use_filenames=use_filenames,
-                                                   timekey=timekey)
+                                                   timekey=timekey,
+                                                   index=index)
 
 
     # if there aren't multiple CCDs, compress each camera to single list
@@ -119,6 +112,7 @@ def organize_sequences(pattern='*.fits',
 def illustratefits( pattern='*.fits',
                     zoomposition=None, zoomsize=(10,10),
                     filenameparser=flexible_filenameparser,
+                    index=False,
                     **illustrationkw):
     '''
     Make an Illustration from a group of FITS files.
@@ -144,12 +138,16 @@ def illustratefits( pattern='*.fits',
     zoomsize : tuple
         (x,y) size of the zoom window to create
 
+    index : bool, str
+        Should the sequences keep a sidecar index of their
+        headers/filenames/times, so reopening is faster?
+
     **illustrationkw : dict
         Keyword arguments will be passed to the Illustration
     '''
 
     # make a "group" of filenames (either a list, a dictionary, a dictionary of dictionares)
-    data = organize_sequences(pattern, filenameparser=filenameparser)
+    data = organize_sequences(pattern, filenameparser=filenameparser, index=index)
     assert(type(data) == dict)
 
     # is there only a single camera represented?
@@ -2,6 +2,7 @@ from illumination.imports import *
 from illumination.illustrations import *
 from illumination.cartoons import *
 from illumination.zoom import *
+import imageio
 
 
 directory = 'examples/'
@@ -77,6 +78,22 @@ def test_CameraIllustrationWithStamps():
     return illustration
 
 
+def test_parallel_animation(N=6):
+    print("\nTesting an animation rendered in parallel segments.")
+    illustration = CameraIllustration(data=np.random.lognormal(3, 1, (N, 100, 100)), sizeofcamera=2)
+    illustration.plot()
+    for extension in ['mp4', 'gif']:
+        serial = os.path.join(directory, 'serial-animation.{}'.format(extension))
+        parallel = os.path.join(directory, 'parallel-animation.{}'.format(extension))
+        illustration.animate(serial)
+        illustration.animate(parallel, nprocesses=3)
+
+        # the joined segments should have every frame
+        serialframes, parallelframes = [imageio.v2.mimread(f, memtest=False) for f in [serial, parallel]]
+        assert(len(serialframes) == len(parallelframes))
+    return illustration
+
+
 if __name__ == '__main__':
     test_CameraIllustrationWithStamps()
     test_StampsIllustration()
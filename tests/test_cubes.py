@@ -20,3 +20,25 @@ def test_cube(normalization='none', **kw):
                 color='red', zorder=100, marker='.', alpha=0.5)
     plt.savefig(os.path.join(directory, 'cube-example.pdf'))
     return unbinned, central, summed
+
+
+def test_cube_dtypes():
+    '''
+    Make sure cubes of integer counts don't get copied into float64.
+    '''
+    photons = np.random.poisson(1000, (40, 5, 5)).astype(np.uint16)
+    cube = Cube(photons, cadence=2)
+    assert(cube.median().dtype == np.float32)
+    assert(np.allclose(cube.mean(), photons.mean(axis=0)))
+    assert(cube.nsigma().dtype == np.float32)
+
+    # differences shouldn't wrap around
+    cube.consider('differences')
+    assert(np.array_equal(cube.todisplay, np.diff(photons.astype(float), axis=0)))
+
+    # stacks of counts are summed exactly
+    summed = Sum()(photons, 10)
+    assert(np.array_equal(summed, photons.reshape(4, 10, 5, 5).sum(axis=1)))
+    central = Central(10)(photons, 10)
+    assert(central.dtype == np.float64)
+    return cube
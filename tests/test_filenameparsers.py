@@ -10,5 +10,28 @@ def test_parsers():
         # test the filename parsers
         print(f, flexible_filenameparser(f))
 
+
+def test_parse_filenames():
+
+    filenames = ['tess2018206192942-s0001-1-{}-0120-s_ffic.fits'.format(i) for i in [1, 2, 3, 4]]
+    filenames += ['tess2018220104526-00004907-1-crm-ffi-ccd1.fits', 'cam1-ccd2-00001.fits']
+
+    # parsing in bulk should match parsing one at a time
+    for bulk, f in zip(parse_filenames(filenames), filenames):
+        single = flexible_filenameparser(f)
+        single.pop('astropytime', None)
+        assert(bulk == single)
+
+    # the parser that matches the first file is remembered
+    parser, pattern = choose_filenameparser(filenames[0])
+    assert(parser is mast_filenameparser)
+    assert(ydays_to_time(['2018206192942']).jd[0] == flexible_filenameparser(filenames[0])['jd'])
+
+    # a parser that can't handle a file (day 999 isn't a date) passes it on to the next one
+    impossible = 'tess2018999192942-s0001-1-1-0120-s_ffic.fits'
+    assert(choose_filenameparser(impossible)[0] is not mast_filenameparser)
+    assert('jd' not in flexible_filenameparser(impossible))
+    assert(parse_filenames(filenames[:1] + [impossible])[1] == flexible_filenameparser(impossible))
+
 if __name__ == '__main__':
     test_parsers()
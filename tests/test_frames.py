@@ -1,6 +1,7 @@
 from illumination.imports import *
 from illumination import *
 from illumination.cartoons import *
+from illumination.frames import ProcessingStage, register_stage, processingstages
 
 
 def test_timeseries():
@@ -9,3 +10,208 @@ def test_timeseries():
     f = EmptyTimeseriesFrame(ax=plt.gca())
     f.ax.plot(x, y)
     return f
+
+
+def test_pyramid():
+    images = np.random.normal(0, 1, (3, 1000, 1200))
+    illustration = CameraIllustration(data=images, sizeofcamera=2)
+    illustration.plot()
+    frame = illustration.frames['camera']
+
+    # the displayed image should be binned down, but cover the full image
+    displayed = frame.plotted['image'].get_array()
+    assert(displayed.shape[0] < 1000)
+    assert(list(frame.plotted['image'].get_extent()) == [0, 1200, 0, 1000])
+
+    # binning should average each block of pixels
+    level = frame._pyramid_level((1000, 1200))
+    factor = 2**level
+    block = images[0][:factor, :factor]
+    assert(np.isclose(displayed[0, 0], np.mean(block), atol=1e-5))
+
+    # updating should use (and cache) the same level
+    frame.update(frame._get_times()[1])
+    assert(frame.plotted['image'].get_array().shape == displayed.shape)
+    assert(frame._pyramid.get((1, (), level)) is not None)
+    return illustration
+
+
+def test_rawwindow():
+    images = np.random.normal(0, 1, (6, 20, 30))
+    illustration = imshowIllustration(data=images, processingsteps=['subtractbeforeandafter'])
+    frame = illustration.frames['image']
+
+    # count how many times each image gets read from the data
+    reads = []
+    original = frame.data.__class__.__getitem__
+    class Counting(frame.data.__class__):
+        def __getitem__(self, timestep):
+            reads.append(timestep)
+            return original(self, timestep)
+    frame.data.__class__ = Counting
+
+    # stepping through in order should read each image only once
+    for t in range(1, 5):
+        processed = frame.get_processed_image(t)
+        assert(np.allclose(processed, images[t] - 0.5*(images[t-1] + images[t+1])))
+    assert(sorted(reads) == list(range(0, 6)))
+
+    # the neighbors should wrap around the ends
+    assert(np.allclose(frame.get_processed_image(5), images[5] - 0.5*(images[4] + images[0])))
+    return illustration
+
+
+def test_cachebudgets():
+    images = np.random.normal(0, 1, (8, 20, 30)).astype(np.float32)
+    frames = [imshowFrame(data=images, name='image{}'.format(i),
+                          processingsteps=['subtractprevious']) for i in range(4)]
+    illustration = GenericIllustration(imshows=frames)
+
+    # the frames should split the illustration's budgets between them
+    frame = frames[0]
+    frame.currenttimestep = 0
+    frame.get_processed_image(1)
+    share = frame.processingcachesize/4
+    assert(np.isclose(frame._rawwindow.maxbytes + frame.processingsteps._cache.maxbytes, share))
+    frame._get_display_image(images[0], key=0)
+    assert(np.isclose(frame._pyramid.maxbytes, frame.pyramidcachesize/4))
+
+    # batches should be sized by the itemsize of the (float32) images
+    # (a quarter of this is the frame's share, and three quarters of that
+    # is the processed cache, with room for 2 batches of 3 images)
+    frame.processingcachesize = 32*images[0].nbytes
+    frame.processingsteps.clear()
+    frame.currenttimestep = 1
+    frame.get_processed_image(2)
+    assert([frame.processingsteps.is_cached(t) for t in range(2, 6)] == [True, True, True, False])
+    return illustration
+
+
+def test_processing():
+    images = np.random.normal(0, 1, (8, 20, 30))
+    images[4, 10, 10] = 1000.0
+    illustration = imshowIllustration(data=images)
+    frame = illustration.frames['image']
+    assert(len(frame.processingsteps) == 0)
+
+    # steps can be chained, and changed after the frame is made
+    frame.processingsteps = ['subtractmedian', 'maskcosmics']
+    median = np.median(images, axis=0)
+    processed = frame.get_processed_image(3)
+    assert(np.allclose(processed, images[3] - median))
+    assert(np.isnan(frame.get_processed_image(4)[10, 10]))
+
+    # processing a batch should match processing one at a time
+    batch = frame.processingsteps.get_batch(range(8))
+    assert(np.allclose(batch[3], processed))
+    assert(frame.processingsteps.is_cached(7))
+
+    # stages can be added by name, or as objects with settings
+    class Double(ProcessingStage):
+        name = 'double'
+        factor = 2
+        def process(self, inputs, references):
+            return inputs[0]*self.factor
+    register_stage(Double)
+    try:
+        frame.processingsteps = ['subtractprevious', 'double']
+        assert(np.allclose(frame.get_processed_image(0), 2*(images[0] - images[-1])))
+    finally:
+        # (don't leave the test's stage in the registry)
+        processingstages.pop('double')
+    frame.processingsteps = ['subtractprevious', Double(factor=3)]
+    assert(np.allclose(frame.get_processed_image(0), 3*(images[0] - images[-1])))
+    assert('double' not in processingstages)
+
+    # batch stages also process one image at a time, at the images' precision
+    stage = processingstages['subtractbackground'](boxsize=4)
+    flat = np.full((1, 5, 6), 1e9 + 0.5)
+    assert(stage.background(flat).dtype == np.float64)
+    assert(np.all(stage.process(flat, {}) == 0))
+
+    try:
+        frame.processingsteps = ['nonsense']
+        assert(False)
+    except ValueError:
+        pass
+    return illustration
+
+
+def test_sketch():
+    from illumination.colors import ValueSketch, cmap_norm_ticks
+
+    # small arrays are summarized exactly
+    small = np.random.normal(0, 1, (30, 30))
+    sketch = ValueSketch.from_array(small)
+    assert(np.allclose(sketch.percentile([1, 99]), np.percentile(small, [1, 99])))
+    assert(np.isclose(sketch.mad(), mad(small)))
+
+    # big ones (merged across images) should be close
+    images = [np.random.lognormal(3, 1, (500, 400)) for _ in range(4)]
+    images[1][::7, ::3] = np.nan
+    sketch = ValueSketch()
+    for image in images:
+        sketch.add(image)
+    everything = np.concatenate([i.ravel() for i in images])
+    everything = everything[np.isfinite(everything)]
+    for q in [1, 50, 99]:
+        estimate = sketch.percentile(q)
+        rank = np.mean(everything <= estimate)*100
+        assert(np.abs(rank - q) < 1)
+    assert(sketch.min == np.min(everything))
+    assert(len(sketch.values) <= sketch.size)
+
+    # a bright column can't take over the sample, even when the width is a multiple of the stride
+    striped = np.random.normal(0, 1, (512, 2048)).astype(np.float32)
+    striped[:, 0] = 1e6
+    estimate = ValueSketch.from_array(striped).percentile(50)
+    assert(np.abs(np.mean(striped <= estimate) - 0.5) < 0.03)
+
+    # the shared colorbar should come from a sketch of every frame
+    illustration = CameraIllustration(data=np.random.lognormal(3, 1, (5, 300, 300)), sizeofcamera=2)
+    illustration.plot()
+    cmap, norm, ticks = illustration._cmap_norm_ticks(remake=True, ntimes=3)
+    assert(norm.vmin > 0)
+    return illustration
+
+
+def test_rendercache():
+    directory = 'examples/rendercache'
+    shutil.rmtree(directory, ignore_errors=True)
+    images = np.random.lognormal(3, 1, (4, 50, 60))
+    illustration = imshowIllustration(data=images)
+    illustration.plot()
+    frame = illustration.frames['image']
+
+    # the first animation fills the render cache
+    illustration.animate('examples/rendercache-first.gif', rendercache=directory)
+    assert(frame._render.complete)
+
+    # the rendered colors should match what imshow would have shown
+    norm, cmap = frame.plotted['image'].norm, frame.plotted['image'].cmap
+    expected = cmap(norm(images[2]), bytes=True)
+    rendered = frame._get_rendered(2, frame._get_times()[2])
+    assert(np.abs(rendered.astype(int) - expected).max() <= 2)
+
+    # a second animation shouldn't need to read any images
+    again = imshowIllustration(data=images)
+    again.plot()
+    reads = []
+    original = again.frames['image'].data.__class__.__getitem__
+    class Counting(again.frames['image'].data.__class__):
+        def __getitem__(self, timestep):
+            reads.append(timestep)
+            return original(self, timestep)
+    again.frames['image'].data.__class__ = Counting
+    again.frames['image']._rawwindow.clear()
+    again.animate('examples/rendercache-second.gif', rendercache=directory)
+    assert(len(reads) <= 2)
+
+    # rewriting a file changes the key, so its old renders aren't reused
+    from illumination.frames.rendering import _files_signature
+    filename = 'examples/temporaryrendercache.npy'
+    np.save(filename, images)
+    before = _files_signature(make_image_sequence(filename))
+    os.utime(filename, (0, 0))
+    assert(_files_signature(make_image_sequence(filename)) != before)
+    return again
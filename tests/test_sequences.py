@@ -1,6 +1,10 @@
 from illumination.sequences import *
 from illumination.cartoons import *
 from illumination.imports import *
+from illumination.sequences.io import read_fits
+from illumination.sequences.caches import LRUCache
+from illumination.illustrations import CameraIllustration
+import imageio
 
 directory = 'examples/'
 mkdir(directory)
@@ -38,6 +42,610 @@ def test_FITS():
     return a, b, c, d, e
 
 
+def test_FITS_cache():
+    '''
+    Make sure the FITS_Sequence cache avoids rereading images.
+    '''
+    filenames = [os.path.join(directory, 'temporarycache{}.fits'.format(i)) for i in range(3)]
+    for f in filenames:
+        create_test_fits(rows=20, cols=30).writeto(f, overwrite=True)
+
+    # a cache big enough for two images should evict the third
+    a = FITS_Sequence(filenames, cachesize=2*20*30*8, verify=False)
+    before = a.cache_statistics()['images']
+    first = a[0]
+    assert(a[0] is first)
+    a[1], a[2]
+    stats = a.cache_statistics()['images']
+    assert(stats['hits'] - before['hits'] >= 1)
+    assert(stats['items'] == 2)
+    assert(stats['nbytes'] <= 2*20*30*8)
+
+    # a disabled cache should still give the same images
+    b = FITS_Sequence(filenames, cachesize=0, maxopenfiles=0)
+    assert(np.all(b[0] == first))
+    assert(b.cache_statistics()['images']['items'] == 0)
+
+    # without a file cache, only the latest file should stay open
+    b[1], b[2]
+    assert(b._lastopened is not None)
+    b.clear_cache()
+    assert(b._lastopened is None)
+
+    # a file displaced from the file cache should be closed
+    closed = []
+    c = LRUCache(maxitems=2, onevict=lambda k, v: closed.append(v))
+    c.put('f', 'first')
+    c.put('f', 'second')
+    assert(closed == ['first'])
+    assert(c.setdefault('f', 'third') == 'second')
+    return a, b
+
+
+def test_prefetch():
+    '''
+    Make sure prefetching follows a schedule and fills the cache.
+    '''
+    filenames = [os.path.join(directory, 'temporaryprefetch{}.fits'.format(i)) for i in range(5)]
+    for f in filenames:
+        create_test_fits(rows=20, cols=30).writeto(f, overwrite=True)
+    schedule = [0, 0, 1, 2, 3, 4, 4, 3]
+
+    for processes in [False, True]:
+        a = FITS_Sequence(filenames, cachesize=3*20*30*8)
+        a.clear_cache()
+        with Prefetcher(a, schedule, lookahead=2, processes=processes) as p:
+            for i, timestep in enumerate(schedule):
+                p.advance(i)
+                assert(np.all(a[timestep] == fits.getdata(a.filenames[timestep], 1)))
+        assert(a._images.nextuse is None)
+        assert(len(a._images) <= 3)
+
+        # images still being decoded should be waited for, not decoded again
+        b = FITS_Sequence(filenames, cachesize=3*20*30*8)
+        b.clear_cache()
+        with Prefetcher(b, [1, 2, 3], lookahead=2, processes=processes) as p:
+            opened = b.cache_statistics()['files']['misses']
+            for timestep in [1, 2, 3]:
+                assert(np.all(b[timestep] == fits.getdata(b.filenames[timestep], 1)))
+            assert(b.cache_statistics()['files']['misses'] == opened)
+        assert(len(b._images.pending) == 0)
+    return a
+
+
+def test_FITS_headers():
+    '''
+    Make sure headers get scanned (in parallel) into temporal + static.
+    '''
+    filenames = [os.path.join(directory, 'temporaryheaders{}.fits'.format(i)) for i in range(4)]
+    times = [3.0, 1.0, 2.0, 0.0]
+    for f, t in zip(filenames, times):
+        hdulist = create_test_fits(rows=20, cols=30)
+        hdulist[0].header['TIME'] = 2458000.0 + t
+        hdulist[0].header['OBSERVER'] = 'nobody'
+        hdulist.writeto(f, overwrite=True)
+
+    serial = FITS_Sequence(filenames, nworkers=1)
+    for kw in [dict(nworkers=4), dict(nworkers=2, processes=True)]:
+        parallel = FITS_Sequence(filenames, **kw)
+        assert(np.all(parallel.temporal['TIME'] == serial.temporal['TIME']))
+        assert(np.all(parallel.filenames == serial.filenames))
+    assert(np.all(np.diff(serial.temporal['TIME']) > 0))
+    assert(serial.static['OBSERVER'] == 'nobody')
+    assert(serial._timeisfake == False)
+
+    # headers and filenames can both contribute
+    named = [os.path.join(directory, 'cam1-ccd{}-0000{}.fits'.format(i + 1, i)) for i in range(4)]
+    for f, g in zip(filenames, named):
+        shutil.copyfile(f, g)
+    both = FITS_Sequence(named, use_headers=True, use_filenames=True)
+    assert(np.all(np.sort(both.temporal['TIME']) == serial.temporal['TIME']))
+    assert(len(both.temporal['ccd']) == 4)
+    assert(both.static['camera'] == '1')
+    return serial
+
+
+def test_FITS_index():
+    '''
+    Make sure a sidecar index remembers headers, and rescans only changed files.
+    '''
+    subdirectory = os.path.join(directory, 'temporaryindex')
+    mkdir(subdirectory)
+    filenames = [os.path.join(subdirectory, 'temporaryindex{}.fits'.format(i)) for i in range(4)]
+    for i, f in enumerate(filenames):
+        hdulist = create_test_fits(rows=20, cols=30)
+        hdulist[0].header['TIME'] = 2458000.0 + i
+        hdulist.writeto(f, overwrite=True)
+    for f in glob.glob(os.path.join(subdirectory, '.illumination-index-*')):
+        os.remove(f)
+
+    a = FITS_Sequence(filenames, index=True)
+    assert(len(glob.glob(os.path.join(subdirectory, '.illumination-index-*.npz'))) == 1)
+    b = FITS_Sequence(filenames, index=True)
+    assert(np.all(a.temporal['TIME'] == b.temporal['TIME']))
+    assert(np.all(a.time == b.time))
+    assert(b.shape == (4, 20, 30))
+
+    # change one file, and make sure only it gets rescanned
+    hdulist = create_test_fits(rows=20, cols=30)
+    hdulist[0].header['TIME'] = 2458010.0
+    hdulist.writeto(filenames[0], overwrite=True)
+    scanned = []
+    index = SidecarIndex.near(filenames, settings='extensions=0,1')
+    columns = index.retrieve('headers', filenames, lambda f: scanned.extend(f) or scan_headers(f))
+    assert(scanned == [filenames[0]])
+    assert(columns['TIME'][0] == 2458010.0)
+
+    c = FITS_Sequence(filenames, index=True)
+    assert(c.temporal['TIME'][-1] == 2458010.0)
+
+    # the image shape is looked up only once
+    assert(c.shape == (4, 20, 30))
+    c._index = None
+    c._get_hdulist = None
+    assert(c.shape == (4, 20, 30))
+
+    # many new rows should be added to the index all at once
+    index = SidecarIndex(os.path.join(directory, 'temporaryindex.npz'), settings='test')
+    paths = ['/nowhere/{}.fits'.format(i) for i in range(1000)]
+    rows = index._update_rows(paths + paths[:10], np.arange(1010), np.zeros(1010))
+    assert(np.all(rows == np.arange(1010) % 1000))
+    assert(len(index.sizes) == len(index.mtimes) == len(index.gps) == 1000)
+
+    # rescanned values are written into the existing columns, whatever their kinds
+    index = SidecarIndex(os.path.join(directory, 'temporaryindex.npz'), settings='kinds')
+    t = Time(2458000.0, format='jd', scale='utc')
+    others = [os.path.join(subdirectory, 'temporarykinds{}.txt'.format(i)) for i in range(3)]
+    for f in others:
+        with open(f, 'wb') as stream:
+            stream.write(b'x')
+    index.retrieve('test', others, lambda fs: [dict(A=1, S='ab', T=t) for f in fs])
+    with open(others[1], 'wb') as stream:
+        stream.write(b'xy')
+    columns = index.retrieve('test', others, lambda fs: [dict(A=2.5, S='a longer string', N=True)])
+    assert(list(columns['A']) == [1.0, 2.5, 1.0])
+    assert(list(columns['S']) == ['ab', 'a longer string', 'ab'])
+    assert(list(columns['N']) == [None, True, None])
+    assert((columns['T'][1] is None) and (columns['T'][2].jd == t.jd))
+    return c
+
+
+def test_FITS_regions():
+    '''
+    Make sure regions can be read (with or without memmap) without reading everything.
+    '''
+    filenames = [os.path.join(directory, 'temporaryregion{}.fits'.format(i)) for i in range(2)]
+    for f in filenames:
+        create_test_fits(rows=40, cols=50).writeto(f, overwrite=True)
+    full = fits.getdata(filenames[1], 1)
+
+    for memmap in [False, True]:
+        a = FITS_Sequence(filenames, memmap=memmap)
+        a.clear_cache()
+        region = a.read_region(1, (5, 15), slice(20, 30))
+        assert(np.all(region == full[5:15, 20:30]))
+        assert(np.all(a.read_region(1, None, (0, 3)) == full[:, 0:3]))
+        if memmap:
+            # memory-mapped regions are views into the file
+            assert(np.shares_memory(region, a[1]))
+        else:
+            # only the region (not the whole image) ends up cached
+            assert(a._images.nbytes == region.nbytes + 40*3*8)
+
+    assert(np.all(read_fits(filenames[1], section=((5, 15), (20, 30))) == full[5:15, 20:30]))
+    return a
+
+
+def test_find_timesteps():
+    '''
+    Make sure the binary-search timestep lookup matches a brute-force search.
+    '''
+    a = make_image_sequence(create_test_array(N=7, xsize=10, ysize=5))
+    a.time = a.time[[3, 0, 6, 1, 5, 2, 4]] + 100*u.s
+    times = Time(np.linspace(-3, 110, 1000), format='gps', scale='tdb')
+    brute = [np.argmin(np.abs((t - a.time).to('s').value)) for t in times]
+    assert(np.all(a.find_timesteps(times) == brute))
+    assert(a._find_timestep(times[500]) == brute[500])
+
+    # replacing the time axis should rebuild the index
+    a.time = a.time + 1000*u.s
+    assert(a._find_timestep(a.time[2]) == 2)
+    return a
+
+
+def test_percentiles():
+    '''
+    Make sure tiled medians + percentiles match numpy, even with a tiny memory cap.
+    '''
+    cube = create_test_array(N=9, xsize=13, ysize=11).astype(float)
+    cube[2, 3, 4] = np.nan
+    cube[:, 5, 6] = np.nan
+    a = make_image_sequence(cube)
+    b = make_image_sequence(cube)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        expected = np.nanmedian(cube, axis=0)
+        expectedpercentiles = np.nanpercentile(cube, [5, 95], axis=0)
+    median = a.median(maxmemory=9*13*8*10, nworkers=3)
+    assert(np.array_equal(median, expected, equal_nan=True))
+    assert(np.array_equal(a.percentile([5, 95], maxmemory=1), expectedpercentiles, equal_nan=True))
+
+    # each sequence keeps its own summary images
+    assert('median' not in b.spatial)
+
+    filenames = [os.path.join(directory, 'temporarypercentile{}.fits'.format(i)) for i in range(4)]
+    for f in filenames:
+        create_test_fits(rows=20, cols=30).writeto(f, overwrite=True)
+    c = FITS_Sequence(filenames, maxopenfiles=2)
+    cube = np.array([fits.getdata(f, 1) for f in c.filenames])
+    assert(np.array_equal(c.median(maxmemory=4*30*8*6, nworkers=1), np.nanmedian(cube, axis=0)))
+
+    # streaming many bands through a small file cache opens each file only once
+    assert(c.cache_statistics()['files']['misses'] == 4)
+    return a, c
+
+
+def test_statistics():
+    '''
+    Make sure the single-pass statistics match numpy's nan-aware functions.
+    '''
+    cube = create_test_array(N=11, xsize=7, ysize=6).astype(float)
+    cube[2, 3, 4] = np.nan
+    cube[5, 1, 1] = np.inf
+    cube[:, 0, 2] = np.nan
+    masked = np.where(np.isfinite(cube), cube, np.nan)
+    a = make_image_sequence(cube)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        expected = dict(mean=np.nanmean(masked, axis=0),
+                        variance=np.nanvar(masked, axis=0),
+                        min=np.nanmin(masked, axis=0),
+                        max=np.nanmax(masked, axis=0),
+                        sum=np.nansum(masked, axis=0),
+                        count=np.sum(np.isfinite(cube), axis=0))
+
+    for nworkers in [1, 4]:
+        a.spatial = {}
+        stats = a.statistics(nworkers=nworkers)
+        for k in expected:
+            assert(np.allclose(stats[k], expected[k], equal_nan=True))
+
+    filenames = [os.path.join(directory, 'temporarystatistics{}.fits'.format(i)) for i in range(5)]
+    for f in filenames:
+        create_test_fits(rows=20, cols=30).writeto(f, overwrite=True)
+    b = FITS_Sequence(filenames)
+    cube = np.array([fits.getdata(f, 1) for f in b.filenames])
+    assert(np.allclose(b.mean(), np.mean(cube, axis=0)))
+    assert(np.allclose(b.statistics()['std'], np.std(cube, axis=0)))
+    return a, b
+
+
+def test_views():
+    '''
+    Make sure slices, time windows, and masks make views that share the parent's cache.
+    '''
+    filenames = [os.path.join(directory, 'temporaryview{}.fits'.format(i)) for i in range(6)]
+    for i, f in enumerate(filenames):
+        hdulist = create_test_fits(rows=20, cols=30)
+        hdulist[0].header['TIME'] = 2458000.0 + i
+        hdulist.writeto(f, overwrite=True)
+    a = FITS_Sequence(filenames)
+
+    b = a[1:5:2]
+    assert(isinstance(b, View_Sequence))
+    assert(b.N == 2)
+    assert(b.shape == (2, 20, 30))
+    assert(b[1] is a[3])
+    assert(np.all(b.temporal['TIME'] == a.temporal['TIME'][1:5:2]))
+
+    # views of views point back to the original
+    c = b[::-1]
+    assert(c.parent is a)
+    assert(c[0] is a[3])
+
+    window = a.between(a.time[2], a.time[4])
+    assert(np.all(window._timesteps == [2, 3, 4]))
+    assert(window._find_timestep(a.time[3]) == 1)
+
+    mask = a.temporal['TIME'] > 2458003.5
+    assert(np.all(a[mask]._timesteps == [4, 5]))
+    assert(np.all(a[mask].read_region(0, (0, 3), (0, 3)) == a[4][0:3, 0:3]))
+    return a, b, c, window
+
+
+def test_compressed():
+    '''
+    Make sure gzipped and tile-compressed FITS files can be read, in pieces and in parallel.
+    '''
+    filenames = []
+    for i in range(4):
+        z = create_test_fits(rows=40, cols=50)[1].data
+        primary = fits.PrimaryHDU()
+        primary.header['TIME'] = 2458000.0 + i
+        gzipped = os.path.join(directory, 'temporarycompressed{}.fits.gz'.format(i))
+        fits.HDUList([primary, fits.ImageHDU(z)]).writeto(gzipped, overwrite=True)
+        tiled = os.path.join(directory, 'temporarycompressed{}.fz'.format(i))
+        fits.HDUList([primary, fits.CompImageHDU(z, tile_shape=(10, 50))]).writeto(tiled, overwrite=True)
+        filenames.append([gzipped, tiled])
+
+    for group in zip(*filenames):
+        for memmap in [False, True]:
+            a = make_image_sequence(list(group), memmap=memmap)
+            assert(isinstance(a, FITS_Sequence))
+            assert(a.shape == (4, 40, 50))
+            full = fits.getdata(a.filenames[2], 1)
+            assert(np.all(a.read_region(2, (12, 25), (3, 9)) == full[12:25, 3:9]))
+            assert(np.all(a[2] == full))
+
+        # decompress everything in parallel, into the cache
+        a = FITS_Sequence(list(group), nworkers=2)
+        a.clear_cache()
+        a.preload()
+        assert(len(a._images) == 4)
+        assert(np.all(a[3] == fits.getdata(a.filenames[3], 1)))
+    return a
+
+
+def test_movie():
+    '''
+    Make sure movie frames can be decoded in any order (and in batches).
+    '''
+    filename = os.path.join(directory, 'temporarymovie.mp4')
+    writer = imageio.get_writer(filename, fps=10, macro_block_size=1)
+    for i in range(25):
+        writer.append_data(np.full((32, 48, 3), 10*i, dtype=np.uint8))
+    writer.close()
+
+    a = Movie_Sequence(filename, buffersize=4)
+    assert(a.N == 25)
+
+    # opening doesn't decode anything; keyframes are indexed only once they're needed
+    assert(a._keyframes is None)
+    assert(a.keyframes[0] == 0)
+    reference = imageio.get_reader(filename, 'ffmpeg')
+    for i in [3, 4, 6, 2, 20, 19, -1]:
+        assert(np.all(a[i] == reference.get_data(i % a.N)))
+
+    batch = a.decode([12, 10, 11, 10])
+    assert(batch.shape == (4, 32, 48, 3))
+    assert(np.all(batch[1] == reference.get_data(10)))
+    assert(np.all(batch[1] == batch[3]))
+    return a
+
+
+def test_cubestore():
+    '''
+    Make sure a cube store gives back the same images (and pixel time series).
+    '''
+    filenames = [os.path.join(directory, 'temporarycubestore{}.fits'.format(i)) for i in range(5)]
+    for i, f in enumerate(filenames):
+        hdulist = create_test_fits(rows=23, cols=17)
+        hdulist[0].header['TIME'] = 2458000.0 + i
+        hdulist.writeto(f, overwrite=True)
+    a = FITS_Sequence(filenames)
+    cube = np.array([a[i] for i in range(a.N)])
+
+    for chunks, pixelmajor in [(None, False), ((2, 5, 4), True)]:
+        path = os.path.join(directory, 'temporarycubestore{}'.format(int(pixelmajor)))
+        b = a.to_cubestore(path, chunks=chunks, pixelmajor=pixelmajor)
+        c = CubeStore_Sequence(path)
+        for s in [b, c]:
+            assert(s.shape == a.shape)
+            assert(np.all(s[3] == cube[3]))
+            assert(np.all(s.read_region(4, (6, 19), (2, 11)) == cube[4, 6:19, 2:11]))
+            assert(np.all(s.pixel_timeseries([(3, 7), (16, 22)]) == cube[:, [7, 22], [3, 16]]))
+            assert(np.all(s.time == a.time))
+            assert(np.all(s.temporal['TIME'] == a.temporal['TIME']))
+
+    # rewriting a store drops its old pixel-major copy
+    d = a[::2].to_cubestore(path, maxmemory=1)
+    assert(d._pixels is None)
+    assert(np.all(d.pixel_timeseries([(3, 7)]) == cube[::2, [7], [3]]))
+    return c
+
+
+def test_pixel_timeseries():
+    '''
+    Make sure pixel + aperture time series match those from the full images.
+    '''
+    filenames = [os.path.join(directory, 'temporarypixels{}.fits'.format(i)) for i in range(5)]
+    for i, f in enumerate(filenames):
+        hdulist = create_test_fits(rows=23, cols=17)
+        hdulist[0].header['TIME'] = 2458000.0 + i
+        hdulist.writeto(f, overwrite=True)
+    cube = np.array([fits.getdata(f, 1) for f in filenames])
+    positions = [(3, 7), (16, 22), (0, 0)]
+    masks = np.zeros((2, 23, 17), dtype=bool)
+    masks[0, 5:8, 2:4] = True
+    masks[1, 20:, 10:] = True
+
+    for kw in [dict(nworkers=1), dict(nworkers=3), dict(nworkers=2, processes=True)]:
+        a = FITS_Sequence(filenames, **kw)
+        a.clear_cache()
+        a[2]
+        assert(np.all(a.pixel_timeseries(positions) == cube[:, [7, 22, 0], [3, 16, 0]]))
+    assert(np.allclose(a.aperture_timeseries(masks), np.transpose([cube[:, m].sum(axis=1) for m in masks])))
+
+    # any other sequence should give the same answers
+    b = make_image_sequence(cube)
+    assert(np.all(b.pixel_timeseries(positions) == a.pixel_timeseries(positions)))
+    assert(np.allclose(b.aperture_timeseries(masks[0]), a.aperture_timeseries(masks[0])))
+    return a, b
+
+
+def test_dtypes():
+    '''
+    Make sure integer images stay integers, and summaries are float32.
+    '''
+    cube = np.random.randint(0, 60000, (7, 12, 9)).astype(np.uint16)
+    a = make_image_sequence(cube)
+    assert(a.dtype == np.uint16)
+    assert(a._gather_3d().dtype == np.uint16)
+    median = a.median()
+    assert(median.dtype == np.float32)
+    assert(np.array_equal(median, np.median(cube, axis=0)))
+
+    # wide integers need float64 to be represented exactly
+    assert(working_dtype(np.int32) == np.float64)
+    assert(working_dtype('>i2') == np.float32)
+    assert(storage_dtype('>i2') == np.dtype(np.int16))
+    return a
+
+
+def test_memmap():
+    '''
+    Make sure arrays on disk can be viewed without loading them.
+    '''
+    cube = np.random.normal(0, 1, (6, 14, 10)).astype(np.float32)
+    npyfilename = os.path.join(directory, 'temporarycube.npy')
+    np.save(npyfilename, cube)
+    rawfilename = os.path.join(directory, 'temporarycube.raw')
+    cube.tofile(rawfilename)
+
+    a = make_image_sequence(npyfilename)
+    b = make_image_sequence(rawfilename, shape=cube.shape, dtype=np.float32)
+    c = make_image_sequence(np.load(npyfilename, mmap_mode='r'))
+    for s in [a, b, c]:
+        assert(isinstance(s, Array_Sequence))
+        assert(isinstance(s.images, np.memmap))
+        assert(s.shape == cube.shape)
+        assert(np.array_equal(s[3], cube[3]))
+        assert(np.allclose(s.mean(), cube.mean(axis=0)))
+        assert(np.array_equal(s.median(), np.median(cube, axis=0)))
+
+    # pickled stamps saved as .npy files still load as stamps
+    filename = os.path.join(directory, 'temporarystamp.npy')
+    create_test_stamp().save(filename)
+    assert(isinstance(make_image_sequence(filename), Stamp_Sequence))
+    return a, b, c
+
+
+def test_refresh():
+    '''
+    Make sure new files can be added to a live sequence.
+    '''
+    livedirectory = os.path.join(directory, 'live')
+    mkdir(livedirectory)
+    for f in glob.glob(os.path.join(livedirectory, '*.fits')):
+        os.remove(f)
+
+    def write(i):
+        hdulist = create_test_fits(rows=12, cols=8)
+        hdulist[0].header['TIME'] = 2458000.0 + i
+        hdulist[0].header['GAIN'] = 2.0 if i < 100 else 3.0
+        hdulist.writeto(os.path.join(livedirectory, 'live{:03}.fits'.format(i)), overwrite=True)
+
+    for i in [0, 2, 4, 6]:
+        write(i)
+    pattern = os.path.join(livedirectory, '*.fits')
+    a = FITS_Sequence(pattern)
+    before = a.statistics()
+    a.median()
+    assert(a.refresh() == 0)
+
+    # new files (some arriving out of order) slot into place
+    for i in [3, 7, 100]:
+        write(i)
+    assert(a.refresh() == 3)
+    b = FITS_Sequence(pattern)
+    assert(list(a.filenames) == list(b.filenames))
+    assert(np.allclose(a.time.jd, b.time.jd))
+    assert(np.all(a.temporal['TIME'] == b.temporal['TIME']))
+    assert(list(a.temporal['GAIN']) == list(b.temporal['GAIN']))
+
+    # streaming statistics are updated, but the median is recalculated
+    assert('median' not in a.spatial)
+    for k in ['mean', 'std', 'min', 'max', 'count']:
+        assert(np.allclose(a.statistics()[k], b.statistics()[k]))
+    assert(np.array_equal(a[1], b[1]))
+
+    # an illustration can follow along
+    i = CameraIllustration(data=a)
+    i.plot()
+    before = len(i.frames['camera']._timesandcadence(round=1)[0])
+    write(200)
+    assert(i.refresh() == 1)
+    assert(i.frames['camera'].currenttimestep == a.N - 1)
+    assert(len(i.frames['camera']._timesandcadence(round=1)[0]) == before + 1)
+    return a
+
+
+def test_formats():
+    '''
+    Make sure files are recognized by sniffing their first few bytes.
+    '''
+    fitsfilename = os.path.join(directory, 'temporaryformat.fits')
+    create_test_fits(rows=10, cols=12).writeto(fitsfilename, overwrite=True)
+    gzfilename = os.path.join(directory, 'temporaryformat.fits.gz')
+    create_test_fits(rows=10, cols=12).writeto(gzfilename, overwrite=True)
+    bz2filename = os.path.join(directory, 'temporaryformat.fits.bz2')
+    create_test_fits(rows=10, cols=12).writeto(bz2filename, overwrite=True)
+    npyfilename = os.path.join(directory, 'temporaryformat.npy')
+    np.save(npyfilename, np.zeros((3, 10, 12)))
+    moviefilename = os.path.join(directory, 'temporaryformat.mp4')
+    imageio.mimwrite(moviefilename, np.zeros((5, 16, 16, 3), dtype=np.uint8), fps=5, macro_block_size=1)
+    pngfilenames = [os.path.join(directory, 'temporaryformat{}.png'.format(i)) for i in range(3)]
+    for i, f in enumerate(pngfilenames):
+        imageio.imwrite(f, np.full((10, 12), 20*i, dtype=np.uint8))
+    jpgfilename = os.path.join(directory, 'temporaryformat.jpg')
+    imageio.imwrite(jpgfilename, np.zeros((10, 12, 3), dtype=np.uint8))
+
+    expected = {fitsfilename: ('fits', FITS_Sequence),
+                gzfilename: ('fits.gz', FITS_Sequence),
+                bz2filename: ('fits.bz2', FITS_Sequence),
+                npyfilename: ('npy', Array_Sequence),
+                moviefilename: ('movie', Movie_Sequence),
+                jpgfilename: ('picture', Picture_Sequence)}
+    for f, (name, kind) in expected.items():
+        assert(sniff_format(f)['name'] == name)
+        s = make_image_sequence(f)
+        assert(isinstance(s, kind))
+        assert(s.capabilities == sniff_format(f)['capabilities'])
+    assert(make_image_sequence(moviefilename).capabilities['randomaccess'] == False)
+
+    # formats that can be memory-mapped are, when asked
+    assert(not make_image_sequence(fitsfilename).memmap)
+    assert(make_image_sequence(fitsfilename, memmap=True).memmap)
+    assert(not make_image_sequence(gzfilename, memmap=True).memmap)
+    assert(isinstance(make_image_sequence(npyfilename).images, np.memmap))
+    assert(not isinstance(make_image_sequence(npyfilename, memmap=False).images, np.memmap))
+
+    # a search string's files are handed on (but it can still be searched again)
+    searched = make_image_sequence(os.path.join(directory, 'temporaryformat.fit*'))
+    assert(searched.N == 3)
+    assert(searched._source == os.path.join(directory, 'temporaryformat.fit*'))
+
+    # lists (and search strings) of pictures
+    pictures = make_image_sequence(os.path.join(directory, 'temporaryformat*.png'))
+    assert(isinstance(pictures, Picture_Sequence))
+    assert(pictures.N == 3)
+    assert(np.all(pictures[2] == 40))
+
+    # target pixel files can only be shown one at a time
+    tpffilenames = [os.path.join(directory, 'temporaryformat{}_tp.fits'.format(i)) for i in range(2)]
+    for f in tpffilenames:
+        create_test_fits(rows=10, cols=12).writeto(f, overwrite=True)
+    assert(sniff_format(tpffilenames[0])['name'] == 'tpf')
+    try:
+        make_image_sequence(tpffilenames)
+        assert(False)
+    except ValueError:
+        pass
+
+    # anything else is rejected up front
+    textfilename = os.path.join(directory, 'temporaryformat.txt')
+    with open(textfilename, 'w') as f:
+        f.write('not an image')
+    try:
+        make_image_sequence(textfilename)
+        assert(False)
+    except ValueError:
+        pass
+    return pictures
+
+
 def test_TPF():
     '''
     Run a test of the TPF_Sequence.
@@ -35,6 +35,28 @@ def test_organize():
     pattern = os.path.join(imagedirectory, 'cam*-ccd*-0000.fits')
     return organize_sequences(pattern)
 
+def test_find_files():
+    '''
+    Test the parallel, recursive scanner (and grouping) against glob.
+    '''
+    create_some_files()
+    nested = os.path.join(imagedirectory, 'nested', 'deeper')
+    if not os.path.exists(nested):
+        os.makedirs(nested)
+    create_test_fits(10, 10).writeto(os.path.join(nested, filetemplate.format(2, 3, 99)), overwrite=True)
+
+    for pattern in ['cam*-ccd*-0.fits', 'cam[12]-ccd?-*.fits', '*/*/cam*.fits']:
+        pattern = os.path.join(imagedirectory, pattern)
+        assert(list(find_files(pattern)) == sorted(glob.glob(pattern)))
+    pattern = os.path.join(imagedirectory, '**', 'cam*.fits')
+    assert(list(find_files(pattern, nworkers=3)) == sorted(glob.glob(pattern, recursive=True)))
+
+    # group the files by camera and CCD
+    groups = group_filenames(find_files(pattern))
+    assert(len(groups[('2', '3')]) == 4)
+    assert(list(groups[('1', '1')]) == sorted(groups[('1', '1')]))
+    return groups
+
 def test_illustratefits():
     '''
     Test the basic functionality of `illustratefits`.